@@ -0,0 +1,56 @@
+"""
+Instantiating generated classes, compared to hand-written slotted classes.
+
+Measures the time to create instances, and their size, for a mutable and a frozen class. Run from
+`priests/python` with `python -m benchmarks.bench_classes`.
+"""
+from ordain.classes import ClassCompiler
+from ordain.parse_dict import parse_typedefs
+import argparse
+import sys
+import time
+
+SOURCE = {
+    'Point': {
+        'type': 'struct',
+        'fields': {'x': {'type': 'float'}, 'y': {'type': 'float'}, 'label': {'type': '?string'}},
+    },
+    'FrozenPoint': {'type': 'Point', 'tags': [{'py.impl': 'frozen'}], 'fields': {}},
+}
+
+
+class Point:
+    __slots__ = ('x', 'y', 'label')
+
+    def __init__(self, x, y, label=None):
+        self.x = x
+        self.y = y
+        self.label = label
+
+
+def timed(cls, count: int)->float:
+    start = time.perf_counter()
+    for i in range(count):
+        cls(1.0, 2.0, None)
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--instances', type=int, default=1000000, help='The number of instances to create')
+    args = arg_parser.parse_args()
+    compiler = ClassCompiler(parse_typedefs(SOURCE))
+    classes = {
+        'hand-written': Point,
+        'generated': compiler.class_for('Point'),
+        'frozen': compiler.class_for('FrozenPoint'),
+    }
+    print(f"{args.instances} instances")
+    for name, cls in classes.items():
+        seconds = timed(cls, args.instances)
+        size = sys.getsizeof(cls(1.0, 2.0, None))
+        print(f"  {name:12}  {seconds:8.3f} s  {args.instances / seconds:12,.0f} instances/s  {size} bytes")
+
+
+if __name__ == '__main__':
+    main()
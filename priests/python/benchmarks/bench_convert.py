@@ -0,0 +1,111 @@
+"""
+Encoding and decoding payloads with generated converters, compared to walking the model for every
+payload.
+
+The naive converter makes the same conversions, but resolves each field's name and type as it
+goes, the way a converter without code generation would. Run from `priests/python` with
+`python -m benchmarks.bench_convert`.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from ordain.convert import Converter
+from ordain.denominational_view import DenominationalTypedefView
+from ordain.denominations import KnownDenomination
+from ordain.model import *
+from ordain.parse_dict import parse_typedefs
+import argparse
+import json
+import time
+
+SOURCE = {
+    'Item': {
+        'type': 'struct',
+        'fields': {
+            'sku': {'type': 'string', 'tags': [{'json.name': 'SKU'}]},
+            'price': {'type': 'decimal'},
+            'quantity': {'type': 'int'},
+        },
+    },
+    'Order': {
+        'type': 'struct',
+        'fields': {
+            'id': {'type': 'int'},
+            'placed': {'type': 'datetime'},
+            'delivered': {'type': '?date'},
+            'items': {'type': 'list of Item'},
+            'notes': {'type': 'mapping of string to string'},
+        },
+    },
+}
+
+ORDER = {
+    'id': 1,
+    'placed': datetime(2024, 1, 2, 3, 4, 5),
+    'delivered': date(2024, 1, 5),
+    'items': [{'sku': f'A{i}', 'price': Decimal('9.99'), 'quantity': i} for i in range(5)],
+    'notes': {'gift': 'yes'},
+}
+
+_DECODERS = {
+    ScalarType.date: date.fromisoformat,
+    ScalarType.datetime: datetime.fromisoformat,
+    ScalarType.decimal: Decimal,
+}
+
+
+def naive_decode(view: DenominationalTypedefView, value):
+    type = view.typedef.type
+    if isinstance(type, NullableType):
+        if value is None:
+            return None
+        type = type.of
+    if isinstance(type, NamedTypeReference):
+        return naive_decode(DenominationalTypedefView.from_model(type.name_ref, view.model, view.denomination), value)
+    elif isinstance(type, StructType):
+        fields = type.fields or view.model[view.typedef.parent].struct_fields or {}
+        decoded = {}
+        for key, field in fields.items():
+            field_view = DenominationalTypedefView(key, field, view.model, view.denomination, path=f"{view.path}.{key}")
+            if not field_view.is_ignored:
+                decoded[key] = naive_decode(field_view, value.get(field_view.name))
+        return decoded
+    elif isinstance(type, CollectionType):
+        element = DenominationalTypedefView.for_typedef(type.of, view.model, view.denomination)
+        return [naive_decode(element, item) for item in value]
+    elif isinstance(type, MappingType):
+        keys = DenominationalTypedefView.for_typedef(type.keys, view.model, view.denomination)
+        values = DenominationalTypedefView.for_typedef(type.value, view.model, view.denomination)
+        return {naive_decode(keys, key): naive_decode(values, item) for key, item in value.items()}
+    elif type in _DECODERS:
+        return _DECODERS[type](value)
+    return value
+
+
+def timed(function, count: int)->float:
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--payloads', type=int, default=20000, help='The number of payloads to decode')
+    args = arg_parser.parse_args()
+    model = parse_typedefs(SOURCE)
+    denomination = KnownDenomination.JsonBase()
+    converter = Converter(model, denomination)
+    payload = json.loads(json.dumps(converter.encode('Order', ORDER)))
+    view = DenominationalTypedefView.from_model('Order', model, denomination)
+    decoder = converter.decoder('Order')
+    assert naive_decode(view, payload) == decoder(payload) == ORDER
+    naive = timed(lambda: naive_decode(view, payload), args.payloads)
+    generated = timed(lambda: decoder(payload), args.payloads)
+    print(f"{args.payloads} payloads")
+    print(f"  naive      {naive:8.3f} s  {args.payloads / naive:12,.0f} payloads/s")
+    print(f"  generated  {generated:8.3f} s  {args.payloads / generated:12,.0f} payloads/s")
+    print(f"  speedup    {naive / generated:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
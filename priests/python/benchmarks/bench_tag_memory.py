@@ -0,0 +1,80 @@
+"""
+Memory used by the tags of a large model, with and without sharing identical tags.
+
+A model where the same few tags repeat on every field is parsed with `parse_typedefs`, once
+as usual (with `Tag.interned` and `TagRepository.interned`) and once with plain constructors,
+and the memory allocated while parsing is compared. Run from `priests/python` with
+`python -m benchmarks.bench_tag_memory`.
+"""
+from contextlib import contextmanager
+from ordain.model import Tag, TagRepository
+from ordain.parse_dict import parse_typedefs
+import argparse
+import gc
+import tracemalloc
+
+FIELD_TAGS = [
+    [{'sql.type': 'VARCHAR(255)'}, 'required', {'label': 'Name'}],
+    ['required', {'check': '> 0'}],
+    [{'sql.type': 'VARCHAR(255)'}],
+    [],
+]
+
+
+def generate(typedefs, fields):
+    return {
+        f"Type{index}": {
+            'type': 'struct',
+            'tags': [{'sql.name': f"table_{index}"}, {'py.impl': 'dataclass'}],
+            'fields': {
+                f"field{field}": {'type': 'string', 'tags': FIELD_TAGS[field % len(FIELD_TAGS)]}
+                for field in range(fields)
+            },
+        }
+        for index in range(typedefs)
+    }
+
+
+@contextmanager
+def without_interning():
+    tag_interned = Tag.__dict__['interned']
+    repository_interned = TagRepository.__dict__['interned']
+    Tag.interned = classmethod(lambda cls, cannon, name, value: cls(cannon, name, value)) # type: ignore
+    TagRepository.interned = classmethod(lambda cls, tags: cls(list(tags))) # type: ignore
+    try:
+        yield
+    finally:
+        Tag.interned = tag_interned # type: ignore
+        TagRepository.interned = repository_interned # type: ignore
+
+
+def measure(source):
+    """
+    The bytes still allocated by parsing once the model is built, and the number of distinct tags
+    """
+    gc.collect()
+    tracemalloc.start()
+    model = parse_typedefs(source)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tags = {id(tag) for typedef in model.values() for field in typedef.struct_fields.values() for tag in field.tags}
+    return allocated, len(tags)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--typedefs', type=int, default=2000, help='The number of struct typedefs')
+    arg_parser.add_argument('--fields', type=int, default=20, help='The number of fields per struct')
+    args = arg_parser.parse_args()
+    source = generate(args.typedefs, args.fields)
+    with without_interning():
+        plain, plain_tags = measure(source)
+    interned, interned_tags = measure(source)
+    print(f"{args.typedefs} typedefs x {args.fields} fields")
+    print(f"  plain     {plain / 2**20:8.2f} MiB  {plain_tags} field tag objects")
+    print(f"  interned  {interned / 2**20:8.2f} MiB  {interned_tags} field tag objects")
+    print(f"  saved     {(plain - interned) / 2**20:8.2f} MiB ({1 - interned / plain:.0%})")
+
+
+if __name__ == '__main__':
+    main()
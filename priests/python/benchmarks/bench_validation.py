@@ -0,0 +1,136 @@
+"""
+Validating payloads with compiled validators, compared to walking the model for every payload.
+
+The naive validator checks the same things (types, nulls, `#required`, `#check`) by looking at
+each typedef's type and tags as it goes, the way a validator without code generation would.
+Run from `priests/python` with `python -m benchmarks.bench_validation`.
+"""
+from ordain.checks import compile_check
+from ordain.denominational_view import DenominationalTypedefView
+from ordain.denominations import KnownDenomination
+from ordain.model import *
+from ordain.parse_dict import parse_typedefs
+from ordain.validation import ValidatorCompiler
+import argparse
+import time
+
+SOURCE = {
+    'Age': {'type': 'int', 'tags': [{'check': '>= 0'}, {'check': '< 150'}]},
+    'Address': {
+        'type': 'struct',
+        'fields': {
+            'street': {'type': 'string'},
+            'city': {'type': 'string', 'tags': ['required']},
+            'postcode': {'type': '?string'},
+        },
+    },
+    'User': {
+        'type': 'struct',
+        'fields': {
+            'name': {'type': 'string', 'tags': ['required']},
+            'age': {'type': '?Age'},
+            'email': {'type': '?string'},
+            'admin': {'type': 'bool'},
+            'address': {'type': 'Address'},
+            'tags': {'type': 'list of string'},
+            'scores': {'type': 'mapping of string to float'},
+        },
+    },
+}
+
+PAYLOAD = {
+    'name': 'Ann',
+    'age': 42,
+    'email': 'ann@example.com',
+    'admin': False,
+    'address': {'street': '1 High St', 'city': 'Springfield', 'postcode': None},
+    'tags': ['a', 'b', 'c'],
+    'scores': {'x': 1.5, 'y': 2},
+}
+
+_TYPES = {
+    ScalarType.bool: (bool,),
+    ScalarType.float: (float, int),
+    ScalarType.int: (int,),
+    ScalarType.string: (str,),
+}
+
+
+def naive_validate(view: DenominationalTypedefView, value):
+    """
+    Validate a value by walking its typedef, returning the first problem found (or None)
+    """
+    typedef = view.typedef
+    type = typedef.type
+    if value is None:
+        required = view.tag_search_top('required')
+        if isinstance(type, NullableType) and (required is None or required.value is False):
+            return None
+        return f"{view.path}: must not be null"
+    if isinstance(type, NullableType):
+        type = type.of
+    if isinstance(type, StructType):
+        if not isinstance(value, dict):
+            return f"{view.path}: expected object"
+        fields = type.fields or view.model[typedef.parent].struct_fields or {}
+        for key, field in fields.items():
+            field_view = DenominationalTypedefView(key, field, view.model, view.denomination, path=f"{view.path}.{key}")
+            if field_view.is_ignored:
+                continue
+            problem = naive_validate(field_view, value.get(field_view.name))
+            if problem is not None:
+                return problem
+    elif isinstance(type, CollectionType):
+        if not isinstance(value, list):
+            return f"{view.path}: expected list"
+        element = DenominationalTypedefView.for_typedef(type.of, view.model, view.denomination)
+        for item in value:
+            problem = naive_validate(element, item)
+            if problem is not None:
+                return problem
+    elif isinstance(type, MappingType):
+        if not isinstance(value, dict):
+            return f"{view.path}: expected mapping"
+        keys = DenominationalTypedefView.for_typedef(type.keys, view.model, view.denomination)
+        values = DenominationalTypedefView.for_typedef(type.value, view.model, view.denomination)
+        for key, item in value.items():
+            problem = naive_validate(keys, key) or naive_validate(values, item)
+            if problem is not None:
+                return problem
+    elif isinstance(type, ScalarType) and type in _TYPES:
+        if not isinstance(value, _TYPES[type]) or (type is not ScalarType.bool and isinstance(value, bool)):
+            return f"{view.path}: expected {type.value}"
+    for tag in view.tag_search_all('check'):
+        if not compile_check(str(tag.value))(value):
+            return f"{view.path}: fails check {tag.value!r}"
+    return None
+
+
+def timed(function, count: int)->float:
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--payloads', type=int, default=20000, help='The number of payloads to validate')
+    args = arg_parser.parse_args()
+    model = parse_typedefs(SOURCE)
+    denomination = KnownDenomination.JsonBase()
+    view = DenominationalTypedefView.from_model('User', model, denomination)
+    assert naive_validate(view, PAYLOAD) is None
+    compiler = ValidatorCompiler(model, denomination)
+    validator = compiler.validator('User')
+    validator(PAYLOAD)
+    naive = timed(lambda: naive_validate(view, PAYLOAD), args.payloads)
+    compiled = timed(lambda: validator(PAYLOAD), args.payloads)
+    print(f"{args.payloads} payloads")
+    print(f"  naive     {naive:8.3f} s  {args.payloads / naive:12,.0f} payloads/s")
+    print(f"  compiled  {compiled:8.3f} s  {args.payloads / compiled:12,.0f} payloads/s")
+    print(f"  speedup   {naive / compiled:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+"""
+Validating many records at once, stored as columns.
+
+Bulk imports often have records as columns (a NumPy array or list of values per field) rather
+than as dicts. A `BatchValidator` checks a struct's scalar and enum fields a whole column at a
+time: each column is coerced to its field's type, then nulls, enum membership, and comparison
+checks (e.g. `#check < 150`) are checked with NumPy array operations. Other fields, and checks
+which aren't comparisons, are checked value by value with the field's compiled validator (see
+`ordain.validation`).
+
+Coercion is more lenient than the row validator, since columns often come from text: a value is
+accepted if it converts to the field's type without losing anything, e.g. `"42"` or `42.0` for an
+int, but not `42.5` or `True`. Ints must fit in 64 bits. NaN, NaT, and masked values are nulls.
+Columns which are NumPy arrays of numbers, booleans, or datetimes are coerced without looking at
+each value; lists and arrays of objects or strings are converted one value at a time first.
+
+NumPy is an optional dependency, installed with the `numpy` extra.
+"""
+from .checks import Check, Comparison, compile_check, parse_comparison
+from .codegen import struct_field_views
+from .denominational_view import DenominationalTypedefView
+from .denominations import Denomination
+from .exceptions import ModelException, OrdainException, ValidationException, format_path
+from .model import *
+from .validation import Validator, ValidatorCompiler
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+import math
+import numbers
+
+_VECTORIZED = (ScalarType.int, ScalarType.float, ScalarType.bool, ScalarType.string, ScalarType.date, ScalarType.datetime)
+
+
+@dataclass(frozen=True, slots=True)
+class BatchError:
+    row: int
+    path: tuple
+    """
+    Where the problem is, starting with the field's name; see `ValidationException.path`
+    """
+    message: str
+
+    def __str__(self):
+        return f"row {self.row}: {format_path(self.path)}: {self.message}"
+
+
+@dataclass(frozen=True, slots=True)
+class BatchResult:
+    mask: Any
+    """
+    A boolean array with an entry per row, which is true for the rows with errors
+    """
+    errors: Tuple[BatchError,...]
+    """
+    Every problem found, in row order
+    """
+    columns: Mapping[str,Any]
+    """
+    The columns of the fields which were checked a column at a time, coerced to their types (as
+    arrays of int64, float64, bool, datetime64, or objects for strings), by field name. Entries
+    for rows which couldn't be coerced are zero.
+    """
+
+    @property
+    def valid(self)->bool:
+        return not self.errors
+
+
+@dataclass(frozen=True, slots=True)
+class _Field:
+    name: str
+    view: DenominationalTypedefView
+    nullable: bool
+    required: bool
+    scalar: Optional[ScalarType]
+    """
+    The type the column is coerced to, or None to check each value with `validator`
+    """
+    enum: Optional[list]
+    comparisons: Tuple[Tuple[Comparison,str],...]
+    """
+    Checks which are done on the whole column, and their error messages
+    """
+    checks: Tuple[Tuple[Check,str],...]
+    """
+    Checks which are done on each value
+    """
+    validator: Optional[Validator]
+
+
+class BatchValidator:
+    """
+    Validates columns of records against a struct typedef, for a denomination.
+
+    Columns are keyed by each field's (denominational) name; a missing column is all nulls, and
+    columns which aren't fields are ignored. Ignored fields aren't checked.
+    """
+    def __init__(self, typedef: Union[str,Typedef], model: Mapping[str,Typedef], denomination: Denomination, compiler: Optional[ValidatorCompiler] = None):
+        """
+        :param compiler: A validator compiler for the same model and denomination to share, if
+            there is one
+        :raises ModelException: If the typedef is not a struct, refers to an undefined typedef, or
+            has a check which can't be compiled
+        """
+        self._compiler = ValidatorCompiler(model, denomination) if compiler is None else compiler
+        views = self._compiler.views
+        if isinstance(typedef, str):
+            if typedef not in model:
+                raise ModelException(f"Undefined typedef: {typedef}")
+            view = views.view(typedef)
+        elif model.get(typedef.name) is typedef:
+            view = views.view(typedef.name)
+        else:
+            view = DenominationalTypedefView(typedef.name, typedef, model, denomination, views)
+        type = view.typedef.type
+        if not isinstance(type.of if isinstance(type, NullableType) else type, StructType):
+            raise ModelException(f"Cannot validate columns of {view.path}: it is not a struct")
+        self._fields = [self._field(field) for field in struct_field_views(view, views).values()]
+
+    def _field(self, view: DenominationalTypedefView)->_Field:
+        type = view.typedef.type
+        nullable = isinstance(type, NullableType)
+        if isinstance(type, NullableType):
+            type = type.of
+        required_tag = view.tag_search_top('required')
+        required = required_tag is not None and required_tag.value is not False
+        scalar: Type
+        enum: Optional[list]
+        if isinstance(type, EnumType):
+            scalar, enum = type.of, list(type.values)
+        else:
+            scalar, enum = type, None
+        if not isinstance(scalar, ScalarType) or scalar not in _VECTORIZED:
+            return _Field(view.name, view, nullable, required, None, None, (), (), self._compiler.validator(view.typedef))
+        comparisons = []
+        checks = []
+        for tag in view.tag_search_all('check'):
+            expression = str(tag.value)
+            message = f"fails check {expression!r}"
+            comparison = parse_comparison(expression)
+            if comparison is not None and _comparable(scalar, comparison.operand):
+                comparisons.append((comparison, message))
+            else:
+                checks.append((compile_check(expression), message))
+        return _Field(view.name, view, nullable, required, scalar, enum, tuple(comparisons), tuple(checks), None)
+
+    def __call__(self, columns: Mapping[str,Any], rows: Optional[int] = None)->BatchResult:
+        """
+        Validate columns of records
+
+        :param rows: The number of rows; by default, the length of the columns
+        :raises ValidationException: If the columns aren't all the same length
+        :raises OrdainException: If NumPy is not installed
+        """
+        np = _numpy()
+        rows = self._rows(columns, rows)
+        mask = np.zeros(rows, dtype=bool)
+        found: List[Tuple[int,int,tuple,str]] = []
+        coerced_columns: Dict[str,Any] = {}
+
+        def report(failed, message: Callable[[int],str], order: int, path: tuple):
+            nonlocal mask
+            failing = np.flatnonzero(failed)
+            if len(failing):
+                mask |= failed
+                found.extend((row, order, path, message(row)) for row in failing.tolist())
+
+        for order, field in enumerate(self._fields):
+            column = columns.get(field.name)
+            path = (field.name,)
+            if field.scalar is None:
+                items = [None] * rows if column is None else _to_list(np, column)
+                failed = np.zeros(rows, dtype=bool)
+                for row, value in enumerate(items):
+                    try:
+                        field.validator(value) # type: ignore
+                    except ValidationException as e:
+                        failed[row] = True
+                        found.append((row, order, (field.name, *e.path), e.message))
+                mask |= failed
+                continue
+            if column is None:
+                values, nulls, bad = None, np.ones(rows, dtype=bool), np.zeros(rows, dtype=bool)
+            else:
+                values, nulls, bad = _coerce(np, column, field.scalar)
+                coerced_columns[field.name] = values
+            if field.required or not field.nullable:
+                report(nulls, lambda row: 'is required' if field.required else 'must not be null', order, path)
+            expected = field.scalar.value
+            report(bad, lambda row: f"expected {expected}, got {_element(column, row)!r}", order, path)
+            if values is None:
+                continue
+            ok = ~(nulls | bad)
+            if field.enum is not None:
+                message = f"must be one of {', '.join(map(repr, field.enum))}"
+                report(ok & ~np.isin(values, np.array(field.enum, dtype=values.dtype)), lambda row: message, order, path)
+            for comparison, message in field.comparisons:
+                with np.errstate(invalid='ignore'):
+                    passed = np.asarray(comparison.compare(values, comparison.operand), dtype=bool)
+                report(ok & ~passed, lambda row: message, order, path)
+            if field.checks:
+                elements = values.tolist()
+                for check, message in field.checks:
+                    passed = np.fromiter((not good or check(value) for good, value in zip(ok.tolist(), elements)), dtype=bool, count=rows)
+                    report(~passed, lambda row: message, order, path)
+        found.sort(key=lambda error: error[:2])
+        errors = tuple(BatchError(row, path, message) for row, _, path, message in found)
+        return BatchResult(mask, errors, coerced_columns)
+
+    def _rows(self, columns: Mapping[str,Any], rows: Optional[int])->int:
+        for field in self._fields:
+            column = columns.get(field.name)
+            if column is None:
+                continue
+            if rows is None:
+                rows = len(column)
+            elif len(column) != rows:
+                raise ValidationException(f"expected {rows} rows, got {len(column)}", (field.name,))
+        if rows is None:
+            raise ValidationException("no columns given, and no number of rows")
+        return rows
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise OrdainException("NumPy is required for batch validation") from None
+    return numpy
+
+
+def _comparable(scalar: ScalarType, operand)->bool:
+    """
+    Check if a column of a type can be compared to an operand as a whole
+    """
+    if scalar in (ScalarType.int, ScalarType.float):
+        return isinstance(operand, (int, float)) and not isinstance(operand, bool)
+    return scalar is ScalarType.string and isinstance(operand, str)
+
+
+def _to_list(np, column)->list:
+    if isinstance(column, np.ma.MaskedArray):
+        return column.astype(object).filled(None).tolist()
+    if isinstance(column, np.ndarray):
+        return column.tolist()
+    return list(column)
+
+
+def _element(column, row: int):
+    value = column[row]
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _coerce(np, column, scalar: ScalarType):
+    """
+    Coerce a column to a type, getting the coerced values, and which rows are null and which
+    can't be coerced
+    """
+    if isinstance(column, np.ma.MaskedArray):
+        masked = np.ma.getmaskarray(column)
+        column = column.data
+    else:
+        masked = None
+        if not isinstance(column, np.ndarray):
+            column = np.array(list(column), dtype=object)
+    rows = len(column)
+    kind = column.dtype.kind
+    nulls = np.zeros(rows, dtype=bool)
+    if kind in 'OUS':
+        values, nulls, bad = _convert_each(np, column, scalar)
+    elif scalar is ScalarType.int and kind == 'i':
+        values, bad = column.astype(np.int64), np.zeros(rows, dtype=bool)
+    elif scalar is ScalarType.int and kind == 'u':
+        # Casting would wrap values which don't fit around to negative ones
+        bad = column > np.iinfo(np.int64).max
+        values = np.where(bad, 0, column).astype(np.int64)
+    elif scalar is ScalarType.int and kind == 'f':
+        nulls = np.isnan(column)
+        with np.errstate(invalid='ignore'):
+            integral = np.isfinite(column) & (column == np.trunc(column)) & (np.abs(column) < 2**63)
+        values = np.where(integral, column, 0).astype(np.int64)
+        bad = ~nulls & ~integral
+    elif scalar is ScalarType.float and kind in 'iuf':
+        values = column.astype(np.float64)
+        nulls = np.isnan(values)
+        bad = np.zeros(rows, dtype=bool)
+    elif scalar is ScalarType.bool and kind == 'b':
+        values, bad = column, np.zeros(rows, dtype=bool)
+    elif scalar in (ScalarType.date, ScalarType.datetime) and kind == 'M':
+        nulls = np.isnat(column)
+        values = column.astype('datetime64[D]' if scalar is ScalarType.date else 'datetime64[us]')
+        # A date column can't have times
+        bad = ~nulls & (values != column)
+    else:
+        values, bad = np.zeros(rows, dtype=_DTYPES[scalar]), np.ones(rows, dtype=bool)
+    if masked is not None:
+        nulls = nulls | masked
+        bad = bad & ~masked
+    return values, nulls, bad
+
+
+def _convert_each(np, column, scalar: ScalarType):
+    convert = _CONVERTERS[scalar]
+    fill = _FILLS[scalar]
+    values = []
+    nulls = []
+    bad = []
+    for value in column.tolist():
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            values.append(fill)
+            nulls.append(True)
+            bad.append(False)
+            continue
+        try:
+            values.append(convert(value))
+            bad.append(False)
+        except (TypeError, ValueError, OverflowError):
+            values.append(fill)
+            bad.append(True)
+        nulls.append(False)
+    return np.array(values, dtype=_DTYPES[scalar]), np.array(nulls, dtype=bool), np.array(bad, dtype=bool)
+
+
+def _to_int(value)->int:
+    if isinstance(value, str):
+        integer = int(value)
+    elif isinstance(value, numbers.Integral) and not isinstance(value, bool):
+        integer = int(value)
+    elif isinstance(value, numbers.Real) and float(value).is_integer():
+        integer = int(math.trunc(value))
+    else:
+        raise TypeError(value)
+    if not -2**63 <= integer < 2**63:
+        raise OverflowError(value)
+    return integer
+
+
+def _to_float(value)->float:
+    if isinstance(value, str):
+        return float(value)
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+    raise TypeError(value)
+
+
+def _to_bool(value)->bool:
+    # Including NumPy's booleans
+    if isinstance(value, bool) or getattr(getattr(value, 'dtype', None), 'kind', None) == 'b':
+        return bool(value)
+    raise TypeError(value)
+
+
+def _to_str(value)->str:
+    if isinstance(value, str):
+        return value
+    raise TypeError(value)
+
+
+def _to_date(value)->date:
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if type(value) is date:
+        return value
+    raise TypeError(value)
+
+
+def _to_datetime(value)->datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        raise TypeError(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+_CONVERTERS: Dict[ScalarType,Callable[[Any],Any]] = {
+    ScalarType.int: _to_int,
+    ScalarType.float: _to_float,
+    ScalarType.bool: _to_bool,
+    ScalarType.string: _to_str,
+    ScalarType.date: _to_date,
+    ScalarType.datetime: _to_datetime,
+}
+
+_DTYPES = {
+    ScalarType.int: 'int64',
+    ScalarType.float: 'float64',
+    ScalarType.bool: 'bool',
+    ScalarType.string: 'object',
+    ScalarType.date: 'datetime64[D]',
+    ScalarType.datetime: 'datetime64[us]',
+}
+
+_FILLS: Dict[ScalarType,Any] = {
+    ScalarType.int: 0,
+    ScalarType.float: 0.0,
+    ScalarType.bool: False,
+    ScalarType.string: '',
+    ScalarType.date: date(1970, 1, 1),
+    ScalarType.datetime: datetime(1970, 1, 1),
+}
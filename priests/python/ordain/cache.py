@@ -0,0 +1,204 @@
+"""
+Loading ordinations from files, with an on-disk cache of parsed models.
+
+The cache is keyed by a hash of the source bytes, so an unchanged source is never parsed twice.
+Cache files are pickles, and so must only be read from a directory you trust.
+"""
+from .exceptions import OrdainException, ParseException
+from .model import *
+from .parse_dict import LazyFields, parse_typedefs
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Mapping, Callable, Dict, List, Optional, Union
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+import zlib
+
+CACHE_VERSION = 2
+"""
+Bump this when the cached representation changes in a way the model fingerprint can't detect
+"""
+
+_MAGIC = b'ORDAINC\0'
+_HEADER = struct.Struct('>8sH32s32s')
+
+Loader = Callable[..., Mapping[str,Typedef]]
+"""
+Parses source bytes into a model. For files with imports, the typedefs they import are passed
+as a second argument.
+"""
+ImportScanner = Callable[[bytes], List[str]]
+"""
+Gets the paths a source file imports, relative to the file
+"""
+
+
+def _load_json(source: bytes, externals: Mapping[str,Typedef] = {})->Mapping[str,Typedef]:
+    return parse_typedefs(json.loads(source), externals=externals)
+
+
+def _safe_load_yaml(source: bytes):
+    try:
+        import yaml
+    except ImportError:
+        raise OrdainException("PyYAML is required to load YAML ordinations") from None
+    return yaml.safe_load(source)
+
+
+def _load_yaml(source: bytes, externals: Mapping[str,Typedef] = {})->Mapping[str,Typedef]:
+    return parse_typedefs(_safe_load_yaml(source), externals=externals)
+
+
+def _imports_directive(typedef_dict)->List[str]:
+    """
+    Get the `$imports` list of a JSON or YAML ordination
+    """
+    imports = typedef_dict.get('$imports', []) if isinstance(typedef_dict, dict) else []
+    if not isinstance(imports, list) or not all(isinstance(path, str) for path in imports):
+        raise ParseException("$imports must be a list of paths")
+    return imports
+
+
+def _json_imports(source: bytes)->List[str]:
+    return _imports_directive(json.loads(source))
+
+
+def _yaml_imports(source: bytes)->List[str]:
+    return _imports_directive(_safe_load_yaml(source))
+
+
+def _no_imports(source: bytes)->List[str]:
+    return []
+
+
+LOADERS: Dict[str,Loader] = {
+    '.json': _load_json,
+    '.yaml': _load_yaml,
+    '.yml': _load_yaml,
+}
+IMPORT_SCANNERS: Dict[str,ImportScanner] = {
+    '.json': _json_imports,
+    '.yaml': _yaml_imports,
+    '.yml': _yaml_imports,
+}
+
+
+def register_loader(suffix: str, loader: Loader, imports: Optional[ImportScanner] = None):
+    """
+    Register a function to parse source files with the given suffix (e.g. `.ordain`) into a model.
+
+    :param imports: A function to get the paths a source file imports, if the format has imports.
+    """
+    LOADERS[suffix] = loader
+    IMPORT_SCANNERS[suffix] = _no_imports if imports is None else imports
+
+
+def _model_fingerprint()->bytes:
+    """
+    A hash of the shape of the model classes, so caches written by a different version of the
+    model are never read.
+    """
+    shape = [CACHE_VERSION, [member.value for member in ScalarType]]
+    for cls in (NamedTypeReference, StructType, CollectionType, MappingType, EnumType, NullableType, Tag, TagRepository, Typedef):
+        shape.append((cls.__qualname__, [field.name for field in fields(cls)] if is_dataclass(cls) else None))
+    # Lazy models are cached unparsed
+    shape.append((LazyFields.__qualname__, LazyFields.__slots__))
+    return hashlib.sha256(repr(shape).encode()).digest()
+
+MODEL_FINGERPRINT = _model_fingerprint()
+
+
+def default_cache_dir()->Path:
+    """
+    The directory used when no cache directory is given: `$ORDAIN_CACHE_DIR`, or else `ordain`
+    in the user's cache directory.
+    """
+    if 'ORDAIN_CACHE_DIR' in os.environ:
+        return Path(os.environ['ORDAIN_CACHE_DIR'])
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'ordain'
+
+
+def source_digest(source: bytes, suffix: str)->bytes:
+    """
+    The cache key for a source file
+    """
+    return hashlib.sha256(suffix.encode() + b'\0' + source).digest()
+
+
+def load(path: Union[str,os.PathLike], cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True)->Mapping[str,Typedef]:
+    """
+    Load an ordination from a file, using the cache if the file has been parsed before.
+
+    :param path: The source file. The loader is chosen by the file's suffix.
+    :param cache_dir: Where to keep cached models; see `default_cache_dir`.
+    :param use_cache: Set to false to always parse the source, and not write to the cache.
+    :raises ParseException: If the source is not well-formed
+    :raises OrdainException: If there is no loader for the file type
+    """
+    path = Path(path)
+    return loads(path.read_bytes(), path.suffix, cache_dir, use_cache)
+
+
+def loads(source: bytes, suffix: str, cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True)->Mapping[str,Typedef]:
+    """
+    Load an ordination from source bytes, using the cache if the source has been parsed before.
+
+    :param suffix: The file suffix of the source (e.g. `.json`), used to choose a loader.
+    """
+    try:
+        loader = LOADERS[suffix]
+    except KeyError:
+        raise OrdainException(f"No loader registered for {suffix!r} files") from None
+    if not use_cache:
+        return loader(source)
+    digest = source_digest(source, suffix)
+    cache_path = Path(default_cache_dir() if cache_dir is None else cache_dir) / f"{digest.hex()}.ordc"
+    model = read_cache_file(cache_path, digest)
+    if model is None:
+        model = loader(source)
+        write_cache_file(cache_path, digest, model)
+    return model
+
+
+def read_cache_file(cache_path: Path, digest: bytes)->Optional[Mapping[str,Typedef]]:
+    """
+    Read a cached model, or return None if there is no usable cache file.
+    """
+    try:
+        data = cache_path.read_bytes()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, _, fingerprint, cached_digest = _HEADER.unpack_from(data)
+    if magic != _MAGIC or fingerprint != MODEL_FINGERPRINT or cached_digest != digest:
+        return None
+    try:
+        return pickle.loads(zlib.decompress(data[_HEADER.size:]))
+    except Exception:
+        # A corrupt cache file is no worse than a missing one
+        return None
+
+
+def write_cache_file(cache_path: Path, digest: bytes, model: Mapping[str,Typedef]):
+    """
+    Write a model to the cache. Failing to write is not an error, since the cache is optional.
+    """
+    data = _HEADER.pack(_MAGIC, CACHE_VERSION, MODEL_FINGERPRINT, digest) + zlib.compress(pickle.dumps(dict(model), pickle.HIGHEST_PROTOCOL))
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically, so concurrent readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError:
+        pass
@@ -0,0 +1,319 @@
+"""
+Compiling `#check` constraints into functions which test a value.
+
+Checks are written in a small expression language:
+
+- `@` is the value being tested. If a check (or an operand of `and`, `or`, or `not`) begins with
+  a comparison operator, the value is the first operand, so `< 150` means `@ < 150`.
+- Built-in variables are prefixed with `$`: `$length` (the length of the value), `$now` (the
+  current date and time), and `$today` (the current date).
+- Members are accessed with dot notation, e.g. `$now.year`. For mappings, this gets an item.
+- `regex /pattern/flags` checks that the whole value matches a regular expression, with
+  optional `i`, `m`, `s`, and `x` flags.
+- Numbers, strings (in single or double quotes), `true`, `false`, and `null` are literals.
+- Comparisons (`<`, `<=`, `>`, `>=`, `==`, `!=`, which can be chained), arithmetic (`+`, `-`,
+  `*`, `/`, `%`), parentheses, and `and`, `or`, and `not` work as in Python.
+
+A check is compiled into a Python function once, with its regular expressions compiled too, and
+the functions are kept in a bounded cache keyed by the expression, so a check repeated across a
+model (e.g. inherited from an alias like `Age`) is only compiled once. A value the check can't be
+evaluated on (e.g. `$length` of a number, or comparing a string to a number) fails it.
+"""
+from .exceptions import ModelException
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+import ast
+import operator
+import re
+
+Check = Callable[[Any],bool]
+"""
+A compiled check: takes the value being tested, and returns whether it passes
+"""
+
+CACHE_SIZE = 1024
+"""
+The number of compiled checks kept
+"""
+
+_COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Comparison:
+    """
+    A check which compares the value being tested to a constant, e.g. `< 150`
+    """
+    operator: str
+    operand: Union[int,float,str]
+
+    @property
+    def compare(self)->Callable[[Any,Any],Any]:
+        """
+        The comparison function, which also works elementwise on NumPy arrays
+        """
+        return _COMPARISONS[self.operator]
+
+
+def compile_check(expression: str)->Check:
+    """
+    Compile a check expression into a function which tests a value. Compiled checks are cached.
+
+    :raises ModelException: If the expression is not well-formed
+    """
+    return _compile(expression.strip())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compile(expression: str)->Check:
+    parser = _Parser(expression)
+    source = (
+        "def check(v):\n"
+        "    try:\n"
+        f"        return bool({parser.parse().source})\n"
+        "    except (TypeError, ValueError, AttributeError, LookupError, ArithmeticError):\n"
+        "        return False\n"
+    )
+    namespace = dict(_HELPERS, **parser.constants)
+    exec(compile(source, f"<check {expression!r}>", 'exec'), namespace)
+    return namespace['check']
+
+
+def parse_comparison(expression: str)->Optional[Comparison]:
+    """
+    Get the comparison a check makes between the value being tested and a literal, e.g. for
+    `< 150` or `@ >= 0`, or None if the check is anything else
+
+    :raises ModelException: If the expression is not well-formed
+    """
+    return _Parser(expression.strip()).parse().comparison
+
+
+@dataclass(frozen=True, slots=True)
+class _Code:
+    source: str
+    """
+    The Python source of an expression, in terms of the value `v`
+    """
+    literal: Tuple = ()
+    """
+    The value, in a tuple, if the expression is a literal
+    """
+    comparison: Optional[Comparison] = None
+
+
+_VALUE = _Code('v')
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+    | (?P<operator><=|>=|==|!=|<|>|[-+*/%().@])
+    | (?P<variable>\$[A-Za-z_]\w*)
+    | (?P<name>[A-Za-z_]\w*)
+)''', re.VERBOSE)
+
+_REGEX = re.compile(r'\s*/((?:\\.|[^/\\])*)/([imsx]*)')
+
+_REGEX_FLAGS = {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL, 'x': re.VERBOSE}
+
+_VARIABLES = {
+    '$length': 'len(v)',
+    '$now': '_now()',
+    '$today': '_today()',
+}
+
+_KEYWORDS = {'true': True, 'false': False, 'null': None}
+
+
+class _Parser:
+    """
+    A recursive-descent parser which translates a check expression into Python source
+    """
+    def __init__(self, expression: str):
+        self._expression = expression
+        self._position = 0
+        self._token: Optional[Tuple[str,str]] = None
+        self.constants: Dict[str,Any] = {}
+        """
+        Values the source refers to, such as compiled regular expressions, by name
+        """
+
+    def parse(self)->_Code:
+        if not self._expression:
+            raise self._error("is empty")
+        code = self._or()
+        token = self._peek()
+        if token is not None:
+            raise self._error(f"has unexpected {token[1]!r}")
+        return code
+
+    def _error(self, problem: str)->ModelException:
+        return ModelException(f"Check {self._expression!r} {problem}")
+
+    def _peek(self)->Optional[Tuple[str,str]]:
+        if self._token is None and self._expression[self._position:].strip():
+            match = _TOKEN.match(self._expression, self._position)
+            if match is None:
+                raise self._error(f"has unexpected {self._expression[self._position:].strip()[0]!r}")
+            self._position = match.end()
+            self._token = (match.lastgroup, match[match.lastgroup]) # type: ignore
+        return self._token
+
+    def _peek_operator(self)->Optional[str]:
+        token = self._peek()
+        return token[1] if token is not None and token[0] == 'operator' else None
+
+    def _peek_name(self)->Optional[str]:
+        token = self._peek()
+        return token[1] if token is not None and token[0] == 'name' else None
+
+    def _take(self)->Tuple[str,str]:
+        token = self._peek()
+        if token is None:
+            raise self._error("ends unexpectedly")
+        self._token = None
+        return token
+
+    def _or(self)->_Code:
+        code = self._and()
+        while self._peek_name() == 'or':
+            self._take()
+            code = _Code(f"({code.source} or {self._and().source})")
+        return code
+
+    def _and(self)->_Code:
+        code = self._not()
+        while self._peek_name() == 'and':
+            self._take()
+            code = _Code(f"({code.source} and {self._not().source})")
+        return code
+
+    def _not(self)->_Code:
+        if self._peek_name() == 'not':
+            self._take()
+            return _Code(f"(not {self._not().source})")
+        if self._peek_operator() in _COMPARISONS:
+            # The value is the first operand, e.g. `< 1 or > 5`
+            return self._comparison(_VALUE)
+        return self._comparison(self._additive())
+
+    def _comparison(self, left: _Code)->_Code:
+        """
+        Parse the rest of a (possibly chained) comparison, given its first operand
+        """
+        parts = [left.source]
+        operands = [left]
+        operators = []
+        while self._peek_operator() in _COMPARISONS:
+            operators.append(self._take()[1])
+            operands.append(self._additive())
+            parts += [operators[-1], operands[-1].source]
+        if not operators:
+            return left
+        comparison = None
+        if len(operators) == 1 and operands[0] is _VALUE and operands[1].literal:
+            operand = operands[1].literal[0]
+            if isinstance(operand, (int, float, str)) and not isinstance(operand, bool):
+                comparison = Comparison(operators[0], operand)
+        return _Code(f"({' '.join(parts)})", comparison=comparison)
+
+    def _additive(self)->_Code:
+        code = self._multiplicative()
+        while self._peek_operator() in ('+', '-'):
+            op = self._take()[1]
+            code = _Code(f"({code.source} {op} {self._multiplicative().source})")
+        return code
+
+    def _multiplicative(self)->_Code:
+        code = self._unary()
+        while self._peek_operator() in ('*', '/', '%'):
+            op = self._take()[1]
+            code = _Code(f"({code.source} {op} {self._unary().source})")
+        return code
+
+    def _unary(self)->_Code:
+        if self._peek_operator() == '-':
+            self._take()
+            code = self._unary()
+            if code.literal and isinstance(code.literal[0], (int, float)) and not isinstance(code.literal[0], bool):
+                return _Code(repr(-code.literal[0]), (-code.literal[0],))
+            return _Code(f"(-{code.source})")
+        return self._member(self._primary())
+
+    def _member(self, code: _Code)->_Code:
+        while self._peek_operator() == '.':
+            self._take()
+            name = self._peek_name()
+            if name is None or name.startswith('_'):
+                raise self._error("has a member access without a valid name")
+            self._take()
+            code = _Code(f"_member({code.source}, {name!r})")
+        return code
+
+    def _primary(self)->_Code:
+        kind, text = self._take()
+        if kind == 'number':
+            value = ast.literal_eval(text)
+            return _Code(repr(value), (value,))
+        elif kind == 'string':
+            try:
+                value = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                raise self._error(f"has an invalid string {text}") from None
+            return _Code(repr(value), (value,))
+        elif kind == 'variable':
+            try:
+                return _Code(_VARIABLES[text])
+            except KeyError:
+                raise self._error(f"uses unknown variable {text}") from None
+        elif text == '@':
+            return _VALUE
+        elif text == '(':
+            code = self._or()
+            if self._peek_operator() != ')':
+                raise self._error("is missing a ')'")
+            self._take()
+            return _Code(code.source, code.literal)
+        elif text in _KEYWORDS:
+            return _Code(repr(_KEYWORDS[text]), (_KEYWORDS[text],))
+        elif text == 'regex':
+            return self._regex()
+        raise self._error(f"has unexpected {text!r}")
+
+    def _regex(self)->_Code:
+        match = _REGEX.match(self._expression, self._position)
+        if match is None:
+            raise self._error("has a regex without a /pattern/")
+        self._position = match.end()
+        flags = 0
+        for flag in match[2]:
+            flags |= _REGEX_FLAGS[flag]
+        try:
+            pattern = re.compile(match[1].replace('\\/', '/'), flags)
+        except re.error as e:
+            raise self._error(f"has an invalid regex: {e}") from None
+        name = f"_r{len(self.constants)}"
+        self.constants[name] = pattern
+        return _Code(f"({name}.fullmatch(v) is not None)")
+
+
+def _member(value, name: str):
+    if isinstance(value, Mapping):
+        return value[name]
+    return getattr(value, name)
+
+
+_HELPERS: Dict[str,Any] = {
+    '_member': _member,
+    '_now': datetime.now,
+    '_today': date.today,
+}
@@ -0,0 +1,189 @@
+"""
+Generating Python classes for struct typedefs at runtime.
+
+A `ClassCompiler` generates the source of a class per named struct, with `__slots__` for its
+fields (named for its denomination, e.g. from `py.name`, and leaving out ignored fields) and a
+generated `__init__`, `__eq__`, `__repr__`, and `__match_args__`, and compiles it once. The
+classes are as fast to instantiate, and as small, as hand-written slotted classes: `__init__`
+assigns each field directly, and instances have no `__dict__`.
+
+The `impl` tag chooses the kind of class:
+
+- `dataclass` or `slots` (the default): a mutable class, which is unhashable, like a dataclass
+- `frozen`: a class whose fields can't be reassigned, and which is hashable
+
+Other values are left to other tools, and give the default. Structs which inherit from another
+struct become subclasses of its class, adding slots for their own fields.
+
+The parameters of `__init__` are the fields, in the order they are inherited. Nullable fields
+default to None, as long as only nullable fields come after them. Values are stored as they are
+given; see `ordain.validation` and `ordain.convert` for checking and converting them.
+
+Instances can be copied. They can only be pickled if the compiler is given a module to put the
+classes in, since pickle finds a class by its module and name.
+"""
+from .codegen import FunctionCompiler, struct_field_views
+from .denominational_view import DenominationalTypedefView, ViewCache
+from .denominations import Denomination, KnownDenomination
+from .exceptions import ModelException
+from .model import *
+from dataclasses import FrozenInstanceError
+from typing import Dict, List, Mapping, Optional
+import importlib
+import keyword
+
+IMPLS: Dict[str,bool] = {
+    'dataclass': False,
+    'slots': False,
+    'frozen': True,
+}
+"""
+Whether the class is frozen, for each `impl` tag value a class can be generated for
+"""
+
+
+class ClassCompiler(FunctionCompiler):
+    """
+    Compiles and caches the classes for the structs of a single model and denomination.
+    """
+    def __init__(self, model: Mapping[str,Typedef], denomination: Optional[Denomination] = None, views: Optional[ViewCache] = None, frozen: bool = False, module: Optional[str] = None):
+        """
+        :param denomination: The denomination for names, ignored fields, and `impl` tags; the
+            Python base denomination by default
+        :param views: A view cache for the same model and denomination to share, if there is one
+        :param frozen: Make every class frozen, whatever its `impl` tag
+        :param module: The name of a module to put the classes in, as attributes named for the
+            classes (replacing any already there), so instances can be pickled. By default, the
+            classes aren't in a module.
+        """
+        super().__init__(model, KnownDenomination.PythonBase() if denomination is None else denomination, views, _HELPERS)
+        self._frozen = frozen
+        self._module = _UNPICKLABLE if module is None else module
+        self._install = None if module is None else self._constant(importlib.import_module(module))
+
+    def class_for(self, name: str)->type:
+        """
+        Get the class for a named struct typedef, generating it (and the classes it inherits from)
+        if needed
+
+        :raises ModelException: If the typedef is undefined, ignored, or not a struct, or a name
+            is not a valid Python identifier
+        """
+        return self._get('class', name)
+
+    def is_frozen(self, view: DenominationalTypedefView)->bool:
+        """
+        Decide if the class for a typedef is frozen
+        """
+        impl = view.impl
+        return self._frozen or (impl is not None and IMPLS.get(str(impl.value), False))
+
+    def _write(self, function: str, kind: str, view: DenominationalTypedefView)->str:
+        typedef = view.typedef
+        if view.is_ignored:
+            raise ModelException(f"Cannot generate a class for {view.path}: it is ignored")
+        if not isinstance(typedef.type, StructType):
+            raise ModelException(f"Cannot generate a class for {view.path}: it is not a struct")
+        frozen = self.is_frozen(view)
+        inherited: Dict[str,DenominationalTypedefView] = {}
+        base = 'object'
+        if typedef.parent is not None:
+            parent = self._views.view(typedef.parent)
+            if self.is_frozen(parent) and not frozen:
+                raise ModelException(f"Cannot generate a class for {view.path}: a mutable class can't inherit from a frozen one")
+            self._get(kind, typedef.parent)
+            base = self._functions[kind, typedef.parent]
+            inherited = struct_field_views(parent, self._views)
+        fields = struct_field_views(view, self._views)
+        names = [_identifier(field.name, field.path) for field in fields.values()]
+        if len(set(names)) != len(names):
+            raise ModelException(f"Cannot generate a class for {view.path}: its fields' names are not unique")
+        inherited_names = {field.name for field in inherited.values()}
+        slots = [name for name in names if name not in inherited_names]
+        return _ClassWriter(function, _identifier(view.name, view.path), base, self._module, self._install, frozen, names, slots, fields).source
+
+
+def _identifier(name: str, path: str)->str:
+    if not name.isidentifier() or keyword.iskeyword(name) or name.startswith('__'):
+        raise ModelException(f"Cannot generate a class for {path}: {name!r} is not a valid attribute name, so give it a py.name")
+    return name
+
+
+class _ClassWriter:
+    """
+    Generates the source of a class, which is assigned to `function` in the namespace, and to its
+    name in the module referred to by `install`, if there is one
+    """
+    def __init__(self, function: str, name: str, base: str, module: str, install: Optional[str], frozen: bool, names: List[str], slots: List[str], fields: Mapping[str,DenominationalTypedefView]):
+        # Only __init__ has parameters named for the fields
+        self_name = 'self' if 'self' not in names else '_self'
+        defaults = len(names)
+        for field in reversed(list(fields.values())):
+            required = field.tag_search_top('required')
+            if not isinstance(field.typedef.type, NullableType) or (required is not None and required.value is not False):
+                break
+            defaults -= 1
+        parameters = [self_name, *(name if i < defaults else f"{name}=None" for i, name in enumerate(names))]
+        lines = [
+            f"class {function}({base}):",
+            f"    __slots__ = {tuple(slots)!r}",
+            f"    __qualname__ = {name!r}",
+            f"    __module__ = {module!r}",
+            f"    __match_args__ = {tuple(names)!r}",
+            "",
+            f"    def __init__({', '.join(parameters)}):",
+        ]
+        if frozen:
+            lines += [f"        {function}_{name}({self_name}, {name})" for name in names]
+        else:
+            lines += [f"        {self_name}.{name} = {name}" for name in names]
+        if not names:
+            lines.append("        pass")
+        values = ''.join(f"self.{name}, " for name in names)
+        other_values = ''.join(f"other.{name}, " for name in names)
+        fields_repr = ', '.join(f"{name}={{self.{name}!r}}" for name in names)
+        lines += [
+            "",
+            "    def __eq__(self, other):",
+            "        if other.__class__ is not self.__class__:",
+            "            return NotImplemented",
+            f"        return ({values}) == ({other_values})",
+            "",
+            "    def __repr__(self):",
+            f"        return f{f'{name}({fields_repr})'!r}",
+            "",
+            # Restoring the slots' state would go through a frozen class's __setattr__
+            "    def __reduce__(self):",
+            f"        return (self.__class__, ({values}))",
+        ]
+        if frozen:
+            lines += [
+                "",
+                "    def __hash__(self):",
+                f"        return hash(({values}))",
+                "",
+                "    def __setattr__(self, name, value):",
+                "        raise _FrozenInstanceError(f'cannot assign to field {name!r}')",
+                "",
+                "    def __delattr__(self, name):",
+                "        raise _FrozenInstanceError(f'cannot delete field {name!r}')",
+                "",
+                # Assigning through the slots' descriptors is faster than object.__setattr__
+                *(f"{function}_{name} = {function}.{name}.__set__" for name in names),
+            ]
+        else:
+            lines.append("    __hash__ = None")
+        lines.append(f"{function}.__name__ = {name!r}")
+        if install is not None:
+            lines.append(f"setattr({install}, {name!r}, {function})")
+        self.source = '\n'.join(lines)
+
+
+_UNPICKLABLE = '<ordain.classes>'
+"""
+The `__module__` of classes which aren't in a module, which makes pickling them fail clearly
+"""
+
+_HELPERS = {
+    '_FrozenInstanceError': FrozenInstanceError,
+}
@@ -0,0 +1,181 @@
+"""
+Generating and compiling Python functions specialized for the typedefs of a model.
+"""
+from .denominational_view import DenominationalTypedefView, ViewCache
+from .denominations import Denomination
+from .exceptions import ModelException
+from .model import *
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+import itertools
+import re
+
+
+class FunctionCompiler:
+    """
+    Base for compilers which generate Python source for a function per typedef (of each kind the
+    compiler makes, e.g. `encode` and `decode`), with its tags already resolved for one
+    denomination, and compile it once.
+
+    Functions are compiled the first time they are asked for, along with the functions of any
+    named typedefs they refer to (which they call by name, so recursive typedefs work). Subclasses
+    implement `_write`. If the model changes, use a new compiler.
+    """
+    def __init__(self, model: Mapping[str,Typedef], denomination: Denomination, views: Optional[ViewCache] = None, helpers: Mapping[str,Any] = {}):
+        """
+        :param views: A view cache for the same model and denomination to share, if there is one
+        :param helpers: Values the generated source can refer to, by name
+        """
+        self._views = ViewCache(model, denomination) if views is None else views
+        self._namespace: Dict[str,Any] = dict(helpers)
+        # The generated function for each kind and named typedef
+        self._functions: Dict[Tuple[str,str],str] = {}
+        self._pending: List[Tuple[str,str,DenominationalTypedefView]] = []
+        self._compiled: Dict[Tuple[str,str],Callable] = {}
+        # Functions for anonymous typedefs, keeping the typedef alive so its id isn't reused
+        self._anonymous: Dict[Tuple[str,int],Tuple[Typedef,Callable]] = {}
+        self._sources: List[str] = []
+        # Numbers the generated names, so they stay unique even after a failed compile
+        self._names = itertools.count()
+
+    @property
+    def model(self)->Mapping[str,Typedef]:
+        return self._views.model
+
+    @property
+    def denomination(self)->Denomination:
+        return self._views.denomination
+
+    @property
+    def views(self)->ViewCache:
+        """
+        The views used to resolve tags
+        """
+        return self._views
+
+    @property
+    def source(self)->str:
+        """
+        The source of every function generated so far, for debugging
+        """
+        return '\n\n'.join(self._sources)
+
+    def _write(self, function: str, kind: str, view: DenominationalTypedefView)->str:
+        """
+        Generate the source of a function of a kind for a typedef
+
+        :raises ModelException: If the typedef is not supported
+        """
+        raise NotImplementedError
+
+    def _get(self, kind: str, typedef: Union[str,Typedef])->Callable:
+        """
+        Get the function of a kind for a named typedef, or for any typedef (such as a struct field)
+        from the model, compiling it if needed
+
+        :raises ModelException: If the typedef is not supported, or refers to an undefined typedef
+        """
+        if isinstance(typedef, Typedef) and self.model.get(typedef.name) is not typedef:
+            return self._get_anonymous(kind, typedef)
+        name = typedef if isinstance(typedef, str) else typedef.name
+        try:
+            return self._compiled[kind, name]
+        except KeyError:
+            pass
+        if name not in self.model:
+            raise ModelException(f"Undefined typedef: {name}")
+        function = self._function(kind, name)
+        self._compile_pending()
+        compiled = self._compiled[kind, name] = self._namespace[function]
+        return compiled
+
+    def _get_anonymous(self, kind: str, typedef: Typedef)->Callable:
+        try:
+            return self._anonymous[kind, id(typedef)][1]
+        except KeyError:
+            pass
+        function = f"_{kind}_{next(self._names)}_anonymous"
+        view = DenominationalTypedefView(typedef.name, typedef, self.model, self.denomination, self._views)
+        self._pending.append((function, kind, view))
+        self._compile_pending()
+        compiled = self._namespace[function]
+        self._anonymous[kind, id(typedef)] = (typedef, compiled)
+        return compiled
+
+    def _function(self, kind: str, name: str)->str:
+        """
+        Get the name of the generated function of a kind for a named typedef, queueing it to be
+        compiled
+        """
+        try:
+            return self._functions[kind, name]
+        except KeyError:
+            pass
+        function = self._functions[kind, name] = f"_{kind}_{next(self._names)}_{re.sub(r'\W', '_', name)}"
+        self._pending.append((function, kind, self._views.view(name)))
+        return function
+
+    def _constant(self, value)->str:
+        """
+        Make a value available to the generated source, getting the name to refer to it by
+        """
+        name = f"_k{next(self._names)}"
+        self._namespace[name] = value
+        return name
+
+    def _compile_pending(self):
+        defined = []
+        try:
+            while self._pending:
+                function, kind, view = self._pending.pop()
+                source = self._write(function, kind, view)
+                exec(compile(source, f"<{kind} {view.path}>", 'exec'), self._namespace)
+                defined.append(function)
+                self._sources.append(source)
+        except BaseException:
+            # Forget everything from this attempt, since the functions refer to each other
+            failed = set(defined) | {function for function, _, _ in self._pending}
+            self._pending.clear()
+            for function in defined:
+                del self._namespace[function]
+            self._functions = {key: function for key, function in self._functions.items() if function not in failed and function in self._namespace}
+            raise
+
+
+def named_reference(typedef: Typedef, type: Type)->Optional[str]:
+    """
+    Get the named typedef whose generated function handles a typedef's (non-nullable) type, if
+    the type only refers to it: a reference, or a struct which only inherits its fields
+    """
+    if isinstance(type, NamedTypeReference):
+        return type.name_ref
+    if isinstance(type, StructType) and typedef.parent is not None and not type.fields:
+        return typedef.parent
+    return None
+
+
+def struct_field_views(view: DenominationalTypedefView, views: ViewCache)->Dict[str,DenominationalTypedefView]:
+    """
+    Get the views of the fields of a (possibly nullable) struct which aren't ignored, including
+    the fields it inherits, by key. Fields come in the order they are inherited.
+    """
+    fields: Dict[str,DenominationalTypedefView] = {}
+    parent = view.typedef.parent
+    if parent is not None:
+        for ancestor in reversed((parent, *views.lineage.ancestors(parent))):
+            fields.update(_own_field_views(views.view(ancestor), views))
+    fields.update(_own_field_views(view, views))
+    return fields
+
+
+def _own_field_views(view: DenominationalTypedefView, views: ViewCache)->Dict[str,DenominationalTypedefView]:
+    type = view.typedef.type
+    if isinstance(type, NullableType):
+        type = type.of
+    if not isinstance(type, StructType):
+        return {}
+    fields = {}
+    for key, field in type.fields.items():
+        field_view = views.field_view(view.path, key, field)
+        if not field_view.is_ignored:
+            fields[key] = field_view
+    return fields
@@ -0,0 +1,315 @@
+"""
+Converting values to and from their representation in a denomination, such as JSON.
+
+Modeled on cattrs converters: a `Converter` generates Python source for an encoder and a decoder
+per typedef, with field names and `repr` tags already resolved for its denomination, and compiles
+them once, so converting a large payload only runs straight-line generated code.
+
+On the Python side, structs are dicts keyed by field key, and scalars are native values. Encoding
+gives a representation made of JSON-compatible values, with struct fields under their
+denominational names (e.g. from `json.name`):
+
+- `datetime`, `date`, and `time` are ISO 8601 strings
+- `decimal` is a string, so no precision is lost
+- `binary` is a base64 string
+- lists and arrays are lists, and mappings are dicts
+- everything else is left as it is
+
+The `repr` tag chooses a different representation for a typedef or field, from `REPRS`:
+
+- `inline`: put the fields of a (non-nullable) struct field in the outer struct
+- `json`: the usual representation, encoded as a JSON string
+- `py.pickle`: the Python value, pickled. Only decode pickles from trusted sources.
+- `hex`: binary as a hex string
+- `timestamp`: a datetime as a POSIX timestamp, decoded as UTC
+
+Other reprs can be added with `register_repr`; any repr without a registered conversion is
+ignored, like any other tag a target doesn't understand.
+
+Values are expected to be valid (see `ordain.validation`); converting an invalid value raises
+whatever the conversion does, such as `KeyError` for a missing field.
+"""
+from .codegen import FunctionCompiler, named_reference, struct_field_views
+from .denominational_view import DenominationalTypedefView, ViewCache
+from .denominations import Denomination
+from .exceptions import ModelException
+from .model import *
+from dataclasses import dataclass
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+import base64
+import json
+import pickle
+
+Conversion = Callable[[Any],Any]
+
+
+@dataclass(frozen=True, slots=True)
+class Repr:
+    encode: Conversion
+    decode: Conversion
+    wrap: bool = False
+    """
+    If true, the conversions wrap the usual representation (e.g. `json` encodes it as a string);
+    otherwise, they replace it, and take or give the Python value
+    """
+
+
+def _timestamp(value: datetime)->float:
+    return value.timestamp()
+
+
+def _from_timestamp(value: float)->datetime:
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def _json_dumps(value)->str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+REPRS: Dict[str,Repr] = {
+    'json': Repr(_json_dumps, json.loads, wrap=True),
+    'py.pickle': Repr(pickle.dumps, pickle.loads),
+    'hex': Repr(bytes.hex, bytes.fromhex),
+    'timestamp': Repr(_timestamp, _from_timestamp),
+}
+"""
+The conversions for each `repr` tag value, apart from `inline`
+"""
+
+
+def register_repr(name: str, encode: Conversion, decode: Conversion, wrap: bool = False):
+    """
+    Add (or replace) the conversions for a `repr` tag value. Converters which have already
+    generated their functions are not affected.
+    """
+    REPRS[name] = Repr(encode, decode, wrap)
+
+
+class Converter(FunctionCompiler):
+    """
+    Compiles and caches the encoders and decoders for a single model and denomination.
+    """
+    def __init__(self, model: Mapping[str,Typedef], denomination: Denomination, views: Optional[ViewCache] = None):
+        """
+        :param views: A view cache for the same model and denomination to share, if there is one
+        """
+        super().__init__(model, denomination, views, _HELPERS)
+        self._reprs: Dict[Tuple[str,str],str] = {}
+
+    def encoder(self, typedef: Union[str,Typedef])->Conversion:
+        """
+        Get the encoder for a named typedef, or for any typedef (such as a struct field) from the
+        model
+
+        :raises ModelException: If the typedef refers to an undefined typedef, or inlines a field
+            which is not a struct
+        """
+        return self._get('encode', typedef)
+
+    def decoder(self, typedef: Union[str,Typedef])->Conversion:
+        """
+        Get the decoder for a named typedef, or for any typedef (such as a struct field) from the
+        model
+
+        :raises ModelException: If the typedef refers to an undefined typedef, or inlines a field
+            which is not a struct
+        """
+        return self._get('decode', typedef)
+
+    def encode(self, typedef: Union[str,Typedef], value):
+        return self.encoder(typedef)(value)
+
+    def decode(self, typedef: Union[str,Typedef], value):
+        return self.decoder(typedef)(value)
+
+    def _repr(self, name: str, kind: str)->str:
+        """
+        Get the name of the conversion of a kind for a repr
+        """
+        try:
+            return self._reprs[name, kind]
+        except KeyError:
+            pass
+        repr = REPRS[name]
+        constant = self._reprs[name, kind] = self._constant(repr.encode if kind == 'encode' else repr.decode)
+        return constant
+
+    def _write(self, function: str, kind: str, view: DenominationalTypedefView)->str:
+        return _ConversionWriter(self, function, kind, view).source
+
+
+class _ConversionWriter:
+    """
+    Generates the source of the encoder or decoder for one typedef, as a single expression.
+
+    Nested structs which aren't named typedefs get their own functions, since their value is
+    used once for each field.
+    """
+    def __init__(self, converter: Converter, function: str, kind: str, view: DenominationalTypedefView):
+        self._converter = converter
+        self._function = function
+        self._kind = kind
+        self._encode = kind == 'encode'
+        self._variables = 0
+        self._functions: List[str] = []
+        expression = self._typedef(view, 'v')
+        self.source = '\n\n'.join([*self._functions, f"def {function}(v):\n    return {expression}"])
+
+    def _variable(self)->str:
+        self._variables += 1
+        return f"v{self._variables}"
+
+    def _typedef(self, view: DenominationalTypedefView, value: str)->str:
+        """
+        Get an expression converting a value of a typedef
+        """
+        type = view.typedef.type
+        nullable = isinstance(type, NullableType)
+        if nullable:
+            type = type.of
+        delegate = named_reference(view.typedef, type)
+        # A delegate's own function applies the reprs it passes down
+        repr = self._repr_of(view, delegate is None)
+        if not nullable:
+            return self._converted(view, type, delegate, repr, value)
+        return self._nullable(value, lambda variable: self._converted(view, type, delegate, repr, variable))
+
+    def _nullable(self, value: str, convert: Callable[[str],str])->str:
+        """
+        Get an expression converting a value which may be None, given a function getting the
+        expression converting a variable which isn't
+        """
+        variable = value if value.isidentifier() else self._variable()
+        converted = convert(variable)
+        if converted == variable:
+            return value
+        elif variable == value:
+            return f"(None if {value} is None else {converted})"
+        return f"(None if ({variable} := {value}) is None else {converted})"
+
+    def _repr_of(self, view: DenominationalTypedefView, inheritable: bool)->Optional[str]:
+        tag = view.tag_search_top('repr', inheritable=inheritable)
+        if tag is None or str(tag.value) not in REPRS:
+            return None
+        return str(tag.value)
+
+    def _converted(self, view: DenominationalTypedefView, type: Type, delegate: Optional[str], repr: Optional[str], value: str)->str:
+        if repr is not None:
+            conversion = self._converter._repr(repr, self._kind)
+            if not REPRS[repr].wrap:
+                return f"{conversion}({value})"
+            if not self._encode:
+                value = f"{conversion}({value})"
+        if delegate is not None:
+            converted = f"{self._converter._function(self._kind, delegate)}({value})"
+        else:
+            converted = self._type(view, type, value)
+        if repr is not None and self._encode:
+            converted = f"{conversion}({converted})"
+        return converted
+
+    def _type(self, view: DenominationalTypedefView, type: Type, value: str)->str:
+        if isinstance(type, ScalarType):
+            return self._scalar(type, value)
+        elif isinstance(type, EnumType):
+            return self._scalar(type.of, value)
+        elif isinstance(type, StructType):
+            if value.isidentifier():
+                return self._struct(view, value)
+            function = f"{self._function}_{len(self._functions)}"
+            self._functions.append(f"def {function}(v):\n    return {self._struct(view, 'v')}")
+            return f"{function}({value})"
+        elif isinstance(type, CollectionType):
+            item = self._variable()
+            converted = self._typedef(self._inline_view(view, type.of, '[]'), item)
+            if converted == item:
+                return f"list({value})"
+            return f"[{converted} for {item} in {value}]"
+        elif isinstance(type, MappingType):
+            key, item = self._variable(), self._variable()
+            converted_key = self._key(self._inline_view(view, type.keys, '[key]'), key)
+            converted = self._typedef(self._inline_view(view, type.value, '[value]'), item)
+            if converted_key == key and converted == item:
+                return f"dict({value})"
+            return f"{{{converted_key}: {converted} for {key}, {item} in {value}.items()}}"
+        elif isinstance(type, NullableType):
+            return self._nullable(value, lambda variable: self._type(view, type.of, variable))
+        raise ModelException(f"Cannot convert typedef {view.path}: unsupported type {type!r}")
+
+    def _scalar(self, scalar: ScalarType, value: str)->str:
+        conversion = (_ENCODERS if self._encode else _DECODERS).get(scalar)
+        return value if conversion is None else conversion.format(value)
+
+    def _key(self, view: DenominationalTypedefView, key: str)->str:
+        """
+        Get an expression converting a mapping key. Decoded keys may have been strings, since
+        JSON object keys are.
+        """
+        type = view.typedef.type
+        if isinstance(type, EnumType):
+            type = type.of
+        if not self._encode and type in (ScalarType.int, ScalarType.float):
+            return f"{type.value}({key})"
+        return self._typedef(view, key)
+
+    def _struct(self, view: DenominationalTypedefView, value: str)->str:
+        items = []
+        for key, field in struct_field_views(view, self._converter.views).items():
+            tag = field.tag_search_top('repr')
+            if tag is not None and str(tag.value) == 'inline':
+                field_type = field.typedef.type
+                if not isinstance(field_type, StructType):
+                    raise ModelException(f"Cannot inline {field.path}: only non-nullable structs can be inlined")
+                if self._encode:
+                    items.append(f"**{self._typedef(field, f'{value}[{key!r}]')}")
+                else:
+                    # The fields are in the outer struct's representation
+                    items.append(f"{key!r}: {self._typedef(field, value)}")
+                continue
+            nullable = isinstance(field.typedef.type, NullableType)
+            source_key = key if self._encode else field.name
+            source = f"{value}.get({source_key!r})" if nullable else f"{value}[{source_key!r}]"
+            target_key = field.name if self._encode else key
+            items.append(f"{target_key!r}: {self._typedef(field, source)}")
+        return f"{{{', '.join(items)}}}"
+
+    def _inline_view(self, view: DenominationalTypedefView, typedef: Typedef, suffix: str)->DenominationalTypedefView:
+        return DenominationalTypedefView(typedef.name, typedef, view.model, view.denomination, self._converter.views, f"{view.path}{suffix}")
+
+
+def _b64encode(value: bytes)->str:
+    return base64.b64encode(value).decode('ascii')
+
+
+def _decimal(value)->Decimal:
+    # Floats go through their shortest repr, so 0.1 is Decimal('0.1')
+    return Decimal(repr(value)) if isinstance(value, float) else Decimal(value)
+
+
+_ENCODERS: Dict[ScalarType,str] = {
+    ScalarType.binary: "_b64encode({0})",
+    ScalarType.date: "{0}.isoformat()",
+    ScalarType.datetime: "{0}.isoformat()",
+    ScalarType.decimal: "str({0})",
+    ScalarType.time: "{0}.isoformat()",
+}
+
+_DECODERS: Dict[ScalarType,str] = {
+    ScalarType.binary: "_b64decode({0})",
+    ScalarType.date: "_date({0})",
+    ScalarType.datetime: "_datetime({0})",
+    ScalarType.decimal: "_decimal({0})",
+    ScalarType.float: "float({0})",
+    ScalarType.time: "_time({0})",
+}
+
+_HELPERS = {
+    '_b64encode': _b64encode,
+    '_b64decode': base64.b64decode,
+    '_date': date.fromisoformat,
+    '_datetime': datetime.fromisoformat,
+    '_decimal': _decimal,
+    '_time': time.fromisoformat,
+}
@@ -1,16 +1,44 @@
 from .model import *
 from .denominations import Denomination
+from .lineage import Lineage
+from .exceptions import ModelException
+from types import MappingProxyType
+
+def is_ignored_by(denomination: Denomination, ignore: Optional[Tag], not_if: Optional[Tag], only_if: Optional[Tag])->bool:
+    """
+    Decide if a typedef should be ignored by a denomination, given its top `ignore` tag and its
+    top universal `not-if` and `only-if` tags.
+    """
+    # If any ignore tags are present in the filtered tag view, ignore
+    if ignore is not None and ignore.value:
+        return True
+    # If there is a universal not-if tag that list one of our recognized cannons, ignore
+    # (If there are multiple not-if tags, only the last one is used)
+    if not_if is not None:
+        if not denomination.recognized_cannons.isdisjoint(str(not_if.value).split()):
+            return True
+    # If there is an only-if tag, and it does not list any cannons we recognize, ignore
+    # (If there are multiple only-if tags, only the last one is used)
+    if only_if is not None:
+        if denomination.recognized_cannons.isdisjoint(str(only_if.value).split()):
+            return True
+    # If no reason was found to ignore, then don't
+    return False
+
 
 class DenominationalTypedefView:
     """
     This ia a wrapper around a typedef adjusted for a specific cannon hierarchy.
     """
-    def __init__(self, name: str, typedef: Typedef, model: Mapping[str,Typedef], denomination: Denomination):
+    def __init__(self, name: str, typedef: Typedef, model: Mapping[str,Typedef], denomination: Denomination, cache: Optional["ViewCache"] = None, path: Optional[str] = None):
         self._name = name
         self._typedef = typedef
         self._model = model
         self._denomination = denomination
+        self._cache = cache
+        self._path = name if path is None else path
         self._tag_heritage = None
+        self._struct_field_views = None
     
     @classmethod
     def from_model(cls, name: str, model: Mapping[str,Typedef], denomination: Denomination):
@@ -25,24 +53,12 @@ class DenominationalTypedefView:
         """
         Indicates if this typedef should be ignored for the current denominational view
         """
-        # If any ignore tags are present in the filtered tag view, ignore
-        tag = self.tag_search_top('ignore')
-        if tag is not None and tag.value:
-            return True
-        # If there is a universal not-if tag that list one of our recognized cannons, ignore
-        # (If there are multiple not-if tags, only the last one is used)
-        tag = self.tag_search_top_universal('not-if')
-        if tag is not None:
-            if not set(str(tag.value).split()).union(self._denomination.recognized_cannons):
-                return True
-        # If there is an only-if tag, and it does not list any cannons we recognize, ignore
-        # (If there are multiple only-if tags, only the last one is used)
-        tag = self.tag_search_top_universal('only-if')
-        if tag is not None:
-            if set(str(tag.value).split()).union(self._denomination.recognized_cannons):
-                return True
-        # If no reason was found to ignore, then don't
-        return False
+        return is_ignored_by(
+            self._denomination,
+            self.tag_search_top('ignore'),
+            self.tag_search_top_universal('not-if'),
+            self.tag_search_top_universal('only-if'),
+        )
     
     @property
     def name(self)->str:
@@ -59,6 +75,13 @@ class DenominationalTypedefView:
         """
         return self._typedef
     
+    @property
+    def model(self)->Mapping[str,Typedef]:
+        """
+        The model used to look up parent typedefs
+        """
+        return self._model
+    
     @property
     def denomination(self):
         """
@@ -80,25 +103,48 @@ class DenominationalTypedefView:
 
         Only includes fields which should not be ignored.
         """
+        if self._struct_field_views is None:
+            fields = self._typedef.struct_fields
+            if fields is None:
+                return None
+            views = {}
+            for key in fields:
+                view = self.field_view(key)
+                if not view.is_ignored:
+                    views[key] = view
+            self._struct_field_views = MappingProxyType(views)
+        return self._struct_field_views
+    
+    def field_view(self, key: str)->"DenominationalTypedefView":
+        """
+        Get the denominational view for a single struct field, even if it should be ignored.
+
+        :raises KeyError: If there is no such field
+        """
         fields = self._typedef.struct_fields
         if fields is None:
-            return None
-        views = {}
-        for key, typedef in fields.items():
-            view = DenominationalTypedefView(key, typedef, self._model, self._denomination)
-            if not view.is_ignored:
-                views[key] = view
-        return views
+            raise KeyError(key)
+        if self._cache is not None:
+            return self._cache.field_view(self._path, key, fields[key])
+        return DenominationalTypedefView(key, fields[key], self._model, self._denomination, path=f"{self._path}.{key}")
+    
+    @property
+    def path(self)->str:
+        """
+        The dotted path of this typedef from the top of the model, e.g. `User.password`
+        """
+        return self._path
     
     @property
     def tag_heritage(self)->TagRepository:
+        """
+        The tags of this typedef merged with the tags of all its ancestors
+
+        :raises ModelException: If the inheritance chain refers to an undefined typedef or is cyclic
+        """
         if self._tag_heritage is None:
-            tags = self._typedef.tags
-            typedef = self._typedef
-            while typedef.parent is not None:
-                typedef = self._model[typedef.parent]
-                tags = typedef.tags.merge(tags)
-            self._tag_heritage = tags
+            lineage = self._cache.lineage if self._cache is not None else Lineage(self._model)
+            self._tag_heritage = lineage.heritage_of(self._typedef)
         return self._tag_heritage
     
     def tag_search_top(self, tag_name:str, filter_cannons: Optional[Collection[str]] = None, include_universal: bool = True, inheritable: bool = True)->Optional[Tag]:
@@ -115,7 +161,7 @@ class DenominationalTypedefView:
         if filter_cannons is None:
             filter_cannons = self._denomination.recognized_cannons
         tags = self.tag_heritage if inheritable else self._typedef.tags
-        return tags.filter(tag_name, filter_cannons, include_universal).get_top(*self._denomination.cannon_hierarchy)
+        return tags.filter_top(tag_name, filter_cannons, include_universal, self._denomination)
     
     def tag_search_all(self, tag_name:str, filter_cannons: Optional[Collection[str]] = None, include_universal: bool = True, inheritable: bool = True)->TagRepository:
         """
@@ -149,7 +195,7 @@ class DenominationalTypedefView:
         if filter_cannons is None:
             filter_cannons = self._denomination.recognized_cannons
         tags = self.tag_heritage if inheritable else self._typedef.tags
-        return tags.filter(tag_name, filter_cannons, include_universal).sort(*self._denomination.cannon_hierarchy)
+        return tags.filter(tag_name, filter_cannons, include_universal).sort(self._denomination)
     
     def tag_search_top_universal(self, tag_name:str, inheritable: bool = True)->Optional[Tag]:
         """
@@ -161,7 +207,7 @@ class DenominationalTypedefView:
         :param inheritable: Tags are considered inheritable by default, but inherited tags can be ignored if desired.
         """
         tags = self.tag_heritage if inheritable else self._typedef.tags
-        return tags.filter(tag_name).get_top()
+        return tags.filter_top(tag_name)
     
     def tag_search_all_universal(self, tag_name:str, inheritable: bool = True)->TagRepository:
         """
@@ -187,4 +233,88 @@ class DenominationalTypedefView:
         :param inheritable: Tags are considered inheritable by default, but inherited tags can be ignored if desired.
         """
         tags = self.tag_heritage if inheritable else self._typedef.tags
-        return tags.filter(tag_name).sort()
\ No newline at end of file
+        return tags.filter(tag_name).sort()
+
+
+class ViewCache:
+    """
+    Hands out denominational views for a single model and denomination, creating exactly one view
+    per typedef path. Since views cache their tag heritage and field views, sharing them means
+    nested traversals only do that work once.
+
+    If the model changes, call `invalidate` to drop any views which may be out of date.
+    """
+    def __init__(self, model: Mapping[str,Typedef], denomination: Denomination, lineage: Optional[Lineage] = None):
+        self._model = model
+        self._denomination = denomination
+        self._lineage = Lineage(model) if lineage is None else lineage
+        self._views: Dict[str,DenominationalTypedefView] = {}
+
+    @property
+    def model(self)->Mapping[str,Typedef]:
+        return self._model
+
+    @property
+    def denomination(self)->Denomination:
+        return self._denomination
+
+    @property
+    def lineage(self)->Lineage:
+        """
+        The inheritance table for the model. This does not depend on the denomination, so it may 
+        be shared between caches for the same model.
+        """
+        return self._lineage
+
+    def view(self, name: str)->DenominationalTypedefView:
+        """
+        Get the view for a named typedef in the model
+        """
+        try:
+            return self._views[name]
+        except KeyError:
+            view = DenominationalTypedefView(name, self._model[name], self._model, self._denomination, self)
+            return self._views.setdefault(name, view)
+
+    def field_view(self, parent_path: str, key: str, typedef: Typedef)->DenominationalTypedefView:
+        """
+        Get the view for a struct field of the typedef at `parent_path`
+        """
+        path = f"{parent_path}.{key}"
+        try:
+            return self._views[path]
+        except KeyError:
+            view = DenominationalTypedefView(key, typedef, self._model, self._denomination, self, path)
+            return self._views.setdefault(path, view)
+
+    def invalidate(self, *names: str):
+        """
+        Drop cached views after the model has changed.
+
+        :param names: The names of the typedefs which were added, changed, or removed. Views for 
+            these typedefs, their fields, and anything inheriting from them are dropped. If no 
+            names are given, all views are dropped.
+        """
+        self._lineage.invalidate(*names)
+        if not names:
+            self._views.clear()
+            return
+        changed = set(names)
+        def is_stale(view: DenominationalTypedefView):
+            if view.path.split('.', 1)[0] in changed:
+                return True
+            parent = self._lineage.parent_of(view.typedef)
+            if parent is None:
+                return False
+            if parent in changed:
+                return True
+            try:
+                return not changed.isdisjoint(self._lineage.ancestors(parent))
+            except ModelException:
+                return True
+        stale = {path for path, view in self._views.items() if is_stale(view)}
+        # Fields of a stale view are stale too, since it may hand out different field views
+        stale_prefixes = tuple(f"{path}." for path in stale)
+        for path in list(self._views):
+            if path in stale or path.startswith(stale_prefixes):
+                del self._views[path]
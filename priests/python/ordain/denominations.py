@@ -1,40 +1,88 @@
-from typing import Sequence, Union, Collection, Optional
-from dataclasses import dataclass
+from typing import Sequence, Union, Collection, Mapping, Optional, Tuple, Dict, ClassVar
+from dataclasses import dataclass, field
 
-@dataclass
+CannonHierarchy = Tuple[Tuple[str,...],...]
+
+
+def compile_hierarchy(cannon_hierarchy: Sequence[Union[str,Collection[str]]])->Tuple[CannonHierarchy,Dict[Optional[str],int]]:
+    """
+    Normalize a cannon hierarchy to nested tuples, and get the rank of each cannon in it, with 0
+    being the highest priority. A cannon listed in more than one group takes the rank of the first
+    (highest priority) one. The universal cannon (None) ranks after all denominational cannons.
+    """
+    hierarchy = tuple(
+        (cannon_list,) if isinstance(cannon_list, str) else tuple(cannon_list)
+        for cannon_list in cannon_hierarchy
+    )
+    ranks: Dict[Optional[str],int] = {}
+    for index, cannon_list in enumerate(hierarchy):
+        for cannon in cannon_list:
+            ranks.setdefault(cannon, index)
+    return hierarchy, ranks
+
+
+@dataclass(frozen=True, slots=True, init=False)
 class Denomination:
-    cannon_hierarchy: Sequence[Union[str,Collection[str]]]
-    _recognized_cannons: Optional[Collection[str]] = None
+    """
+    A cannon hierarchy, compiled for fast lookups.
+
+    Denominations are immutable and interned: constructing a denomination with the same hierarchy
+    twice returns the same instance. This makes them cheap to compare and safe to use as cache keys.
+    Every denomination constructed is kept, so pass a hierarchy rather than a denomination for
+    one-off lookups (e.g. `TagRepository.get_top`).
+    """
+    cannon_hierarchy: CannonHierarchy
+    recognized_cannons: frozenset = field(compare=False, repr=False)
+    """
+    All cannons recognized by this denomination
+    """
+    cannon_ranks: Mapping[Optional[str],int] = field(compare=False, repr=False)
+    """
+    The rank of each cannon in the hierarchy, with 0 being the highest priority. The universal
+    cannon (None) ranks after all denominational cannons.
+    """
+
+    _interned: ClassVar[Dict[CannonHierarchy,"Denomination"]] = {}
 
-    @property
-    def recognized_cannons(self)->Collection[str]:
+    def __new__(cls, cannon_hierarchy: Sequence[Union[str,Collection[str]]]):
+        hierarchy, ranks = compile_hierarchy(cannon_hierarchy)
+        try:
+            return cls._interned[hierarchy]
+        except KeyError:
+            pass
+        recognized = frozenset(ranks)
+        # Sort None (universal cannon) after denominational cannons
+        ranks[None] = len(hierarchy) + 1
+        self = object.__new__(cls)
+        object.__setattr__(self, 'cannon_hierarchy', hierarchy)
+        object.__setattr__(self, 'recognized_cannons', recognized)
+        object.__setattr__(self, 'cannon_ranks', ranks)
+        return cls._interned.setdefault(hierarchy, self)
+
+    def __reduce__(self):
+        return (type(self), (self.cannon_hierarchy,))
+
+    def rank(self, cannon: Optional[str])->int:
         """
-        A flat list of all cannons recognized by this denominations
+        Get the rank of a cannon, with lower numbers being higher priority.
+
+        Cannons not in the hierarchy rank after those that are, but before the universal cannon.
         """
-        if self._recognized_cannons is None:
-            cannons = []
-            for cannon_list in self.cannon_hierarchy:
-                if isinstance(cannon_list, str):
-                    cannons.append(cannon_list)
-                else:
-                    for cannon in cannon_list:
-                        cannons.append(cannon)
-            self._recognized_cannons = cannons
-        return self._recognized_cannons
+        return self.cannon_ranks.get(cannon, len(self.cannon_hierarchy))
 
 
 class KnownCannon:
     # Programming Languages
-    Php = ['php']
-    Python = ['python', 'py']
+    Php = ('php',)
+    Python = ('python', 'py')
 
     # Serialization
-    Json = ['json']
+    Json = ('json',)
 
     # Database Engines
-    Sql = ['sql']
-    MySql = ['mysql']
-    Postgres = ['postgres', 'pg']
+    Sql = ('sql',)
+    MySql = ('mysql',)
+    Postgres = ('postgres', 'pg')
 
 
 class KnownDenomination:
@@ -45,12 +93,12 @@ class KnownDenomination:
     @staticmethod
     def PythonBase()->Denomination:
         return Denomination([KnownCannon.Python])
-    
+
     # Serialization
     @staticmethod
     def JsonBase()->Denomination:
         return Denomination([KnownCannon.Json])
-    
+
     # Database Engines
     @staticmethod
     def SqlBase()->Denomination:
@@ -60,4 +108,4 @@ class KnownDenomination:
         return Denomination([KnownCannon.MySql, KnownCannon.Sql])
     @staticmethod
     def Postgres()->Denomination:
-        return Denomination([KnownCannon.Postgres, KnownCannon.Sql])
\ No newline at end of file
+        return Denomination([KnownCannon.Postgres, KnownCannon.Sql])
@@ -2,4 +2,41 @@ class OrdainException(Exception):
     pass
 
 class ParseException(OrdainException):
-    pass
\ No newline at end of file
+    pass
+
+class ModelException(OrdainException):
+    pass
+
+class ValidationException(OrdainException):
+    """
+    Raised when a value doesn't match its typedef
+    """
+    def __init__(self, message: str, path: tuple = ()):
+        self.message = message
+        self.path = tuple(path)
+        """
+        Where the problem is within the value: struct field names and mapping keys, or list indexes
+        """
+        super().__init__(f"{format_path(self.path)}: {message}" if self.path else message)
+
+    def within(self, *parts)->"ValidationException":
+        """
+        The same problem, found inside a larger value at the given path
+        """
+        return ValidationException(self.message, (*parts, *self.path))
+
+    def __reduce__(self):
+        return (type(self), (self.message, self.path))
+
+
+def format_path(path: tuple)->str:
+    """
+    Format a path within a value, e.g. `friends[0].name`
+    """
+    text = ''
+    for part in path:
+        if isinstance(part, int):
+            text += f"[{part}]"
+        else:
+            text += f".{part}" if text else str(part)
+    return text
@@ -0,0 +1,182 @@
+"""
+Loading ordinations which are split across several files.
+
+A file lists the files it imports (`import "other.ordain"` in ordain syntax, or a `$imports`
+list in JSON and YAML) by paths relative to itself, and can then refer to their typedefs. The
+typedefs of every file reached are merged into one model, so each name must be defined once.
+
+Files are parsed in layers: each file is in the layer after the last of the files it imports,
+so the files in a layer don't depend on each other and are parsed in parallel in a process pool,
+given the already-parsed typedefs they import. Each file's model is cached separately, keyed by
+its source and the keys of the files it imports, so after an edit only the edited file and the
+files which (directly or indirectly) import it are parsed again.
+"""
+from .cache import IMPORT_SCANNERS, LOADERS, Loader, default_cache_dir, read_cache_file, source_digest, write_cache_file
+from .exceptions import OrdainException, ParseException
+from .model import *
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+import hashlib
+import os
+
+
+@dataclass(slots=True)
+class SourceFile:
+    path: Path
+    source: bytes
+    imports: List[Path]
+    key: bytes
+    """
+    The cache key, covering the source and everything it imports
+    """
+    layer: int
+    """
+    How many levels of imports are below this file; files which import nothing are in layer 0
+    """
+
+
+def load_files(paths: Iterable[Union[str,os.PathLike]], cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True, max_workers: Optional[int] = None)->Dict[str,Typedef]:
+    """
+    Load ordinations from files, along with every file they import, and merge them into one model.
+
+    :param paths: The files to load. Files they import are found relative to each file.
+    :param cache_dir: Where to keep cached models; see `default_cache_dir`.
+    :param use_cache: Set to false to always parse every file, and not write to the cache.
+    :param max_workers: The number of processes to parse in. With 1, files are parsed in this
+        process. Loaders must be module-level functions to be used in other processes.
+    :raises ParseException: If any file is not well-formed, the imports are cyclic, or a typedef
+        is defined in more than one file
+    :raises OrdainException: If a file can't be read, or there is no loader for its type
+    """
+    return merge(load_models(paths, cache_dir, use_cache, max_workers))
+
+
+def load_models(paths: Iterable[Union[str,os.PathLike]], cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True, max_workers: Optional[int] = None, known: Mapping[Path,Mapping[str,Typedef]] = {})->Dict[Path,Mapping[str,Typedef]]:
+    """
+    Load ordinations from files, along with every file they import, keeping each file's model
+    separate. Files come after the files they import. See `load_files` for the parameters.
+
+    :param known: Models which have already been loaded for some of the files (by resolved path),
+        which are used as they are.
+    """
+    files = discover(paths)
+    cache_root = Path(default_cache_dir() if cache_dir is None else cache_dir)
+    models: Dict[Path,Mapping[str,Typedef]] = {path: known[path] for path in files if path in known}
+    if use_cache:
+        for file in files.values():
+            if file.path in models:
+                continue
+            model = read_cache_file(cache_root / f"{file.key.hex()}.ordc", file.key)
+            if model is not None:
+                models[file.path] = model
+    layers: Dict[int,List[SourceFile]] = {}
+    for file in files.values():
+        if file.path not in models:
+            layers.setdefault(file.layer, []).append(file)
+    executor: Optional[Executor] = None
+    try:
+        for _, layer in sorted(layers.items()):
+            jobs = [(LOADERS[file.path.suffix], file.path, file.source, _externals(file, models)) for file in layer]
+            if executor is None and len(jobs) > 1 and max_workers != 1:
+                executor = ProcessPoolExecutor(max_workers)
+            if executor is None or len(jobs) == 1:
+                results = [_parse_file(*job) for job in jobs]
+            else:
+                results = list(executor.map(_parse_file, *zip(*jobs)))
+            for file, model in zip(layer, results):
+                models[file.path] = model
+                if use_cache:
+                    write_cache_file(cache_root / f"{file.key.hex()}.ordc", file.key, model)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return {path: models[path] for path in files}
+
+
+def discover(paths: Iterable[Union[str,os.PathLike]])->Dict[Path,SourceFile]:
+    """
+    Read the given files and every file they import, in an order where each file comes after
+    the files it imports.
+
+    :raises ParseException: If the imports are cyclic, or a file's imports are not well-formed
+    :raises OrdainException: If a file can't be read, or there is no loader for its type
+    """
+    files: Dict[Path,SourceFile] = {}
+    chain: List[Path] = []
+
+    def visit(path: Path, importer: Optional[Path]):
+        if path in files:
+            return
+        if path in chain:
+            cycle = chain[chain.index(path):] + [path]
+            raise ParseException(f"Import cycle: {' -> '.join(str(link) for link in cycle)}")
+        if path.suffix not in LOADERS:
+            raise OrdainException(f"No loader registered for {path.suffix!r} files")
+        try:
+            source = path.read_bytes()
+        except OSError as e:
+            if importer is None:
+                raise OrdainException(f"Cannot read {path}: {e}") from None
+            raise OrdainException(f"Cannot read {path} (imported by {importer}): {e}") from None
+        try:
+            imports = [(path.parent / name).resolve() for name in IMPORT_SCANNERS[path.suffix](source)]
+        except ParseException as e:
+            raise ParseException(f"{path}: {e}") from None
+        chain.append(path)
+        for imported in imports:
+            visit(imported, path)
+        chain.pop()
+        digest = source_digest(source, path.suffix)
+        if imports:
+            # Chain the keys, so a change anywhere below invalidates this file too
+            digest = hashlib.sha256(digest + b''.join(files[imported].key for imported in imports)).digest()
+        layer = 1 + max((files[imported].layer for imported in imports), default=-1)
+        files[path] = SourceFile(path, source, imports, digest, layer)
+
+    for path in paths:
+        visit(Path(path).resolve(), None)
+    return files
+
+
+def merge(models: Mapping[Path,Mapping[str,Typedef]])->Dict[str,Typedef]:
+    """
+    Merge the models of several files into one.
+
+    :raises ParseException: If a typedef is defined in more than one file. All duplicates found
+        are reported at once.
+    """
+    merged: Dict[str,Typedef] = {}
+    origins: Dict[str,Path] = {}
+    errors = []
+    for path, model in models.items():
+        for name, typedef in model.items():
+            if name in origins:
+                errors.append(f"Duplicate typedef {name}: defined in {origins[name]} and {path}")
+            else:
+                merged[name] = typedef
+                origins[name] = path
+    if len(errors) == 1:
+        raise ParseException(errors[0])
+    elif errors:
+        raise ParseException(f"{len(errors)} errors found:\n" + '\n'.join(f"  {error}" for error in errors))
+    return merged
+
+
+def _externals(file: SourceFile, models: Mapping[Path,Mapping[str,Typedef]])->Dict[str,Typedef]:
+    """
+    The typedefs a file can refer to: those of the files it imports directly
+    """
+    externals: Dict[str,Typedef] = {}
+    for imported in file.imports:
+        externals.update(models[imported])
+    return externals
+
+
+def _parse_file(loader: Loader, path: Path, source: bytes, externals: Mapping[str,Typedef])->Mapping[str,Typedef]:
+    try:
+        # Loaders for formats without imports only take the source
+        return dict(loader(source, externals) if externals else loader(source))
+    except ParseException as e:
+        raise ParseException(f"{path}: {e}") from None
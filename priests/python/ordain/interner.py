@@ -0,0 +1,132 @@
+"""
+Hash-consing of types, so structurally identical sub-trees of a model share one instance.
+"""
+from .model import *
+from typing import Dict, Mapping, Union
+
+
+class TypeInterner:
+    """
+    Gives every distinct (by equality) type and typedef one canonical, shared instance.
+
+    Each node is keyed by its own data and the identities of its canonical children, so a key
+    (and its hash, which is cached) takes time proportional to the node's width rather than the
+    size of its sub-tree. For interned objects, equality is identity, so `equal` and
+    `structural_hash` are O(1) once an object has been interned.
+
+    Only equal objects are shared, except that struct fields are named by their path (e.g.
+    `User.address.street`), and structs are compared without those names. So equal nested structs
+    in different places are shared, and a shared struct's fields keep the names from where it was
+    first interned. Typedefs themselves, including struct fields, are only shared if their names
+    are equal too.
+
+    Canonical instances are kept for the life of the interner; use one interner per model (or
+    set of models which should share instances).
+    """
+    def __init__(self):
+        self._canonical: Dict[tuple,Union[Type,Typedef]] = {}
+        # The key and hash of each canonical instance, by identity
+        self._keys: Dict[int,tuple] = {}
+        self._hashes: Dict[int,int] = {}
+
+    def intern_model(self, model: Mapping[str,Typedef])->Dict[str,Typedef]:
+        """
+        Get a copy of a model built from canonical instances. Lazy struct fields are parsed.
+        """
+        return {name: self.intern(typedef) for name, typedef in model.items()}
+
+    def intern(self, obj: Union[Type,Typedef])->Union[Type,Typedef]:
+        """
+        Get the canonical instance equal to a type or typedef
+
+        :raises TypeError: If it has an enum or tag value which is unhashable, and not a list,
+            tuple, or dict of hashable values
+        """
+        if self._is_canonical(obj):
+            return obj
+        key, build = self._key(obj)
+        try:
+            return self._canonical[key]
+        except KeyError:
+            pass
+        canonical = build()
+        self._canonical[key] = canonical
+        self._keys[id(canonical)] = key
+        self._hashes[id(canonical)] = hash(key)
+        return canonical
+
+    def structural_hash(self, obj: Union[Type,Typedef])->int:
+        """
+        A hash which is the same for equal types or typedefs, even though they are unhashable
+
+        :raises TypeError: As for `intern`
+        """
+        return self._hashes[id(self.intern(obj))]
+
+    def equal(self, a: Union[Type,Typedef], b: Union[Type,Typedef])->bool:
+        """
+        Check if two types or typedefs are equal, in O(1) once they have been interned
+
+        :raises TypeError: As for `intern`
+        """
+        return self.intern(a) is self.intern(b)
+
+    def _is_canonical(self, obj)->bool:
+        key = self._keys.get(id(obj))
+        return key is not None and self._canonical[key] is obj
+
+    def _key(self, obj):
+        """
+        Get the key for an object, and a function to build its canonical instance
+        """
+        if isinstance(obj, ScalarType):
+            return (ScalarType, obj), lambda: obj
+        elif isinstance(obj, NamedTypeReference):
+            return (NamedTypeReference, obj.name_ref), lambda: obj
+        elif isinstance(obj, NullableType):
+            of = self.intern(obj.of)
+            return (NullableType, id(of)), lambda: NullableType(of)
+        elif isinstance(obj, CollectionType):
+            of = self.intern(obj.of)
+            return (CollectionType, id(of), obj.count), lambda: CollectionType(of, obj.count) # type: ignore
+        elif isinstance(obj, MappingType):
+            keys = self.intern(obj.keys)
+            value = self.intern(obj.value)
+            return (MappingType, id(keys), id(value)), lambda: MappingType(keys, value) # type: ignore
+        elif isinstance(obj, StructType):
+            fields = {key: self.intern(field) for key, field in obj.fields.items()}
+            # Key the fields by everything but their path-derived names: (id(type), tags, docs, parent)
+            field_keys = tuple((key, *self._keys[id(field)][2:]) for key, field in fields.items())
+            return (StructType, field_keys), lambda: StructType(fields)
+        elif isinstance(obj, EnumType):
+            try:
+                values = tuple(_value_key(value) for value in obj.values)
+            except TypeError:
+                raise TypeError(f"Cannot intern {obj!r}: it has an unhashable value") from None
+            return (EnumType, obj.of, values), lambda: EnumType(obj.of, list(obj.values))
+        elif isinstance(obj, Typedef):
+            of = self.intern(obj.type)
+            tags = TagRepository.interned(obj.tags)
+            try:
+                # Repositories of unhashable tags aren't shared, so they're keyed by their contents
+                tag_keys = tuple((tag.cannon, tag.name, _value_key(tag.value)) for tag in tags)
+            except TypeError:
+                raise TypeError(f"Cannot intern {obj!r}: it has a tag with an unhashable value") from None
+            return (Typedef, obj.name, id(of), tag_keys, obj.docs, obj.parent), lambda: Typedef(obj.name, of, tags, obj.docs, obj.parent) # type: ignore
+        raise TypeError(f"Cannot intern {obj!r}")
+
+
+def _value_key(value)->tuple:
+    """
+    Get a hashable key for an enum value, which is only equal for the same values. Lists, tuples,
+    and dicts are keyed by their contents.
+
+    :raises TypeError: If the value (or an item of it) is unhashable
+    """
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_value_key(item) for item in value))
+    elif isinstance(value, dict):
+        return (dict, frozenset((_value_key(key), _value_key(item)) for key, item in value.items()))
+    key = value_key(value)
+    hash(key)
+    return key
@@ -0,0 +1,171 @@
+from typing import Mapping, Dict, Tuple, Optional
+from .model import *
+from .exceptions import ModelException
+
+
+class Lineage:
+    """
+    The inheritance structure of a model, resolved on demand and memoized.
+
+    Both explicit parents and references to named types (aliases) are treated as inheritance,
+    since typedefs inherit the tags of the types they alias.
+
+    Each typedef's ancestors and merged tag heritage are computed at most once, and shared with
+    every descendant, so siblings don't repeat the work for their common ancestors.
+
+    If the model changes, call `invalidate` to drop anything which may be out of date.
+    """
+    def __init__(self, model: Mapping[str,Typedef]):
+        self._model = model
+        self._ancestors: Dict[str,Tuple[str,...]] = {}
+        self._heritage: Dict[str,TagRepository] = {}
+        self._resolved_types: Dict[str,Type] = {}
+
+    @property
+    def model(self)->Mapping[str,Typedef]:
+        return self._model
+
+    def parent_of(self, typedef: Typedef)->Optional[str]:
+        """
+        Get the name of the typedef which the given typedef inherits from, if any.
+
+        This is either an explicit parent, or the named type it refers to.
+        """
+        if typedef.parent is not None:
+            return typedef.parent
+        if isinstance(typedef.type, NamedTypeReference):
+            return typedef.type.name_ref
+        return None
+
+    def ancestors(self, name: str)->Tuple[str,...]:
+        """
+        Get the names of all ancestors of a named typedef, nearest first.
+
+        :raises ModelException: If the inheritance chain refers to an undefined typedef or is cyclic
+        """
+        try:
+            return self._ancestors[name]
+        except KeyError:
+            pass
+        # Walk up until we reach the root or something already resolved
+        chain = []
+        on_chain = set()
+        current: Optional[str] = name
+        while current is not None and current not in self._ancestors:
+            if current in on_chain:
+                cycle = chain[chain.index(current):] + [current]
+                raise ModelException(f"Inheritance cycle: {' -> '.join(cycle)}")
+            try:
+                typedef = self._model[current]
+            except KeyError:
+                if chain:
+                    raise ModelException(f"Typedef {chain[-1]} inherits from undefined typedef {current}") from None
+                raise ModelException(f"Undefined typedef: {current}") from None
+            chain.append(current)
+            on_chain.add(current)
+            current = self.parent_of(typedef)
+        # Then fill in the table from the top down
+        ancestors = () if current is None else (current, *self._ancestors[current])
+        for link in reversed(chain):
+            self._ancestors[link] = ancestors
+            ancestors = (link, *ancestors)
+        return self._ancestors[name]
+
+    def resolved_type(self, name: str)->Type:
+        """
+        Follow a chain of aliases from a named typedef to the type it ultimately refers to.
+
+        :raises ModelException: If the alias chain refers to an undefined typedef or is cyclic
+        """
+        try:
+            return self._resolved_types[name]
+        except KeyError:
+            pass
+        chain = []
+        current = name
+        while current not in self._resolved_types:
+            if current in chain:
+                cycle = chain[chain.index(current):] + [current]
+                raise ModelException(f"Alias cycle: {' -> '.join(cycle)}")
+            try:
+                type = self._model[current].type
+            except KeyError:
+                if chain:
+                    raise ModelException(f"Typedef {chain[-1]} refers to undefined typedef {current}") from None
+                raise ModelException(f"Undefined typedef: {current}") from None
+            chain.append(current)
+            if not isinstance(type, NamedTypeReference):
+                self._resolved_types[current] = type
+                break
+            current = type.name_ref
+        type = self._resolved_types[current]
+        for link in chain:
+            self._resolved_types[link] = type
+        return type
+
+    def resolved_type_of(self, typedef: Typedef)->Type:
+        """
+        Get the type any typedef ultimately refers to, following aliases.
+        """
+        if isinstance(typedef.type, NamedTypeReference):
+            return self.resolved_type(typedef.type.name_ref)
+        return typedef.type
+
+    def heritage(self, name: str)->TagRepository:
+        """
+        Get the tags of a named typedef merged with the tags of all its ancestors, in source order
+        (most distant ancestor first).
+
+        :raises ModelException: If the inheritance chain refers to an undefined typedef or is cyclic
+        """
+        try:
+            return self._heritage[name]
+        except KeyError:
+            pass
+        ancestors = self.ancestors(name)
+        # Resolve from the most distant unresolved ancestor down, so each level merges onto
+        # its parent's (shared) heritage
+        pending = [name]
+        for ancestor in ancestors:
+            if ancestor in self._heritage:
+                break
+            pending.append(ancestor)
+        for link in reversed(pending):
+            tags = self._model[link].tags
+            parent = self.parent_of(self._model[link])
+            if parent is not None:
+                tags = self._heritage[parent].merge(tags)
+            self._heritage[link] = tags
+        return self._heritage[name]
+
+    def heritage_of(self, typedef: Typedef)->TagRepository:
+        """
+        Get the tag heritage for any typedef, including anonymous typedefs such as struct fields.
+        """
+        if self._model.get(typedef.name) is typedef:
+            return self.heritage(typedef.name)
+        parent = self.parent_of(typedef)
+        if parent is None:
+            return typedef.tags
+        return self.heritage(parent).merge(typedef.tags)
+
+    def invalidate(self, *names: str):
+        """
+        Drop memoized results after the model has changed.
+
+        :param names: The names of the typedefs which were added, changed, or removed. Results for
+            these typedefs and their descendants are dropped. If no names are given, everything is
+            dropped.
+        """
+        self._resolved_types.clear()
+        if not names:
+            self._ancestors.clear()
+            self._heritage.clear()
+            return
+        changed = set(names)
+        stale = [name for name, ancestors in self._ancestors.items() if name in changed or not changed.isdisjoint(ancestors)]
+        for name in stale:
+            del self._ancestors[name]
+            self._heritage.pop(name, None)
+        for name in changed:
+            self._heritage.pop(name, None)
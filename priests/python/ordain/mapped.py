@@ -0,0 +1,495 @@
+"""
+A compiled binary form of a model, which is read through a memory map rather than loaded.
+
+When several processes (e.g. the workers of a prefork server) map the same compiled file, they
+share one copy of its pages, where unpickling or parsing would give every process its own copy
+of every typedef and tag. Nothing is decoded up front: a `MappedModel` hands out read-only views
+which decode typedefs, fields, and tags from the map as they are accessed. The views have the
+same attributes as the model classes, so a `MappedModel` can be used anywhere a model is
+expected, including with `DenominationalTypedefView` and `Lineage`.
+
+Layout (all integers little-endian, offsets are from the start of the file, and `NONE` is
+0xFFFFFFFF):
+
+* Header: magic, u16 version, u32 offset of the root table
+* String: u32 byte length, UTF-8 bytes
+* Value: u8 kind, then a string offset, i64, f64, or u32 length and bytes, depending on kind
+* Tag list: u32 count, then (cannon string or NONE, name string, value) offsets for each tag
+* Typedef: name string, type, tag list, docs string or NONE, parent string or NONE offsets
+* Type: u8 kind, then the offsets (or counts) needed for that kind of type. A struct has a u32
+  count, (key, typedef) offsets in source order, then the positions of those entries sorted by
+  key, like the root table
+* Root table: u32 count, (name, typedef) offsets in model order, then the positions of those
+  entries sorted by name, for binary search
+
+Everything is written once and referenced by offset, so shared typedefs (such as the inline
+typedefs for `list of string`) and repeated strings take no extra space.
+"""
+from .exceptions import OrdainException
+from .model import *
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Optional, Sequence, Tuple, Union
+import mmap
+import os
+import struct
+import tempfile
+
+FORMAT_VERSION = 2
+
+_MAGIC = b'ORDAINM\0'
+_HEADER = struct.Struct('<8sHxxI')
+_U32 = struct.Struct('<I')
+_U32_PAIR = struct.Struct('<II')
+_U32_TRIPLE = struct.Struct('<III')
+_TYPEDEF = struct.Struct('<IIIII')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_NONE = 0xFFFFFFFF
+
+# Value kinds
+_STR, _INT, _BIG_INT, _FLOAT, _FALSE, _TRUE, _BYTES, _NULL = range(8)
+# Type kinds
+_SCALAR, _NAMED, _STRUCT, _COLLECTION, _MAPPING, _ENUM, _NULLABLE = range(7)
+
+
+class _Writer:
+    """
+    Appends records to a buffer, writing each distinct object (or string) only once
+    """
+    def __init__(self):
+        self.buffer = bytearray(_HEADER.size)
+        self._strings: Dict[str,int] = {}
+        self._values: Dict[tuple,int] = {}
+        self._objects: Dict[int,int] = {}
+        # Keeps memoized objects alive, so their ids can't be reused while writing
+        self._keep = []
+
+    def append(self, data: bytes)->int:
+        offset = len(self.buffer)
+        self.buffer += data
+        return offset
+
+    def _memo(self, obj)->Optional[int]:
+        return self._objects.get(id(obj))
+
+    def _remember(self, obj, offset: int)->int:
+        self._objects[id(obj)] = offset
+        self._keep.append(obj)
+        return offset
+
+    def string(self, s: Optional[str])->int:
+        if s is None:
+            return _NONE
+        try:
+            return self._strings[s]
+        except KeyError:
+            data = s.encode()
+            offset = self._strings[s] = self.append(_U32.pack(len(data)) + data)
+            return offset
+
+    def value(self, value)->int:
+        # So e.g. 1 and True, or 0.0 and -0.0, aren't conflated
+        key = value_key(value)
+        try:
+            return self._values[key]
+        except KeyError:
+            offset = self._values[key] = self._value(value)
+            return offset
+
+    def _value(self, value)->int:
+        if value is None:
+            return self.append(bytes([_NULL]))
+        elif value is True or value is False:
+            return self.append(bytes([_TRUE if value else _FALSE]))
+        elif isinstance(value, str):
+            return self.append(bytes([_STR]) + _U32.pack(self.string(value)))
+        elif isinstance(value, int):
+            if -2**63 <= value < 2**63:
+                return self.append(bytes([_INT]) + _I64.pack(value))
+            return self.append(bytes([_BIG_INT]) + _U32.pack(self.string(str(value))))
+        elif isinstance(value, float):
+            return self.append(bytes([_FLOAT]) + _F64.pack(value))
+        elif isinstance(value, bytes):
+            return self.append(bytes([_BYTES]) + _U32.pack(len(value)) + value)
+        raise OrdainException(f"Cannot compile value of type {type(value).__name__}: {value!r}")
+
+    def tags(self, tags: TagRepository)->int:
+        offset = self._memo(tags)
+        if offset is not None:
+            return offset
+        records = [_U32_TRIPLE.pack(self.string(tag.cannon), self.string(tag.name), self.value(tag.value)) for tag in tags]
+        return self._remember(tags, self.append(_U32.pack(len(records)) + b''.join(records)))
+
+    def typedef(self, typedef: Typedef)->int:
+        offset = self._memo(typedef)
+        if offset is not None:
+            return offset
+        # Children are written first, so their offsets are known
+        record = _TYPEDEF.pack(
+            self.string(typedef.name),
+            self.type(typedef.type),
+            self.tags(typedef.tags),
+            self.string(typedef.docs),
+            self.string(typedef.parent),
+        )
+        return self._remember(typedef, self.append(record))
+
+    def type(self, type: Type)->int:
+        offset = self._memo(type)
+        if offset is not None:
+            return offset
+        if isinstance(type, ScalarType):
+            record = bytes([_SCALAR]) + _U32.pack(self.string(type.value))
+        elif isinstance(type, NamedTypeReference):
+            record = bytes([_NAMED]) + _U32.pack(self.string(type.name_ref))
+        elif isinstance(type, StructType):
+            entries = [_U32_PAIR.pack(self.string(key), self.typedef(field)) for key, field in type.fields.items()]
+            record = bytes([_STRUCT]) + _U32.pack(len(entries)) + b''.join(entries) + _sorted_positions(list(type.fields))
+        elif isinstance(type, CollectionType):
+            record = bytes([_COLLECTION]) + _U32.pack(self.typedef(type.of)) + _I64.pack(-1 if type.count is None else type.count)
+        elif isinstance(type, MappingType):
+            record = bytes([_MAPPING]) + _U32_PAIR.pack(self.typedef(type.keys), self.typedef(type.value))
+        elif isinstance(type, EnumType):
+            values = [_U32.pack(self.value(value)) for value in type.values]
+            record = bytes([_ENUM]) + _U32_PAIR.pack(self.string(type.of.value), len(values)) + b''.join(values)
+        elif isinstance(type, NullableType):
+            record = bytes([_NULLABLE]) + _U32.pack(self.type(type.of))
+        else:
+            raise OrdainException(f"Cannot compile type: {type!r}")
+        return self._remember(type, self.append(record))
+
+
+def compile_model(model: Mapping[str,Typedef])->bytes:
+    """
+    Compile a model into the binary format read by `MappedModel`
+    """
+    writer = _Writer()
+    entries = [(writer.string(name), writer.typedef(typedef)) for name, typedef in model.items()]
+    root = writer.append(
+        _U32.pack(len(entries))
+        + b''.join(_U32_PAIR.pack(*entry) for entry in entries)
+        + _sorted_positions(list(model))
+    )
+    _HEADER.pack_into(writer.buffer, 0, _MAGIC, FORMAT_VERSION, root)
+    return bytes(writer.buffer)
+
+
+def _sorted_positions(names: Sequence[str])->bytes:
+    """
+    The positions of the entries for some names, sorted by name, for binary search
+    """
+    return b''.join(_U32.pack(position) for position in sorted(range(len(names)), key=lambda position: names[position].encode()))
+
+
+def _find(buffer, entries: int, count: int, name: str)->int:
+    """
+    Binary search a table of `count` (name, offset) entries, followed by their sorted positions,
+    for the offset of a name, or -1
+    """
+    key = name.encode()
+    positions = entries + 8 * count
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        position = _U32.unpack_from(buffer, positions + 4 * middle)[0]
+        name_offset, offset = _U32_PAIR.unpack_from(buffer, entries + 8 * position)
+        found = _raw_string(buffer, name_offset)
+        if found == key:
+            return offset
+        elif found < key:
+            low = middle + 1
+        else:
+            high = middle
+    return -1
+
+
+def write_compiled(model: Mapping[str,Typedef], path: Union[str,os.PathLike]):
+    """
+    Compile a model to a file. The file is replaced atomically, so processes which already have
+    the old file mapped keep a consistent (old) view.
+    """
+    path = Path(path)
+    data = compile_model(model)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class MappedModel(Mapping[str,Typedef]):
+    """
+    A read-only model backed by a compiled file (or any buffer holding one).
+
+    Lookups binary search the root table in the buffer, so opening a model doesn't read it. The
+    view for each top-level typedef is kept once created, so repeated lookups return the same
+    object (which `Lineage` relies on to share memoized heritage).
+    """
+    __slots__ = ('_buffer', '_mmap', '_count', '_entries', '_views')
+
+    def __init__(self, buffer: Union[bytes,mmap.mmap]):
+        """
+        :raises OrdainException: If the buffer doesn't hold a compiled model of this version
+        """
+        if len(buffer) < _HEADER.size:
+            raise OrdainException("Not a compiled ordain model")
+        magic, version, root = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise OrdainException("Not a compiled ordain model")
+        if version != FORMAT_VERSION:
+            raise OrdainException(f"Unsupported compiled model version {version} (expected {FORMAT_VERSION})")
+        self._buffer = buffer
+        self._mmap = buffer if isinstance(buffer, mmap.mmap) else None
+        self._count = _U32.unpack_from(buffer, root)[0]
+        self._entries = root + 4
+        self._views: Dict[str,"MappedTypedef"] = {}
+
+    @classmethod
+    def open(cls, path: Union[str,os.PathLike])->"MappedModel":
+        """
+        Memory-map a compiled model file, read-only
+        """
+        with open(path, 'rb') as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def close(self):
+        """
+        Unmap the file. Views handed out by the model must not be used afterwards.
+        """
+        self._views.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _entry(self, position: int)->Tuple[int,int]:
+        return _U32_PAIR.unpack_from(self._buffer, self._entries + 8 * position)
+
+    def _find(self, name: str)->int:
+        """
+        Get the typedef offset for a name, or -1
+        """
+        return _find(self._buffer, self._entries, self._count, name)
+
+    def __getitem__(self, name: str)->"MappedTypedef":
+        try:
+            return self._views[name]
+        except KeyError:
+            pass
+        offset = self._find(name) if isinstance(name, str) else -1
+        if offset < 0:
+            raise KeyError(name)
+        return self._views.setdefault(name, MappedTypedef(self._buffer, offset))
+
+    def __contains__(self, name)->bool:
+        return name in self._views or (isinstance(name, str) and self._find(name) >= 0)
+
+    def __iter__(self)->Iterator[str]:
+        for position in range(self._count):
+            yield _string(self._buffer, self._entry(position)[0])
+
+    def __len__(self)->int:
+        return self._count
+
+    def __repr__(self):
+        return f"<{type(self).__name__} with {self._count} typedefs>"
+
+
+class MappedTypedef:
+    """
+    A read-only view of a typedef in a compiled model, with the same attributes as `Typedef`.
+
+    The type and tags are decoded on first access and kept, since views query them repeatedly
+    (and `TagRepository` builds its index on first use).
+    """
+    __slots__ = ('_buffer', '_offset', '_type', '_tags')
+
+    def __init__(self, buffer, offset: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._type: Optional[Type] = None
+        self._tags: Optional[TagRepository] = None
+
+    def _field(self, index: int)->int:
+        return _U32.unpack_from(self._buffer, self._offset + 4 * index)[0]
+
+    @property
+    def name(self)->str:
+        return _string(self._buffer, self._field(0))
+
+    @property
+    def type(self)->Type:
+        if self._type is None:
+            self._type = _type(self._buffer, self._field(1))
+        return self._type
+
+    @property
+    def tags(self)->TagRepository:
+        if self._tags is None:
+            self._tags = TagRepository(MappedTags(self._buffer, self._field(2)))
+        return self._tags
+
+    @property
+    def docs(self)->Optional[str]:
+        return _optional_string(self._buffer, self._field(3))
+
+    @property
+    def parent(self)->Optional[str]:
+        return _optional_string(self._buffer, self._field(4))
+
+    @property
+    def struct_fields(self)->Optional[Mapping[str,"MappedTypedef"]]:
+        type = self.type
+        if isinstance(type, StructType):
+            return type.fields
+        return None
+
+    def __eq__(self, other):
+        if not isinstance(other, (Typedef, MappedTypedef)):
+            return NotImplemented
+        if isinstance(other, MappedTypedef) and other._buffer is self._buffer and other._offset == self._offset:
+            return True
+        return (self.name, self.type, self.tags, self.docs, self.parent) == (other.name, other.type, other.tags, other.docs, other.parent)
+
+    __hash__ = None # type: ignore
+
+    def __repr__(self):
+        return f"MappedTypedef(name={self.name!r}, type={self.type!r}, tags={self.tags!r}, docs={self.docs!r}, parent={self.parent!r})"
+
+
+class MappedFields(Mapping[str,MappedTypedef]):
+    """
+    A read-only view of the fields of a struct in a compiled model, in source order.
+
+    Like `MappedModel`, lookups binary search the struct's sorted key table, and the view for each
+    field is kept once created.
+    """
+    __slots__ = ('_buffer', '_offset', '_count', '_views')
+
+    def __init__(self, buffer, offset: int):
+        self._buffer = buffer
+        self._count = _U32.unpack_from(buffer, offset)[0]
+        self._offset = offset + 4
+        self._views: Dict[str,MappedTypedef] = {}
+
+    def _entry(self, position: int)->Tuple[int,int]:
+        return _U32_PAIR.unpack_from(self._buffer, self._offset + 8 * position)
+
+    def __getitem__(self, key: str)->MappedTypedef:
+        try:
+            return self._views[key]
+        except KeyError:
+            pass
+        offset = _find(self._buffer, self._offset, self._count, key) if isinstance(key, str) else -1
+        if offset < 0:
+            raise KeyError(key)
+        return self._views.setdefault(key, MappedTypedef(self._buffer, offset))
+
+    def __contains__(self, key)->bool:
+        return key in self._views or (isinstance(key, str) and _find(self._buffer, self._offset, self._count, key) >= 0)
+
+    def __iter__(self)->Iterator[str]:
+        for position in range(self._count):
+            yield _string(self._buffer, self._entry(position)[0])
+
+    def __len__(self)->int:
+        return self._count
+
+    def __repr__(self):
+        return f"MappedFields({dict(self)!r})"
+
+
+class MappedTags(Sequence[Tag]):
+    """
+    A read-only view of a tag list in a compiled model. Tags are decoded as they are accessed.
+    """
+    __slots__ = ('_buffer', '_offset', '_count')
+
+    def __init__(self, buffer, offset: int):
+        self._buffer = buffer
+        self._count = _U32.unpack_from(buffer, offset)[0]
+        self._offset = offset + 4
+
+    def __len__(self)->int:
+        return self._count
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[index] for index in range(*key.indices(self._count))]
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError('MappedTags index out of range')
+        cannon, name, value = _U32_TRIPLE.unpack_from(self._buffer, self._offset + 12 * key)
+        return Tag(_optional_string(self._buffer, cannon), _string(self._buffer, name), _value(self._buffer, value))
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"MappedTags({list(self)!r})"
+
+
+def _raw_string(buffer, offset: int)->bytes:
+    length = _U32.unpack_from(buffer, offset)[0]
+    return buffer[offset + 4:offset + 4 + length]
+
+
+def _string(buffer, offset: int)->str:
+    return _raw_string(buffer, offset).decode()
+
+
+def _optional_string(buffer, offset: int)->Optional[str]:
+    return None if offset == _NONE else _string(buffer, offset)
+
+
+def _value(buffer, offset: int)->Union[str,int,float,bool,bytes,None]:
+    kind = buffer[offset]
+    if kind == _STR:
+        return _string(buffer, _U32.unpack_from(buffer, offset + 1)[0])
+    elif kind == _INT:
+        return _I64.unpack_from(buffer, offset + 1)[0]
+    elif kind == _BIG_INT:
+        return int(_string(buffer, _U32.unpack_from(buffer, offset + 1)[0]))
+    elif kind == _FLOAT:
+        return _F64.unpack_from(buffer, offset + 1)[0]
+    elif kind == _TRUE or kind == _FALSE:
+        return kind == _TRUE
+    elif kind == _BYTES:
+        length = _U32.unpack_from(buffer, offset + 1)[0]
+        return bytes(buffer[offset + 5:offset + 5 + length])
+    elif kind == _NULL:
+        return None
+    raise OrdainException(f"Corrupt compiled model: unknown value kind {kind} at {offset}")
+
+
+def _type(buffer, offset: int)->Type:
+    kind = buffer[offset]
+    if kind == _SCALAR:
+        return ScalarType(_string(buffer, _U32.unpack_from(buffer, offset + 1)[0]))
+    elif kind == _NAMED:
+        return NamedTypeReference(_string(buffer, _U32.unpack_from(buffer, offset + 1)[0]))
+    elif kind == _STRUCT:
+        return StructType(MappedFields(buffer, offset + 1))
+    elif kind == _COLLECTION:
+        count = _I64.unpack_from(buffer, offset + 5)[0]
+        return CollectionType(MappedTypedef(buffer, _U32.unpack_from(buffer, offset + 1)[0]), None if count < 0 else count) # type: ignore
+    elif kind == _MAPPING:
+        keys, value = _U32_PAIR.unpack_from(buffer, offset + 1)
+        return MappingType(MappedTypedef(buffer, keys), MappedTypedef(buffer, value)) # type: ignore
+    elif kind == _ENUM:
+        of, count = _U32_PAIR.unpack_from(buffer, offset + 1)
+        values = [_value(buffer, _U32.unpack_from(buffer, offset + 9 + 4 * index)[0]) for index in range(count)]
+        return EnumType(ScalarType(_string(buffer, of)), values)
+    elif kind == _NULLABLE:
+        return NullableType(_type(buffer, _U32.unpack_from(buffer, offset + 1)[0]))
+    raise OrdainException(f"Corrupt compiled model: unknown type kind {kind} at {offset}")
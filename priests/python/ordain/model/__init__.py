@@ -1,6 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import StrEnum
-from typing import Optional, Mapping, List, Union, Collection, Sequence
+from bisect import bisect_right
+from heapq import merge as _merge_sorted
+from itertools import chain
+from typing import Optional, Mapping, List, Union, Collection, Sequence, Dict, Tuple, Iterable
+from weakref import WeakValueDictionary
+from ..denominations import Denomination, compile_hierarchy
+import math
+import sys
 
 class ScalarType(StrEnum):
     binary = 'binary'
@@ -28,6 +35,7 @@ class StructType:
 @dataclass(frozen=True, slots=True)
 class CollectionType:
     of: "Typedef"
+    count: Optional[int] = None # Fixed length for arrays, None for lists
 
 
 @dataclass(frozen=True, slots=True)
@@ -42,69 +50,233 @@ class EnumType:
     values: list # TODO probably need a new class for this
 
 
-Type = Union[ScalarType, NamedTypeReference, StructType, CollectionType, MappingType, EnumType]
+@dataclass(frozen=True, slots=True)
+class NullableType:
+    of: "Type"
 
 
-@dataclass(frozen=True, slots=True)
+Type = Union[ScalarType, NamedTypeReference, StructType, CollectionType, MappingType, EnumType, NullableType]
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
 class Tag:
     cannon: Optional[str]
     name: str
     value: Union[str,int,bool,float]
     # TODO also have "context" (user-controlled tag sorting, e.g. "sql.name@server")
 
+    @classmethod
+    def interned(cls, cannon: Optional[str], name: str, value)->"Tag":
+        """
+        Get the shared instance of a tag, creating it if there isn't one.
+
+        The same tags (e.g. `#required`) repeat many times in a large model, so parsers use this 
+        to keep one instance of each, with interned cannon and name strings. Instances are only 
+        kept while something uses them. Tags with unhashable values are not shared.
+        """
+        key = (cannon, name, value_key(value))
+        try:
+            return _INTERNED_TAGS[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return cls(cannon, name, value)
+        tag = cls(_intern(cannon), _intern(name), value)
+        return _INTERNED_TAGS.setdefault(key, tag)
+
     @classmethod
     def from_key_value(cls, key:str, value):
        split_key = key.rsplit('.', 1)
        if len(split_key) == 2:
-          return cls(*split_key, value) # type: ignore
+          return cls.interned(*split_key, value) # type: ignore
        else:
-          return cls(None, key, value)
+          return cls.interned(None, key, value)
+
+    def __reduce__(self):
+        # Unpickled (e.g. cached) tags are shared too
+        return (type(self).interned, (self.cannon, self.name, self.value))
+
+
+_INTERNED_TAGS: "WeakValueDictionary[tuple,Tag]" = WeakValueDictionary()
+
+
+def value_key(value)->tuple:
+    """
+    Get a key for a tag or enum value, which is only equal for values which are the same.
+
+    The key includes the value's type, since e.g. `1 == True`, and the sign of floats, since
+    `0.0 == -0.0`. It is unhashable if the value is.
+    """
+    if type(value) is float:
+        return (float, value, math.copysign(1.0, value))
+    return (type(value), value)
+
+
+def _intern(s):
+    return sys.intern(s) if type(s) is str else s
        
 
-@dataclass(frozen=True, slots=True)
+class TagChain(Sequence[Tag]):
+    """
+    A read-only sequence of tags made by concatenating other tag sequences without copying them.
+
+    Used when merging tag repositories, so that inherited tags can be shared between every 
+    typedef that inherits them.
+    """
+    __slots__ = ('_segments', '_offsets')
+
+    def __init__(self, *segments: Sequence[Tag]):
+        flat = []
+        for segment in segments:
+            if isinstance(segment, TagChain):
+                flat.extend(segment._segments)
+            elif len(segment):
+                flat.append(segment)
+        self._segments: Tuple[Sequence[Tag],...] = tuple(flat)
+        offsets = []
+        total = 0
+        for segment in self._segments:
+            offsets.append(total)
+            total += len(segment)
+        offsets.append(total)
+        self._offsets: Tuple[int,...] = tuple(offsets)
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    def __iter__(self):
+        return chain.from_iterable(self._segments)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('TagChain index out of range')
+        segment = bisect_right(self._offsets, key) - 1
+        return self._segments[segment][key - self._offsets[segment]]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"TagChain({list(self)!r})"
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
 class TagRepository:
     tags: Sequence[Tag]
+    _index: Optional[Dict[str,Dict[Optional[str],List[int]]]] = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def interned(cls, tags: Iterable[Tag])->"TagRepository":
+        """
+        Get the shared repository holding exactly the given tags, creating it if there isn't one.
+
+        Many typedefs have the same tags (or none), so parsers use this to share one repository 
+        (and its index) between them. Instances are only kept while something uses them.
+        """
+        tags = list(tags)
+        key = tuple((tag.cannon, tag.name, value_key(tag.value)) for tag in tags)
+        try:
+            return _INTERNED_REPOSITORIES[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return cls(tags)
+        return _INTERNED_REPOSITORIES.setdefault(key, cls(tags))
+
+    def __reduce__(self):
+        return (type(self).interned, (list(self.tags),))
+
+    @property
+    def index(self)->Mapping[str,Mapping[Optional[str],Sequence[int]]]:
+        """
+        The positions of each tag, grouped by tag name and then by cannon. Positions within each 
+        group are in source order.
+
+        The index is built on first use, and reused by every subsequent lookup.
+        """
+        if self._index is None:
+            index = {}
+            for position, tag in enumerate(self.tags):
+                index.setdefault(tag.name, {}).setdefault(tag.cannon, []).append(position)
+            object.__setattr__(self, '_index', index)
+        return self._index # type: ignore
+
+    def _matching_groups(self, tag_name:str, recognized_cannons: Collection[str], include_universal: bool)->List[Sequence[int]]:
+        """
+        Get the index groups for all cannons matched by a `filter` call
+        """
+        by_cannon = self.index.get(tag_name)
+        if by_cannon is None:
+            return []
+        if include_universal:
+            groups = [positions for cannon, positions in by_cannon.items() if cannon is None or cannon in recognized_cannons]
+        else:
+            groups = [positions for cannon, positions in by_cannon.items() if cannon in recognized_cannons]
+        return groups
 
     def filter(self, tag_name:str, recognized_cannons: Collection[str] = [], include_universal: bool = True)->"TagRepository":
         """
         Find all tags with the given name, either in the universal cannon or one of the recognized cannon namespaces.
         """
-        return TagRepository([tag for tag in self.tags
-            if tag.name == tag_name and (
-               (include_universal and tag.cannon is None) 
-               or tag.cannon in recognized_cannons
-            )
-        ])
+        groups = self._matching_groups(tag_name, recognized_cannons, include_universal)
+        if not groups:
+            return TagRepository([])
+        if len(groups) == 1:
+            positions = groups[0]
+        else:
+            positions = _merge_sorted(*groups)
+        return TagRepository([self.tags[position] for position in positions])
+
+    def filter_top(self, tag_name:str, recognized_cannons: Collection[str] = [], include_universal: bool = True, cannon_hierarchy: Union[Denomination,Sequence[Union[str,Collection[str]]]] = ())->Optional[Tag]:
+        """
+        Equivalent to `filter(...).get_top(...)`, but without building the intermediate repository.
+
+        Only the last tag from each cannon can win, so this only needs to inspect one tag per cannon.
+
+        :param cannon_hierarchy: A denomination, or a sequence of the arguments `get_top` takes
+        """
+        groups = self._matching_groups(tag_name, recognized_cannons, include_universal)
+        if not groups:
+            return None
+        if len(groups) == 1:
+            return self.tags[groups[0][-1]]
+        sort_func = self._hierarchy_to_sort((cannon_hierarchy,) if isinstance(cannon_hierarchy, Denomination) else cannon_hierarchy)
+        best = max((positions[-1] for positions in groups), key=lambda position: (-sort_func(self.tags[position]), position))
+        return self.tags[best]
     
-    def _hierarchy_to_sort(self, cannon_hierarchy: Sequence[Union[str,Collection[str]]]):
+    def _hierarchy_to_sort(self, cannon_hierarchy: Sequence[Union[str,Collection[str],Denomination]]):
         """
         Turn a cannon hierarchy into a sort function, suitable to pass to `sorted` and `max` and similar.
+
+        A single `Denomination` may be passed in place of the hierarchy to skip compiling it.
         """
-        sort_map = {}
-        for index, cannon_list in enumerate(cannon_hierarchy):
-            if isinstance(cannon_list, str):
-                sort_map[cannon_list] = index
-            else:
-                for cannon in cannon_list:
-                    sort_map[cannon] = index
+        if len(cannon_hierarchy) == 1 and isinstance(cannon_hierarchy[0], Denomination):
+            ranks = cannon_hierarchy[0].cannon_ranks
+            unranked = len(cannon_hierarchy[0].cannon_hierarchy)
+        else:
+            # Not a Denomination, so one-off hierarchies aren't interned
+            hierarchy, ranks = compile_hierarchy(cannon_hierarchy) # type: ignore
+            unranked = len(hierarchy)
+            ranks[None] = unranked + 1
+        # Denominational cannons outside the hierarchy sort between it and the universal cannon
         def sort_func(tag: Tag):
-            try:
-                return sort_map[tag.cannon]
-            except KeyError:
-                # Sort None (universal cannon) after denominational cannons (used if no hierarchy specified)
-                if tag.cannon is None:
-                    return len(cannon_hierarchy) + 1
-                return len(cannon_hierarchy)
+            return ranks.get(tag.cannon, unranked)
         return sort_func
 
-    def sort(self, *cannon_hierarchy: Union[str,Collection[str]]):
+    def sort(self, *cannon_hierarchy: Union[str,Collection[str],Denomination]):
         """
         Sort tags according to a cannon hierarchy. The sorting will be designed such that the first 
         item in the resulting array should be the "best".
         
         :param cannon_hierarchy: Arrays of cannon namespaces. Each array is a group of 
             equal-rank namespaces. Arrays themselves should be ordered with the highest priorities 
-            first.
+            first. A single `Denomination` may be passed instead.
         :returns: The same tags, ordered from most priority to least priority.
         """
         if len(self.tags) < 2:
@@ -114,7 +286,7 @@ class TagRepository:
             key=self._hierarchy_to_sort(cannon_hierarchy)
         )))
 
-    def get_top(self, *cannon_hierarchy: Union[str,Collection[str]])-> Optional[Tag]:
+    def get_top(self, *cannon_hierarchy: Union[str,Collection[str],Denomination])-> Optional[Tag]:
         """
         Sort tags according to a cannon hierarchy. The sorting will be designed such that the first 
         item in the resulting array should be the "best".
@@ -123,7 +295,7 @@ class TagRepository:
         
         :param cannon_hierarchy: Arrays of cannon namespaces. Each array is a group of 
             equal-rank namespaces. Arrays themselves should be ordered with the highest priorities 
-            first.
+            first. A single `Denomination` may be passed instead.
         :returns: The highest-priority tag from the given list
         """
         if len(self.tags) < 2:
@@ -136,11 +308,10 @@ class TagRepository:
     def merge(self, *repos: "TagRepository")->"TagRepository":
         """
         Create a new tag repository with the values of self and all other repositories passed
+
+        The tags are not copied; the new repository shares them with the merged repositories.
         """
-        new_tags = [*self.tags]
-        for repo in repos:
-            new_tags.extend(repo.tags)
-        return TagRepository(new_tags)
+        return TagRepository(TagChain(self.tags, *(repo.tags for repo in repos)))
 
     def __iter__(self):
         return iter(self.tags)
@@ -152,6 +323,9 @@ class TagRepository:
         return self.tags[key]
 
 
+_INTERNED_REPOSITORIES: "WeakValueDictionary[tuple,TagRepository]" = WeakValueDictionary()
+
+
 @dataclass(frozen=True, slots=True)
 class Typedef:
     name: str
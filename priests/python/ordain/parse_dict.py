@@ -1,20 +1,262 @@
 from .exceptions import ParseException
 from .model import *
-from typing import Mapping, Tuple, Union, Optional
+from typing import Mapping, Tuple, Union, Optional, Dict, List
+import re
 
-def parse_typedefs(typedef_dict: dict)->Mapping[str,Typedef]:
+_INLINE_TOKEN = re.compile(r'\?|[^\s?]+')
+_NO_TAGS = TagRepository.interned([])
+
+
+class ExternalType:
+    """
+    Marks a type which refers to an external typedef, whose type has already been resolved
+    """
+
+def parse_typedefs(typedef_dict: dict, lazy: bool = False, strict: bool = False, externals: Mapping[str,Typedef] = {})->Mapping[str,Typedef]:
     """
     Build a model from an array, such as would be obtained by parsing a JSON or YAML definition.
-    
-    :raises ParseException: If the input is not well-formed
+
+    Keys starting with `$` are directives (such as `$imports`) rather than typedefs, and are skipped.
+
+    :param lazy: If true, struct fields are only parsed the first time they are accessed. The 
+        resulting model is otherwise equivalent, but problems inside struct fields are only 
+        reported (by raising a ParseException) when those fields are accessed.
+    :param strict: If true, the whole definition is validated up front, even in lazy mode.
+    :param externals: Already-parsed typedefs (e.g. from imported files) which the definition may
+        refer to. These are not included in the result.
+    :raises ParseException: If the input is not well-formed. All problems found are reported at once.
+    """
+    typedef_dict = {key: value for key, value in typedef_dict.items() if not key.startswith('$')}
+    resolver = TypeResolver(typedef_dict, lazy, externals)
+    parsed = {}
+    for key in resolver.order():
+        try:
+            parsed[key] = parse_typedef(key, typedef_dict[key], resolver)
+        except ParseException as e:
+            resolver.errors.append(str(e))
+    if lazy and strict:
+        for key, value in typedef_dict.items():
+            if isinstance(value, dict) and 'fields' in value:
+                validate_fields(key, value['fields'], resolver)
+    resolver.raise_errors()
+    # Keep the source order, rather than the dependency order
+    return {key: parsed[key] for key in typedef_dict}
+
+
+class TypeResolver:
     """
-    model = {}
-    for key, value in typedef_dict.items():
-        model[key] = parse_typedef(key, value, model, typedef_dict)
-    return model
+    Resolves type strings against the typedefs in a definition, memoizing the base type of each
+    named type so that every inheritance chain is only walked once.
+
+    Problems which don't prevent parsing from continuing are collected in `errors`, so they can 
+    all be reported together.
+    """
+    def __init__(self, typedef_dict: dict, lazy: bool = False, externals: Mapping[str,Typedef] = {}):
+        self.typedef_dict = typedef_dict
+        self.lazy = lazy
+        self.externals = externals
+        self.errors: List[str] = []
+        self._base_types: Dict[str,Tuple[type,str]] = {}
+        self._inline_types: Dict[str,Typedef] = {}
+
+    def named_dependency(self, key: str)->Optional[str]:
+        """
+        Get the name of the typedef that the named typedef extends, if any
+        """
+        value = self.typedef_dict[key]
+        type = value.get('type') if isinstance(value, dict) else None
+        if not isinstance(type, str):
+            return None
+        type = type.removeprefix('?').strip()
+        if type in self.typedef_dict and type not in ScalarType and type != 'struct':
+            return type
+        return None
+
+    def order(self)->List[str]:
+        """
+        Order the typedef names so that each typedef comes after the typedef it extends.
+
+        Typedefs which are part of (or extend) an inheritance cycle are left out, and the cycle
+        recorded in `errors`.
+        """
+        # Each typedef extends at most one other, so every walk is a simple chain
+        done: Dict[str,bool] = {}
+        order = []
+        for start in self.typedef_dict:
+            chain = []
+            on_chain = set()
+            current = start
+            while current is not None and current not in done:
+                if current in on_chain:
+                    cycle = chain[chain.index(current):] + [current]
+                    self.errors.append(f"Inheritance cycle: {' -> '.join(cycle)}")
+                    break
+                chain.append(current)
+                on_chain.add(current)
+                current = self.named_dependency(current)
+            ok = current is None or done.get(current, False)
+            for key in reversed(chain):
+                done[key] = ok
+                if ok:
+                    order.append(key)
+        return order
+
+    def preparse(self, type)->Tuple[type, str, Optional[str]]:
+        """
+        Resolve a type string to the kind of type it is, the base type string, and the name of 
+        the named type it extends (if any).
+
+        :raises ParseException: If the type is undefined, or part of an inheritance cycle
+        """
+        if type in ScalarType:
+            return ScalarType, type, None
+        elif type == "struct":
+            return StructType, type, None
+        elif not isinstance(type, str):
+            raise ParseException(f"Undefined type: {type}")
+        elif type in self.typedef_dict:
+            type_type, type_str = self._base_type(type)
+            return type_type, type_str, type
+        elif type in self.externals:
+            type_type, type_str = self._external_base_type(type)
+            return type_type, type_str, type
+        elif type.startswith('?'):
+            _, type_str, extends = self.preparse(type[1:].strip())
+            return NullableType, type_str if type_str.startswith('?') else f"?{type_str}", extends
+        elif ' ' in type.strip():
+            inline = self.inline_typedef(type)
+            return inline.type.__class__, type, inline.parent
+        else:
+            raise ParseException(f"Undefined type: {type}")
+
+    def _base_type(self, name: str)->Tuple[type, str]:
+        try:
+            return self._base_types[name]
+        except KeyError:
+            pass
+        chain = []
+        current = name
+        while current not in self._base_types:
+            if current in chain:
+                raise ParseException(f"Inheritance cycle: {' -> '.join(chain[chain.index(current):] + [current])}")
+            chain.append(current)
+            parent = self.named_dependency(current)
+            if parent is None:
+                value = self.typedef_dict[current]
+                if not isinstance(value, dict) or 'type' not in value:
+                    raise ParseException(f"Typedef {current} has no type")
+                type_type, type_str, _ = self.preparse(value['type'])
+                self._base_types[current] = (type_type, type_str)
+                break
+            current = parent
+        # Fill in from the bottom up, since any link in the chain may add nullability
+        type_type, type_str = self._base_types[current]
+        for key in reversed(chain):
+            if key not in self._base_types:
+                if self.typedef_dict[key]['type'].startswith('?') and not type_str.startswith('?'):
+                    type_type, type_str = NullableType, f"?{type_str}"
+                self._base_types[key] = (type_type, type_str)
+            type_type, type_str = self._base_types[key]
+        return self._base_types[name]
+
+    def _external_base_type(self, name: str)->Tuple[type, str]:
+        """
+        Get the kind of type an external typedef has. Its type has already been resolved, so is
+        used as-is, except that structs (which only bring their own fields) are parsed as usual.
+        """
+        type = self.externals[name].type
+        if isinstance(type, StructType):
+            return StructType, 'struct'
+        elif isinstance(type, NullableType) and isinstance(type.of, StructType):
+            return NullableType, '?struct'
+        return ExternalType, name
+
+    def external_type(self, name: str)->Type:
+        """
+        Get the (already resolved) type of an external typedef
+        """
+        return self.externals[name].type
+
+    def inline_typedef(self, type_str: str)->Typedef:
+        """
+        Parse an inline type string, such as `list of string`, `array of 5 int`, 
+        `mapping of string to Age`, or `?int`.
+
+        Results are memoized, so each distinct string is only parsed once, and every typedef using
+        it shares the same instance. The returned typedef is anonymous, and only its type and 
+        parent are meaningful.
+
+        :raises ParseException: If the string is not a valid inline type
+        """
+        try:
+            return self._inline_types[type_str]
+        except KeyError:
+            pass
+        tokens = _INLINE_TOKEN.findall(type_str)
+        typedef, end = self._parse_inline(tokens, 0, type_str)
+        if end != len(tokens):
+            raise ParseException(f"Unexpected {tokens[end]!r} in type {type_str!r}")
+        self._inline_types[type_str] = typedef
+        return typedef
+
+    def _parse_inline(self, tokens: List[str], position: int, type_str: str)->Tuple[Typedef, int]:
+        if position >= len(tokens):
+            raise ParseException(f"Incomplete type: {type_str!r}")
+        token = tokens[position]
+        parent = None
+        if token == '?':
+            of, end = self._parse_inline(tokens, position + 1, type_str)
+            type = NullableType(of.type)
+            parent = of.parent
+        elif token in ('list', 'array', 'mapping') and tokens[position+1:position+2] == ['of']:
+            end = position + 2
+            if token == 'list':
+                of, end = self._parse_inline(tokens, end, type_str)
+                type = CollectionType(of)
+            elif token == 'array':
+                if end >= len(tokens) or not tokens[end].isdigit():
+                    raise ParseException(f"Array without a length in type {type_str!r}")
+                count = int(tokens[end])
+                of, end = self._parse_inline(tokens, end + 1, type_str)
+                type = CollectionType(of, count)
+            else:
+                if end >= len(tokens) or tokens[end] not in ScalarType:
+                    raise ParseException(f"Mapping keys must be a primitive type in type {type_str!r}")
+                keys, end = self._parse_inline(tokens, end, type_str)
+                if tokens[end:end+1] != ['to']:
+                    raise ParseException(f"Mapping without 'to' in type {type_str!r}")
+                value, end = self._parse_inline(tokens, end + 1, type_str)
+                type = MappingType(keys, value)
+        else:
+            end = position + 1
+            if token in ScalarType:
+                type = ScalarType(token)
+            elif token in self.typedef_dict or token in self.externals:
+                type = NamedTypeReference(token)
+                parent = token
+            elif token == 'struct':
+                raise ParseException(f"Inline structs are not supported, use a named type instead in type {type_str!r}")
+            else:
+                raise ParseException(f"Undefined type: {token}")
+        # Share identical sub-types, e.g. the `list of string` in `mapping of string to list of string`
+        name = ' '.join(tokens[position:end]).replace('? ', '?')
+        typedef = self._inline_types.get(name)
+        if typedef is None:
+            typedef = self._inline_types[name] = Typedef(name, type, _NO_TAGS, None, parent)
+        return typedef, end
+
+    def raise_errors(self):
+        """
+        :raises ParseException: If any errors have been collected
+        """
+        errors = list(dict.fromkeys(self.errors))
+        if len(errors) == 1:
+            raise ParseException(errors[0])
+        elif errors:
+            raise ParseException(f"{len(errors)} errors found:\n" + '\n'.join(f"  {error}" for error in errors))
 
 
-def parse_typedef(key, value, model, typedef_dict)->Typedef:
+def parse_typedef(key, value, resolver: TypeResolver)->Typedef:
     """
     Build a typedef from an array
     
@@ -22,36 +264,22 @@ def parse_typedef(key, value, model, typedef_dict)->Typedef:
     """
     if 'type' not in value:
         raise ParseException(f"Typedef {key} has no type")
-    type_type, resolved_type_str, extends = preparse_type_string(value['type'], typedef_dict)
-    type = parse_type(key, value, type_type, resolved_type_str, model, typedef_dict)
+    type_type, resolved_type_str, extends = resolver.preparse(value['type'])
+    type = parse_type(key, value, type_type, resolved_type_str, resolver)
     if 'docs' in value:
         if not isinstance(value['docs'], str):
-            raise ParseException("Typedef {key} has a non-string docs")
+            raise ParseException(f"Typedef {key} has a non-string docs")
         docs = value['docs']
     else:
         docs = None
     if 'tags' in value:
         tags = parse_tags(key, value['tags'])
     else:
-        tags = TagRepository([])
+        tags = _NO_TAGS
     return Typedef(key, type, tags, docs, extends)
-
-
-def preparse_type_string(type, typedef_dict)->Tuple[type, str, Optional[str]]:
-    if type in ScalarType:
-        return ScalarType, type, None
-    elif type == "struct":
-        return StructType, type, None
-    elif isinstance(type, str) and type in typedef_dict:
-        parent_type = typedef_dict[type]['type']
-        parent_preparse = preparse_type_string(parent_type, typedef_dict)
-        return parent_preparse[0], parent_preparse[1], type
-    # TODO parse inline type
-    else:
-        raise ParseException(f"Undefined type: {type}")
     
 
-def parse_type(key, value, type_type, type_str, model, typedef_dict)->Type:
+def parse_type(key, value, type_type, type_str, resolver: TypeResolver)->Type:
     """
     Parse a typedef string into an actual type. 
     
@@ -59,33 +287,116 @@ def parse_type(key, value, type_type, type_str, model, typedef_dict)->Type:
     """
     if type_type is ScalarType:
         return ScalarType(type_str)
+    elif type_type is ExternalType:
+        return resolver.external_type(type_str)
+    elif type_type is NullableType:
+        inner_type_type, inner_type_str, _ = resolver.preparse(type_str[1:])
+        if inner_type_type is StructType:
+            return NullableType(parse_type(key, value, inner_type_type, inner_type_str, resolver))
+        elif inner_type_type is ExternalType:
+            type = resolver.external_type(inner_type_str)
+            return type if isinstance(type, NullableType) else NullableType(type)
+        return resolver.inline_typedef(type_str).type
+    elif type_type in (CollectionType, MappingType):
+        return resolver.inline_typedef(type_str).type
     elif type_type is StructType:
+        if resolver.lazy:
+            return StructType(LazyFields(key, value.get('fields', {}), resolver))
         fields = {}
         for field_key, field_value in value.get('fields', {}).items():
-            fields[field_key] = parse_typedef(f"{key}.{field_key}", field_value, model, typedef_dict)
+            # Keep going after a bad field, so all the problems can be reported at once
+            try:
+                fields[field_key] = parse_typedef(f"{key}.{field_key}", field_value, resolver)
+            except ParseException as e:
+                resolver.errors.append(str(e))
         return StructType(fields)
     else:
         raise ValueError(f'Unsupported type_type: {type_type}')
 
 
-def parse_tags(typedef_key, tags:Union[list,dict])->TagRepository:
+class LazyFields(Mapping[str,Typedef]):
     """
-    Build a list of tags from an array
-    
+    Struct fields which are parsed from the source the first time they are accessed, and cached.
+
+    Behaves like the dict of fields that eager parsing would have produced. Pickles (and so
+    cached models) keep the fields unparsed, along with any which have been parsed already.
+    """
+    __slots__ = ('_key', '_source', '_resolver', '_parsed')
+
+    def __init__(self, key: str, source: dict, resolver: TypeResolver):
+        self._key = key
+        self._source = source
+        self._resolver = resolver
+        self._parsed: Dict[str,Typedef] = {}
+
+    def __getitem__(self, field_key: str)->Typedef:
+        try:
+            return self._parsed[field_key]
+        except KeyError:
+            pass
+        field = parse_typedef(f"{self._key}.{field_key}", self._source[field_key], self._resolver)
+        return self._parsed.setdefault(field_key, field)
+
+    def __iter__(self):
+        return iter(self._source)
+
+    def __len__(self):
+        return len(self._source)
+
+    def __contains__(self, field_key):
+        return field_key in self._source
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def validate_fields(key, fields: dict, resolver: TypeResolver):
+    """
+    Check struct fields (recursively) for any problems parsing would find, without building the 
+    typedefs. Problems are collected in the resolver.
+    """
+    for field_key, field_value in fields.items():
+        field_key = f"{key}.{field_key}"
+        try:
+            if not isinstance(field_value, dict) or 'type' not in field_value:
+                raise ParseException(f"Typedef {field_key} has no type")
+            resolver.preparse(field_value['type'])
+            if 'docs' in field_value and not isinstance(field_value['docs'], str):
+                raise ParseException(f"Typedef {field_key} has a non-string docs")
+            if 'tags' in field_value:
+                for _ in iter_tag_items(field_key, field_value['tags']):
+                    pass
+        except ParseException as e:
+            resolver.errors.append(str(e))
+        if isinstance(field_value, dict) and 'fields' in field_value:
+            validate_fields(field_key, field_value['fields'], resolver)
+
+
+def iter_tag_items(typedef_key, tags:Union[list,dict]):
+    """
+    Iterate over the key-value pairs in an array of tags
+
     :raises ParseException: If the input is not well-formed
     """
-    parsed = []
     if isinstance(tags, dict):
-        for key, value in tags.items():
-            parsed.append(Tag.from_key_value(key, value))
+        yield from tags.items()
     else:
         for value in tags:
             if isinstance(value, str):
                 # A plain string alone is a boolean flag
-                parsed.append(Tag.from_key_value(value, True))
+                yield value, True
             elif isinstance(value, dict) and len(value) == 1:
                 # A k-v pair as a dict
-                parsed.append(Tag.from_key_value(*list(value.items())[0]))
+                yield next(iter(value.items()))
             else:
                 raise ParseException(f"Tag {repr(value)} in typedef {typedef_key} could not be parsed")
-    return TagRepository(parsed)
\ No newline at end of file
+
+
+def parse_tags(typedef_key, tags:Union[list,dict])->TagRepository:
+    """
+    Build a list of tags from an array. Identical tags, and repositories of identical tags, are
+    shared (see `Tag.interned`).
+    
+    :raises ParseException: If the input is not well-formed
+    """
+    return TagRepository.interned(Tag.from_key_value(key, value) for key, value in iter_tag_items(typedef_key, tags))
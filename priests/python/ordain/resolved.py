@@ -0,0 +1,133 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple, Iterator
+from .model import *
+from .denominations import Denomination
+from .denominational_view import DenominationalTypedefView, ViewCache, is_ignored_by
+
+_NO_TAGS: Tuple[Tag,...] = ()
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedTypedef:
+    """
+    A typedef with all of its denominational tags resolved ahead of time.
+
+    This holds the same information as a `DenominationalTypedefView`, but computed once and
+    stored in immutable mappings, so it is cheap to query and safe to share between threads.
+    """
+    name: str
+    """
+    The type name (adjusted for the denomination)
+    """
+    typedef: Typedef
+    """
+    The underlying typedef being represented
+    """
+    is_ignored: bool
+    """
+    Indicates if this typedef should be ignored for the denomination
+    """
+    top_tags: Mapping[str,Tag]
+    """
+    The best inherited tag for each tag name, for tags which overwrite one another
+    """
+    stacked_tags: Mapping[str,Tuple[Tag,...]]
+    """
+    All inherited tags for each tag name, in source order, for tags which stack
+    """
+    fields: Optional[Mapping[str,"ResolvedTypedef"]] = None
+    """
+    The resolved struct fields, if applicable. Only includes fields which should not be ignored.
+    """
+
+    @property
+    def impl(self)->Optional[Tag]:
+        """
+        Specifies an underlying implementation type; or None to use the default
+        """
+        return self.top_tags.get('impl')
+
+    def tag_top(self, tag_name: str)->Optional[Tag]:
+        """
+        Get the best inherited tag with the given name, or None.
+        """
+        return self.top_tags.get(tag_name)
+
+    def tag_all(self, tag_name: str)->Tuple[Tag,...]:
+        """
+        Get all inherited tags with the given name, in source order.
+        """
+        return self.stacked_tags.get(tag_name, _NO_TAGS)
+
+
+@dataclass(frozen=True, slots=True)
+class ResolvedSchema(Mapping[str,ResolvedTypedef]):
+    """
+    A whole model resolved for a single denomination. Maps typedef names to resolved typedefs.
+
+    Ignored typedefs are included (check `is_ignored`), since other typedefs may still refer to them.
+    """
+    denomination: Denomination
+    typedefs: Mapping[str,ResolvedTypedef]
+
+    def __getitem__(self, key: str)->ResolvedTypedef:
+        return self.typedefs[key]
+
+    def __iter__(self)->Iterator[str]:
+        return iter(self.typedefs)
+
+    def __len__(self)->int:
+        return len(self.typedefs)
+
+
+def resolve(model: Mapping[str,Typedef], denomination: Denomination)->ResolvedSchema:
+    """
+    Resolve all the denominational tags in a model in a single pass.
+    """
+    cache = ViewCache(model, denomination)
+    return ResolvedSchema(denomination, MappingProxyType({
+        name: resolve_view(cache.view(name))
+        for name in model
+    }))
+
+
+def resolve_view(view: DenominationalTypedefView)->ResolvedTypedef:
+    """
+    Resolve a single typedef (and its struct fields) from a denominational view.
+    """
+    denomination = view.denomination
+    recognized = denomination.recognized_cannons
+    ranks = denomination.cannon_ranks
+    top_tags = {}
+    top_ranks = {}
+    stacked_tags = {}
+    universal_top = {}
+    for tag in view.tag_heritage:
+        if tag.cannon is None:
+            universal_top[tag.name] = tag
+        elif tag.cannon not in recognized:
+            continue
+        stacked_tags.setdefault(tag.name, []).append(tag)
+        # Equal ranks go to whichever tag appears last
+        rank = ranks[tag.cannon]
+        if rank <= top_ranks.get(tag.name, rank):
+            top_tags[tag.name] = tag
+            top_ranks[tag.name] = rank
+    is_ignored = is_ignored_by(denomination, top_tags.get('ignore'), universal_top.get('not-if'), universal_top.get('only-if'))
+    fields = None
+    if view.typedef.struct_fields is not None:
+        fields = {}
+        for key in view.typedef.struct_fields:
+            field = resolve_view(view.field_view(key))
+            if not field.is_ignored:
+                fields[key] = field
+        fields = MappingProxyType(fields)
+    return ResolvedTypedef(
+        view.name,
+        view.typedef,
+        is_ignored,
+        MappingProxyType(top_tags),
+        MappingProxyType({name: tuple(tags) for name, tags in stacked_tags.items()}),
+        fields,
+    )
@@ -0,0 +1,141 @@
+"""
+Models split into shards which are only loaded when they are used.
+
+A large schema can be kept as a directory of ordination files (shards), along with an index
+file mapping each typedef name to the shard which defines it. A `ShardedModel` reads only the
+index up front, and parses (or loads from the cache) a shard the first time one of its typedefs
+is looked up, so memory and startup time depend on the typedefs actually used rather than the
+size of the whole schema.
+"""
+from .cache import LOADERS
+from .exceptions import OrdainException
+from .imports import load_models, merge
+from .model import *
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Set, Union
+import json
+import os
+
+INDEX_FILE = 'ordain-index.json'
+"""
+The name of the index file in a shard directory
+"""
+
+
+class ShardedModel(Mapping[str,Typedef]):
+    """
+    A model whose typedefs are loaded from their shards on first lookup.
+
+    Iterating, `len`, and `in` only use the index, so don't load anything. Looking a typedef up
+    loads its shard, along with any files the shard imports; parent lookups made while resolving
+    tag heritage go through the same path, so only the ancestors actually reached are loaded.
+    """
+    def __init__(self, index: Mapping[str,Union[str,os.PathLike]], root: Union[str,os.PathLike,None] = None, cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True):
+        """
+        :param index: The shard defining each typedef
+        :param root: The directory shard paths are relative to; by default, the working directory
+        :param cache_dir: Where to keep cached models; see `ordain.cache.default_cache_dir`.
+        :param use_cache: Set to false to always parse shards, and not write to the cache.
+        """
+        root = Path('.' if root is None else root)
+        self._index: Dict[str,Path] = {name: (root / shard).resolve() for name, shard in index.items()}
+        self._cache_dir = cache_dir
+        self._use_cache = use_cache
+        self._typedefs: Dict[str,Typedef] = {}
+        self._models: Dict[Path,Mapping[str,Typedef]] = {}
+
+    @classmethod
+    def from_directory(cls, directory: Union[str,os.PathLike], cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True)->"ShardedModel":
+        """
+        Open a directory of shards using its index file. If there is no index file, one is built
+        in memory, which loads every shard; use `write_index` to avoid that.
+
+        :raises OrdainException: If the index file is not valid
+        """
+        directory = Path(directory)
+        try:
+            index = json.loads((directory / INDEX_FILE).read_bytes())
+        except FileNotFoundError:
+            index = build_index(directory, cache_dir, use_cache)
+        except ValueError as e:
+            raise OrdainException(f"Invalid shard index {directory / INDEX_FILE}: {e}") from None
+        if not isinstance(index, dict) or not all(isinstance(shard, str) for shard in index.values()):
+            raise OrdainException(f"Invalid shard index {directory / INDEX_FILE}: expected an object mapping names to paths")
+        return cls(index, directory, cache_dir, use_cache)
+
+    @property
+    def loaded_shards(self)->Set[Path]:
+        """
+        The files which have been loaded so far, including any imported by the shards
+        """
+        return set(self._models)
+
+    def shard_of(self, name: str)->Path:
+        """
+        Get the shard which defines a typedef, without loading it
+
+        :raises KeyError: If the typedef is not in the index
+        """
+        return self._index[name]
+
+    def __getitem__(self, name: str)->Typedef:
+        try:
+            return self._typedefs[name]
+        except KeyError:
+            pass
+        shard = self._index[name]
+        if shard not in self._models:
+            self._load(shard)
+        try:
+            return self._typedefs[name]
+        except KeyError:
+            raise OrdainException(f"Shard index is out of date: {name} is not defined in {shard}") from None
+
+    def _load(self, shard: Path):
+        models = load_models([shard], self._cache_dir, self._use_cache, max_workers=1, known=self._models)
+        for path, model in models.items():
+            if path not in self._models:
+                self._models[path] = model
+                for name, typedef in model.items():
+                    self._typedefs.setdefault(name, typedef)
+
+    def __iter__(self)->Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self)->int:
+        return len(self._index)
+
+    def __contains__(self, name)->bool:
+        return name in self._index
+
+    def __repr__(self):
+        return f"<{type(self).__name__} with {len(self._models)} of {len(set(self._index.values()))} shards loaded>"
+
+
+def build_index(directory: Union[str,os.PathLike], cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True)->Dict[str,str]:
+    """
+    Build the index for a directory of shards, by loading every ordination file in it (and its
+    subdirectories). Paths in the index are relative to the directory.
+
+    :raises ParseException: If a shard is not well-formed, or a typedef is defined in more than
+        one shard
+    """
+    directory = Path(directory).resolve()
+    shards = sorted(path for path in directory.rglob('*') if path.suffix in LOADERS and path.name != INDEX_FILE and path.is_file())
+    models = load_models(shards, cache_dir, use_cache)
+    # Raises if any typedef is defined in more than one shard
+    merge(models)
+    return {
+        name: path.relative_to(directory).as_posix() if path.is_relative_to(directory) else str(path)
+        for path, model in models.items()
+        for name in model
+    }
+
+
+def write_index(directory: Union[str,os.PathLike], cache_dir: Union[str,os.PathLike,None] = None, use_cache: bool = True)->Dict[str,str]:
+    """
+    Build the index for a directory of shards, and write it to the directory's index file
+    """
+    index = build_index(directory, cache_dir, use_cache)
+    (Path(directory) / INDEX_FILE).write_text(json.dumps(index, indent=1, sort_keys=True))
+    return index
@@ -0,0 +1,308 @@
+"""
+Validating values, such as decoded JSON payloads, against typedefs.
+
+Rather than walking the model for every value, a `ValidatorCompiler` generates Python source for
+a function per named typedef, with the tags (`#required`, `#check`), field names, and enum values
+for its denomination already resolved, and compiles it once. Scalars, enums, and struct fields
+are checked inline; references to other named typedefs become calls to their functions, so
+recursive typedefs work.
+
+What is accepted:
+
+- Structs are dicts, keyed by each field's (denominational) name. A missing field is the same as
+  a null one, and keys which aren't fields are allowed. Ignored fields aren't checked.
+- Lists and arrays are lists; mappings are dicts.
+- `int`, `float` (which also accepts ints), `string`, and `bool` are the matching Python types.
+- `date`, `datetime`, and `time` are `datetime` objects or ISO 8601 strings, `binary` is bytes or
+  a base64 string, and `decimal` is a `Decimal`, a number, or a numeric string.
+- Null is only allowed for nullable types, unless the typedef is `#required`.
+"""
+from .checks import compile_check
+from .codegen import FunctionCompiler, named_reference, struct_field_views
+from .denominational_view import DenominationalTypedefView, ViewCache
+from .denominations import Denomination
+from .exceptions import ModelException, ValidationException
+from .model import *
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+import binascii
+
+Validator = Callable[[Any],None]
+"""
+A compiled validator: raises `ValidationException` for the first problem found in a value
+"""
+
+
+class ValidatorCompiler(FunctionCompiler):
+    """
+    Compiles and caches the validators for a single model and denomination.
+
+    Validators are compiled the first time they are asked for, along with the validators of any
+    named typedefs they refer to. If the model changes, use a new compiler.
+    """
+    def __init__(self, model: Mapping[str,Typedef], denomination: Denomination, views: Optional[ViewCache] = None):
+        """
+        :param views: A view cache for the same model and denomination to share, if there is one
+        """
+        super().__init__(model, denomination, views, _HELPERS)
+        self._checks: Dict[str,str] = {}
+
+    def validator(self, typedef: Union[str,Typedef])->Validator:
+        """
+        Get the validator for a named typedef, or for any typedef (such as a struct field) from
+        the model.
+
+        :raises ModelException: If the typedef refers to an undefined typedef, or has a check which
+            can't be compiled
+        """
+        return self._get('validate', typedef)
+
+    def validate(self, typedef: Union[str,Typedef], value):
+        """
+        Validate a value against a typedef
+
+        :raises ValidationException: If the value is not valid
+        """
+        self.validator(typedef)(value)
+
+    def _check(self, expression: str)->str:
+        """
+        Get the name of the compiled function for a check expression
+        """
+        try:
+            return self._checks[expression]
+        except KeyError:
+            pass
+        name = self._checks[expression] = self._constant(compile_check(expression))
+        return name
+
+    def _write(self, function: str, kind: str, view: DenominationalTypedefView)->str:
+        return _FunctionWriter(self, function, view).source
+
+
+class _FunctionWriter:
+    """
+    Generates the source of the validator function for one typedef.
+
+    Errors are raised with their path relative to the innermost loop or function, and each loop
+    or call prepends its part of the path as the error passes through, so valid values never pay
+    for building paths.
+    """
+    def __init__(self, compiler: ValidatorCompiler, function: str, view: DenominationalTypedefView):
+        self._compiler = compiler
+        self._views = compiler._views
+        self._variables = 0
+        self._lines: List[str] = []
+        self._typedef(view, 'v0', (), 1)
+        self.source = '\n'.join([f"def {function}(v0):", *self._lines, "    return None"])
+
+    def _line(self, indent: int, text: str):
+        self._lines.append('    ' * indent + text)
+
+    def _variable(self)->str:
+        self._variables += 1
+        return f"v{self._variables}"
+
+    def _capture(self, write: Callable[[],object])->List[str]:
+        """
+        Get the lines written by a function, without keeping them
+        """
+        lines = self._lines
+        self._lines = []
+        try:
+            write()
+            return self._lines
+        finally:
+            self._lines = lines
+
+    def _typedef(self, view: DenominationalTypedefView, var: str, path: tuple, indent: int):
+        typedef = view.typedef
+        type = typedef.type
+        nullable = isinstance(type, NullableType)
+        if isinstance(type, NullableType):
+            type = type.of
+        required_tag = view.tag_search_top('required')
+        required = required_tag is not None and required_tag.value is not False
+        delegate = named_reference(typedef, type)
+        # A delegate's own validator applies the tags it passes down
+        checks = view.tag_search_all('check', inheritable=delegate is None)
+        if nullable and not required:
+            body = self._capture(lambda: self._body(view, type, delegate, checks, var, path, indent + 1))
+            if body:
+                self._line(indent, f"if {var} is not None:")
+                self._lines.extend(body)
+            return
+        if required or (delegate is None and type is ScalarType.any):
+            self._line(indent, f"if {var} is None:")
+            self._line(indent + 1, f"raise _error({'is required' if required else 'must not be null'!r}, {path!r})")
+        # Otherwise, the type check rejects null
+        self._body(view, type, delegate, checks, var, path, indent)
+
+    def _body(self, view: DenominationalTypedefView, type: Type, delegate: Optional[str], checks: TagRepository, var: str, path: tuple, indent: int):
+        if delegate is not None:
+            self._call(self._compiler._function('validate', delegate), var, path, indent)
+        else:
+            self._type(view, type, var, path, indent)
+        for tag in checks:
+            expression = str(tag.value)
+            self._line(indent, f"if not {self._compiler._check(expression)}({var}):")
+            self._line(indent + 1, f"raise _error({f'fails check {expression!r}'!r}, {path!r})")
+
+    def _type(self, view: DenominationalTypedefView, type: Type, var: str, path: tuple, indent: int):
+        if isinstance(type, ScalarType):
+            self._scalar(type, var, path, indent)
+        elif isinstance(type, EnumType):
+            self._scalar(type.of, var, path, indent)
+            try:
+                values = self._compiler._constant(frozenset(type.values))
+            except TypeError:
+                values = self._compiler._constant(tuple(type.values))
+            message = f"must be one of {', '.join(map(repr, type.values))}"
+            self._line(indent, f"if {var} not in {values}:")
+            self._line(indent + 1, f"raise _error({message!r}, {path!r})")
+        elif isinstance(type, StructType):
+            self._line(indent, f"if not isinstance({var}, dict):")
+            self._line(indent + 1, f"raise _type_error('object', {var}, {path!r})")
+            for field in struct_field_views(view, self._views).values():
+                item = self._variable()
+                self._line(indent, f"{item} = {var}.get({field.name!r})")
+                self._typedef(field, item, (*path, field.name), indent)
+        elif isinstance(type, CollectionType):
+            expected = 'list' if type.count is None else f"array of {type.count}"
+            self._line(indent, f"if not isinstance({var}, list):")
+            self._line(indent + 1, f"raise _type_error({expected!r}, {var}, {path!r})")
+            if type.count is not None:
+                self._line(indent, f"if len({var}) != {type.count}:")
+                self._line(indent + 1, f"raise _error({f'must have {type.count} items'!r}, {path!r})")
+            index, item = self._variable(), self._variable()
+            element = self._inline_view(view, type.of, '[]')
+            body = self._capture(lambda: self._typedef(element, item, (), indent + 2))
+            self._loop(f"for {index}, {item} in enumerate({var}):", index, body, path, indent)
+        elif isinstance(type, MappingType):
+            self._line(indent, f"if not isinstance({var}, dict):")
+            self._line(indent + 1, f"raise _type_error('mapping', {var}, {path!r})")
+            key, item = self._variable(), self._variable()
+            keys = self._inline_view(view, type.keys, '[key]')
+            value = self._inline_view(view, type.value, '[value]')
+            body = self._capture(lambda: (self._typedef(keys, key, (), indent + 2), self._typedef(value, item, (), indent + 2)))
+            self._loop(f"for {key}, {item} in {var}.items():", key, body, path, indent)
+        elif isinstance(type, NullableType):
+            body = self._capture(lambda: self._type(view, type.of, var, path, indent + 1))
+            if body:
+                self._line(indent, f"if {var} is not None:")
+                self._lines.extend(body)
+        else:
+            raise ModelException(f"Cannot validate typedef {view.path}: unsupported type {type!r}")
+
+    def _scalar(self, scalar: ScalarType, var: str, path: tuple, indent: int):
+        test = _SCALAR_TESTS[scalar]
+        if test is not None:
+            self._line(indent, f"if not ({test.format(var)}):")
+            self._line(indent + 1, f"raise _type_error({scalar.value!r}, {var}, {path!r})")
+
+    def _call(self, function: str, var: str, path: tuple, indent: int):
+        if not path:
+            self._line(indent, f"{function}({var})")
+            return
+        self._line(indent, "try:")
+        self._line(indent + 1, f"{function}({var})")
+        self._line(indent, "except _ValidationException as e:")
+        self._line(indent + 1, f"raise e.within({', '.join(map(repr, path))}) from None")
+
+    def _loop(self, header: str, key: str, body: List[str], path: tuple, indent: int):
+        if not body:
+            return
+        self._line(indent, header)
+        self._line(indent + 1, "try:")
+        self._lines.extend(body)
+        self._line(indent + 1, "except _ValidationException as e:")
+        self._line(indent + 2, f"raise e.within({', '.join([*map(repr, path), key])}) from None")
+
+    def _inline_view(self, view: DenominationalTypedefView, typedef: Typedef, suffix: str)->DenominationalTypedefView:
+        return DenominationalTypedefView(typedef.name, typedef, view.model, view.denomination, self._views, f"{view.path}{suffix}")
+
+
+_SCALAR_TESTS: Dict[ScalarType,Optional[str]] = {
+    ScalarType.binary: "_is_binary({0})",
+    ScalarType.bool: "type({0}) is bool",
+    ScalarType.date: "_is_date({0})",
+    ScalarType.datetime: "_is_datetime({0})",
+    ScalarType.decimal: "_is_decimal({0})",
+    ScalarType.float: "type({0}) is float or type({0}) is int",
+    ScalarType.int: "type({0}) is int",
+    ScalarType.string: "type({0}) is str",
+    ScalarType.time: "_is_time({0})",
+    ScalarType.any: None,
+}
+
+
+def _describe(value)->str:
+    if value is None:
+        return 'null'
+    elif isinstance(value, dict):
+        return 'object'
+    return type(value).__name__
+
+
+def _error(message: str, path: tuple)->ValidationException:
+    return ValidationException(message, path)
+
+
+def _type_error(expected: str, value, path: tuple)->ValidationException:
+    if value is None:
+        return ValidationException('must not be null', path)
+    return ValidationException(f"expected {expected}, got {_describe(value)}", path)
+
+
+def _parses(parse: Callable, value)->bool:
+    try:
+        parse(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_binary(value)->bool:
+    if isinstance(value, (bytes, bytearray)):
+        return True
+    return isinstance(value, str) and _parses(lambda text: binascii.a2b_base64(text, strict_mode=True), value)
+
+
+def _is_date(value)->bool:
+    if isinstance(value, str):
+        return _parses(date.fromisoformat, value)
+    return type(value) is date
+
+
+def _is_datetime(value)->bool:
+    if isinstance(value, str):
+        return _parses(datetime.fromisoformat, value)
+    return isinstance(value, datetime)
+
+
+def _is_time(value)->bool:
+    if isinstance(value, str):
+        return _parses(time.fromisoformat, value)
+    return isinstance(value, time)
+
+
+def _is_decimal(value)->bool:
+    if isinstance(value, str):
+        try:
+            return Decimal(value).is_finite()
+        except InvalidOperation:
+            return False
+    return isinstance(value, (Decimal, int, float)) and not isinstance(value, bool)
+
+
+_HELPERS = {
+    '_ValidationException': ValidationException,
+    '_error': _error,
+    '_type_error': _type_error,
+    '_is_binary': _is_binary,
+    '_is_date': _is_date,
+    '_is_datetime': _is_datetime,
+    '_is_time': _is_time,
+    '_is_decimal': _is_decimal,
+}
@@ -0,0 +1,156 @@
+from ordain.batch import BatchValidator
+from ordain.denominations import KnownDenomination
+from ordain.exceptions import ModelException, ValidationException
+from ordain.model import *
+from ordain.parse_dict import parse_typedefs
+from ordain.validation import ValidatorCompiler
+from datetime import date
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def model():
+    model = parse_typedefs({
+        'Age': {'type': 'int', 'tags': [{'check': '>= 0'}, {'check': '< 150'}]},
+        'Person': {
+            'type': 'struct',
+            'fields': {
+                'name': {'type': 'string', 'tags': [{'json.name': 'fullName'}]},
+                'age': {'type': '?Age'},
+                'score': {'type': 'float', 'tags': [{'check': '<= 1.0'}]},
+                'email': {'type': '?string', 'tags': ['required']},
+                'born': {'type': '?date'},
+                'tags': {'type': '?list of string'},
+                'secret': {'type': 'int', 'tags': [{'json.ignore': True}]},
+            },
+        },
+    })
+    level = Typedef('Employee.level', EnumType(ScalarType.int, [1, 2, 3]), TagRepository([]))
+    model['Employee'] = Typedef('Employee', StructType({'level': level}), TagRepository([]), parent='Person')
+    return model
+
+
+def columns(**overrides):
+    return {
+        'fullName': np.array(['ann', 'bob', 'cy'], dtype=object),
+        'age': np.array([30, 40, 50]),
+        'score': np.array([0.5, 1.0, 0.0]),
+        'email': ['a@x', 'b@x', 'c@x'],
+        'born': np.array(['2000-01-01', '1990-12-31', 'NaT'], dtype='datetime64[D]'),
+        **overrides,
+    }
+
+
+def errors(result):
+    return [(error.row, error.path, error.message) for error in result.errors]
+
+
+def test_valid(model):
+    result = BatchValidator('Person', model, KnownDenomination.JsonBase())(columns())
+    assert result.valid
+    assert result.mask.tolist() == [False, False, False]
+    assert result.columns['age'].dtype == np.int64
+    assert result.columns['born'][2] != result.columns['born'][2]
+
+
+def test_ranges_and_nulls(model):
+    validator = BatchValidator('Person', model, KnownDenomination.JsonBase())
+    result = validator(columns(age=np.array([-1, np.nan, 200]), score=np.array([1.5, 0.2, np.nan]), email=['a', None, 'c']))
+    assert result.mask.tolist() == [True, True, True]
+    assert errors(result) == [
+        (0, ('age',), "fails check '>= 0'"),
+        (0, ('score',), "fails check '<= 1.0'"),
+        (1, ('email',), 'is required'),
+        (2, ('age',), "fails check '< 150'"),
+        (2, ('score',), 'must not be null'),
+    ]
+
+
+def test_coercion(model):
+    validator = BatchValidator('Person', model, KnownDenomination.JsonBase())
+    result = validator(columns(age=['30', 4.0, 4.5], born=['2000-01-01', date(2001, 2, 3), '2001-02-30']))
+    assert errors(result) == [
+        (2, ('age',), "expected int, got 4.5"),
+        (2, ('born',), "expected date, got '2001-02-30'"),
+    ]
+    assert result.columns['age'].tolist()[:2] == [30, 4]
+    assert result.columns['born'][1] == np.datetime64('2001-02-03')
+    assert errors(validator(columns(age=np.array([True, False, True])))) == [(row, ('age',), f"expected int, got {value}") for row, value in enumerate([True, False, True])]
+    assert errors(validator(columns(fullName=np.array([b'a', b'b', b'c'])))) == [(row, ('fullName',), f"expected string, got {value!r}") for row, value in enumerate([b'a', b'b', b'c'])]
+
+
+
+def test_ints_out_of_range(model):
+    validator = BatchValidator('Person', model, KnownDenomination.JsonBase())
+    result = validator(columns(age=np.array([30, 2**64 - 1, 2**63], dtype=np.uint64)))
+    assert errors(result) == [
+        (1, ('age',), f"expected int, got {2**64 - 1}"),
+        (2, ('age',), f"expected int, got {2**63}"),
+    ]
+    assert errors(validator(columns(age=[30, 2**64, -2**63]))) == [(1, ('age',), f"expected int, got {2**64}"), (2, ('age',), "fails check '>= 0'")]
+
+
+def test_masked_values_are_null(model):
+    validator = BatchValidator('Person', model, KnownDenomination.JsonBase())
+    age = np.ma.masked_array([30, 1000, 50], mask=[False, True, False])
+    assert validator(columns(age=age)).valid
+    assert errors(validator(columns(score=np.ma.masked_array([0.1, 2.0, 0.3], mask=[False, True, False])))) == [(1, ('score',), 'must not be null')]
+
+
+def test_missing_columns(model):
+    validator = BatchValidator('Person', model, KnownDenomination.JsonBase())
+    cols = columns()
+    del cols['email']
+    assert errors(validator(cols)) == [(row, ('email',), 'is required') for row in range(3)]
+    with pytest.raises(ValidationException):
+        validator({}, None)
+    assert len(validator({}, 2).errors) == 6
+
+
+def test_mismatched_lengths(model):
+    with pytest.raises(ValidationException) as info:
+        BatchValidator('Person', model, KnownDenomination.JsonBase())(columns(age=[1, 2]))
+    assert info.value.path == ('age',)
+
+
+def test_other_fields_use_row_validator(model):
+    validator = BatchValidator('Person', model, KnownDenomination.JsonBase())
+    result = validator(columns(tags=[['a'], None, ['b', 3]]))
+    assert errors(result) == [(2, ('tags', 1), 'expected string, got int')]
+
+
+def test_inherited_fields_and_enums(model):
+    validator = BatchValidator('Employee', model, KnownDenomination.JsonBase())
+    result = validator(columns(level=np.array([1, 4, 3])))
+    assert errors(result) == [(1, ('level',), 'must be one of 1, 2, 3')]
+    assert result.mask.tolist() == [False, True, False]
+
+
+def test_denomination(model):
+    validator = BatchValidator('Person', model, KnownDenomination.PythonBase())
+    cols = columns(secret=[1, 2, 'x'])
+    cols['name'] = cols.pop('fullName')
+    assert errors(validator(cols)) == [(2, ('secret',), "expected int, got 'x'")]
+
+
+def test_matches_row_validator(model):
+    rows = [
+        {'fullName': 'ann', 'age': 30, 'score': 0.5, 'email': 'a', 'born': None},
+        {'fullName': 'bob', 'age': -3, 'score': 0.5, 'email': 'b', 'born': None},
+        {'fullName': 7, 'age': 30, 'score': 0.5, 'email': None, 'born': None},
+    ]
+    result = BatchValidator('Person', model, KnownDenomination.JsonBase())({key: [row[key] for row in rows] for key in rows[0]})
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('Person')
+    for row, invalid in zip(rows, result.mask.tolist()):
+        try:
+            validator(row)
+            assert not invalid
+        except ValidationException:
+            assert invalid
+
+
+def test_not_a_struct(model):
+    with pytest.raises(ModelException):
+        BatchValidator('Age', model, KnownDenomination.JsonBase())
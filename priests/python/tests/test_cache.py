@@ -0,0 +1,73 @@
+import json
+import pytest
+from ordain.model import *
+from ordain import cache
+from ordain.exceptions import OrdainException
+
+SOURCE = {
+    'Age': {'type': 'int', 'tags': [{'check': '< 150'}]},
+    'User': {'type': 'struct', 'fields': {'name': {'type': 'string'}, 'age': {'type': 'Age'}, 'tags': {'type': 'list of string'}}},
+}
+
+
+@pytest.fixture
+def counting_loader(monkeypatch):
+    calls = []
+    def loader(source):
+        calls.append(source)
+        return cache._load_json(source)
+    monkeypatch.setitem(cache.LOADERS, '.json', loader)
+    return calls
+
+
+def test_load_uses_cache(tmp_path, counting_loader):
+    source = tmp_path / 'schema.json'
+    source.write_text(json.dumps(SOURCE))
+    first = cache.load(source, tmp_path / 'cache')
+    second = cache.load(source, tmp_path / 'cache')
+    assert len(counting_loader) == 1
+    assert first == second
+    assert second['User'].struct_fields['tags'].type == CollectionType(Typedef('string', ScalarType.string, TagRepository([])))
+
+
+def test_changed_source_is_reparsed(tmp_path, counting_loader):
+    source = tmp_path / 'schema.json'
+    source.write_text(json.dumps(SOURCE))
+    cache.load(source, tmp_path / 'cache')
+    source.write_text(json.dumps({**SOURCE, 'Name': {'type': 'string'}}))
+    model = cache.load(source, tmp_path / 'cache')
+    assert len(counting_loader) == 2
+    assert 'Name' in model
+
+
+def test_lazy_models_are_cached(tmp_path, monkeypatch):
+    monkeypatch.setitem(cache.LOADERS, '.json', lambda source: cache.parse_typedefs(json.loads(source), lazy=True))
+    source = tmp_path / 'schema.json'
+    source.write_text(json.dumps(SOURCE))
+    first = cache.load(source, tmp_path / 'cache')
+    assert first['User'].struct_fields['age'].type is ScalarType.int
+    second = cache.load(source, tmp_path / 'cache')
+    # The model was stored before any fields were parsed, and loading it doesn't parse them
+    assert first['User'].struct_fields._parsed.keys() == {'age'}
+    assert not second['User'].struct_fields._parsed
+    assert first == second
+
+
+def test_unusable_cache_files_are_ignored(tmp_path, counting_loader):
+    source = tmp_path / 'schema.json'
+    source.write_text(json.dumps(SOURCE))
+    cache.load(source, tmp_path / 'cache')
+    [cache_file] = (tmp_path / 'cache').iterdir()
+    data = cache_file.read_bytes()
+    cache_file.write_bytes(data[:-10])
+    assert cache.load(source, tmp_path / 'cache')['Age'].type is ScalarType.int
+    cache_file.write_bytes(data.replace(cache.MODEL_FINGERPRINT, bytes(32)))
+    assert cache.load(source, tmp_path / 'cache')['Age'].type is ScalarType.int
+    assert len(counting_loader) == 3
+
+
+def test_unknown_suffix(tmp_path):
+    source = tmp_path / 'schema.txt'
+    source.write_text('')
+    with pytest.raises(OrdainException):
+        cache.load(source, tmp_path / 'cache')
@@ -0,0 +1,77 @@
+from datetime import date, datetime
+from ordain.checks import Comparison, compile_check, parse_comparison
+from ordain.denominations import KnownDenomination
+from ordain.exceptions import ModelException, ValidationException
+from ordain.parse_dict import parse_typedefs
+from ordain.validation import ValidatorCompiler
+import pytest
+
+
+@pytest.mark.parametrize('expression, passes, fails', [
+    ('< 150', [0, 149, 1.5], [150, 200, 'x', None]),
+    ('>= -1', [-1, 0], [-2]),
+    ('!= ""', ['a'], ['']),
+    ("== 'yes'", ['yes'], ['no']),
+    ('@ > 14', [15], [14]),
+    ('0 <= @ < 10', [0, 9], [-1, 10]),
+    ('$length < 5', ['abcd', [1]], ['abcde', 5]),
+    ('regex /[A-Za-z]+/', ['Ann'], ['Ann1', '', 3]),
+    ('regex /a\\/b/i', ['A/B'], ['ab']),
+    ('$length > 0 and not regex /\\s.*/', ['a'], ['', ' a']),
+    ('@ % 2 == 0 or @ == 1', [0, 1, 4], [3]),
+    ('(@ + 1) * 2 > 10', [5], [4]),
+    ('< 1 or > 5 and != 7', [0, 6], [1, 5, 7]),
+    ('@.x > 1', [{'x': 2}], [{'x': 1}, {}, 3]),
+    ('@ == true', [True], [False]),
+    ('@ == null', [None], [0]),
+    ('1 / @ > 0', [2], [0, -1]),
+])
+def test_checks(expression, passes, fails):
+    check = compile_check(expression)
+    for value in passes:
+        assert check(value) is True, value
+    for value in fails:
+        assert check(value) is False, value
+
+
+def test_variables():
+    assert compile_check('<= $now.year')(date.today().year)
+    assert not compile_check('<= $now.year')(date.today().year + 1)
+    assert compile_check('<= $today')(date(2000, 1, 1))
+    assert compile_check('< $now')(datetime(2000, 1, 1))
+
+
+@pytest.mark.parametrize('expression', [
+    '', '<', '< 150 150', '$unknown > 1', 'regex [a]', 'regex /(/', '@.__class__', '(@ > 1', '@ # 1', 'foo', '"open',
+])
+def test_invalid(expression):
+    with pytest.raises(ModelException):
+        compile_check(expression)
+
+
+def test_compiled_once():
+    assert compile_check('< 42') is compile_check(' < 42 ')
+    assert compile_check('< 42') is not compile_check('< 43')
+
+
+def test_parse_comparison():
+    assert parse_comparison('< 150') == Comparison('<', 150)
+    assert parse_comparison('@ >= -1.5') == Comparison('>=', -1.5)
+    assert parse_comparison("!= ''") == Comparison('!=', '')
+    for expression in ['<= $now.year', '$length < 50', '0 < @ < 1', '@ == true', 'regex /a/', '< 1 or > 5']:
+        assert parse_comparison(expression) is None
+
+
+def test_validator_uses_language():
+    model = parse_typedefs({
+        'Name': {'type': 'string', 'tags': [{'check': '$length < 10'}, {'check': 'regex /[A-Za-z]+/'}]},
+        'Person': {'type': 'struct', 'fields': {'name': {'type': 'Name'}, 'born': {'type': 'int', 'tags': [{'check': '<= $now.year'}]}}},
+    })
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('Person')
+    validator({'name': 'Ann', 'born': 1990})
+    with pytest.raises(ValidationException) as info:
+        validator({'name': 'Ann1', 'born': 1990})
+    assert info.value.message == "fails check 'regex /[A-Za-z]+/'"
+    with pytest.raises(ValidationException) as info:
+        validator({'name': 'Ann', 'born': 9999})
+    assert info.value.path == ('born',)
@@ -0,0 +1,118 @@
+from dataclasses import FrozenInstanceError
+from ordain.classes import ClassCompiler
+from ordain.denominations import KnownDenomination
+from ordain.exceptions import ModelException
+from ordain.model import *
+from ordain.parse_dict import parse_typedefs
+import copy
+import pickle
+import pytest
+import sys
+import types
+
+
+def test_basic_class(basic_model):
+    User = ClassCompiler(basic_model).class_for('User')
+    assert User.__name__ == 'User'
+    assert User.__slots__ == ('username', 'password', 'created')
+    user = User('ann', 'hash', None)
+    assert not hasattr(user, '__dict__')
+    assert user.username == 'ann'
+    user.username = 'bob'
+    assert user == User('bob', 'hash', None)
+    assert user != User('bob', 'other', None)
+    assert repr(user) == "User(username='bob', password='hash', created=None)"
+    with pytest.raises(TypeError):
+        hash(user)
+    with pytest.raises(AttributeError):
+        user.other = 1
+
+
+def test_denominational_names_and_ignored_fields(basic_model):
+    User = ClassCompiler(basic_model, KnownDenomination.PhpBase()).class_for('User')
+    assert User.__slots__ == ('username', 'created')
+    model = parse_typedefs({
+        'Account': {
+            'type': 'struct',
+            'tags': [{'py.name': 'PyAccount'}],
+            'fields': {
+                'class': {'type': 'string', 'tags': [{'py.name': 'kind'}]},
+                'secret': {'type': 'string', 'tags': [{'py.ignore': True}]},
+            },
+        },
+    })
+    Account = ClassCompiler(model).class_for('Account')
+    assert Account.__name__ == 'PyAccount'
+    assert repr(Account(kind='x')) == "PyAccount(kind='x')"
+
+
+def test_inheritance(inheritance_model):
+    compiler = ClassCompiler(inheritance_model)
+    Dog = compiler.class_for('Dog')
+    Animal = compiler.class_for('Animal')
+    assert issubclass(Dog, compiler.class_for('Pet')) and issubclass(Dog, Animal)
+    assert Dog.__slots__ == ('breed',)
+    dog = Dog('male', 'sleeping', 'Rex', 'lab')
+    assert (dog.Sex, dog.Activity, dog.name, dog.breed) == ('male', 'sleeping', 'Rex', 'lab')
+    assert dog != Animal('male', 'sleeping')
+    match dog:
+        case Dog(_, _, _, breed):
+            assert breed == 'lab'
+
+
+def test_frozen():
+    model = parse_typedefs({
+        'Point': {'type': 'struct', 'tags': [{'py.impl': 'frozen'}], 'fields': {'x': {'type': 'float'}, 'y': {'type': 'float'}}},
+        'Label': {'type': 'Point', 'fields': {'text': {'type': '?string'}, 'color': {'type': '?string'}}},
+    })
+    Label = ClassCompiler(model).class_for('Label')
+    label = Label(1.0, 2.0)
+    assert (label.text, label.color) == (None, None)
+    with pytest.raises(FrozenInstanceError):
+        label.x = 3.0
+    with pytest.raises(FrozenInstanceError):
+        del label.x
+    assert {label, Label(1.0, 2.0)} == {label}
+
+
+def test_frozen_compiler(basic_model):
+    User = ClassCompiler(basic_model, frozen=True).class_for('User')
+    with pytest.raises(FrozenInstanceError):
+        User('ann', 'hash', None).username = 'bob'
+
+
+def test_invalid_classes():
+    model = parse_typedefs({
+        'Point': {'type': 'struct', 'tags': [{'py.impl': 'frozen'}], 'fields': {'x': {'type': 'float'}}},
+        'Mutable': {'type': 'Point', 'tags': [{'py.impl': 'slots'}], 'fields': {}},
+        'Age': {'type': 'int'},
+        'Bad': {'type': 'struct', 'fields': {'class': {'type': 'int'}}},
+    })
+    compiler = ClassCompiler(model)
+    for name in ['Mutable', 'Age', 'Bad', 'Missing']:
+        with pytest.raises(ModelException):
+            compiler.class_for(name)
+    assert compiler.class_for('Point')(1.0).x == 1.0
+
+
+def test_copy_and_pickle(monkeypatch):
+    model = parse_typedefs({
+        'Point': {'type': 'struct', 'tags': [{'py.impl': 'frozen'}], 'fields': {'x': {'type': 'float'}, 'tags': {'type': 'list of string'}}},
+        'Label': {'type': 'Point', 'fields': {'text': {'type': '?string'}}},
+    })
+    label = ClassCompiler(model).class_for('Label')(1.0, ['a'], 'hi')
+    assert copy.copy(label) == label
+    assert copy.deepcopy(label) == label and copy.deepcopy(label).tags is not label.tags
+    with pytest.raises(pickle.PicklingError):
+        pickle.dumps(label)
+    module = types.ModuleType('generated_classes')
+    monkeypatch.setitem(sys.modules, 'generated_classes', module)
+    Label = ClassCompiler(model, module='generated_classes').class_for('Label')
+    assert module.Label is Label and module.Point is Label.__mro__[1]
+    assert pickle.loads(pickle.dumps(Label(1.0, ['a'], 'hi'))) == Label(1.0, ['a'], 'hi')
+
+
+def test_copy_mutable(basic_model):
+    User = ClassCompiler(basic_model).class_for('User')
+    user = User('ann', 'hash', None)
+    assert copy.copy(user) == user and copy.copy(user) is not user
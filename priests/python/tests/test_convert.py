@@ -0,0 +1,151 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from ordain.convert import Converter, register_repr, REPRS
+from ordain.denominations import KnownDenomination
+from ordain.exceptions import ModelException
+from ordain.model import *
+from ordain.parse_dict import parse_typedefs
+import json
+import pytest
+
+
+@pytest.fixture
+def model():
+    model = parse_typedefs({
+        'Stamp': {'type': 'datetime', 'tags': [{'json.repr': 'timestamp'}]},
+        'Address': {
+            'type': 'struct',
+            'fields': {
+                'street': {'type': 'string'},
+                'postcode': {'type': '?string', 'tags': [{'json.name': 'zip'}]},
+            },
+        },
+        'User': {
+            'type': 'struct',
+            'fields': {
+                'name': {'type': 'string', 'tags': [{'json.name': 'userName'}]},
+                'born': {'type': '?date'},
+                'friends': {'type': 'list of User'},
+                'best_friend': {'type': '?User'},
+                'scores': {'type': 'mapping of int to ?decimal'},
+                'secret': {'type': 'int', 'tags': [{'json.ignore': True}]},
+            },
+        },
+        'Event': {
+            'type': 'struct',
+            'fields': {
+                'at': {'type': 'Stamp'},
+                'payload': {'type': 'binary'},
+                'checksum': {'type': 'binary', 'tags': [{'json.repr': 'hex'}]},
+                'address': {'type': 'Address', 'tags': [{'json.repr': 'inline'}]},
+                'extra': {'type': 'mapping of string to list of float', 'tags': [{'json.repr': 'json'}]},
+                'points': {'type': 'list of list of ?time'},
+                'location': {'type': 'struct', 'fields': {'lat': {'type': 'float'}, 'at': {'type': '?datetime'}}},
+            },
+        },
+    })
+    model['Color'] = Typedef('Color', EnumType(ScalarType.string, ['red', 'green']), TagRepository([]))
+    return model
+
+
+def user(**fields):
+    return {'name': 'ann', 'born': None, 'friends': [], 'best_friend': None, 'scores': {}, 'secret': 1, **fields}
+
+
+def test_round_trip(model):
+    converter = Converter(model, KnownDenomination.JsonBase())
+    value = user(
+        born=date(1990, 5, 1),
+        friends=[user(name='bob', best_friend=user(name='cy'))],
+        scores={1: Decimal('0.1'), 2: None},
+    )
+    encoded = converter.encode('User', value)
+    assert encoded == {
+        'userName': 'ann',
+        'born': '1990-05-01',
+        'friends': [{'userName': 'bob', 'born': None, 'friends': [], 'best_friend': {'userName': 'cy', 'born': None, 'friends': [], 'best_friend': None, 'scores': {}}, 'scores': {}}],
+        'best_friend': None,
+        'scores': {1: '0.1', 2: None},
+    }
+    decoded = converter.decode('User', json.loads(json.dumps(encoded)))
+    assert decoded == {key: item for key, item in value.items() if key != 'secret'} | {'friends': [
+        {'name': 'bob', 'born': None, 'friends': [], 'scores': {}, 'best_friend': {'name': 'cy', 'born': None, 'friends': [], 'best_friend': None, 'scores': {}}},
+    ]}
+
+
+def test_missing_nullable_fields_decode_as_none(model):
+    converter = Converter(model, KnownDenomination.JsonBase())
+    assert converter.decode('User', {'userName': 'ann', 'friends': [], 'scores': {}}) == {
+        'name': 'ann', 'born': None, 'friends': [], 'best_friend': None, 'scores': {},
+    }
+
+
+def test_reprs(model):
+    converter = Converter(model, KnownDenomination.JsonBase())
+    value = {
+        'at': datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        'payload': b'\x00\xff',
+        'checksum': b'\xab\xcd',
+        'address': {'street': 'High St', 'postcode': None},
+        'extra': {'a': [1.5]},
+        'points': [[None]],
+        'location': {'lat': 1.0, 'at': None},
+    }
+    encoded = converter.encode('Event', value)
+    assert encoded == {
+        'at': 1577934245.0,
+        'payload': 'AP8=',
+        'checksum': 'abcd',
+        'street': 'High St',
+        'zip': None,
+        'extra': '{"a":[1.5]}',
+        'points': [[None]],
+        'location': {'lat': 1.0, 'at': None},
+    }
+    assert converter.decode('Event', json.loads(json.dumps(encoded))) == value
+
+
+def test_scalars(model):
+    converter = Converter(model, KnownDenomination.JsonBase())
+    event = model['Event'].struct_fields
+    assert converter.encode(event['points'], [[datetime(2020, 1, 1, 12, 30).time(), None]]) == [['12:30:00', None]]
+    assert converter.decode(event['location'], {'lat': 2, 'at': '2020-01-01T00:00:00'}) == {'lat': 2.0, 'at': datetime(2020, 1, 1)}
+    assert converter.decode('Color', 'red') == 'red'
+
+
+def test_other_denominations_ignore_json_reprs(model):
+    converter = Converter(model, KnownDenomination.PythonBase())
+    value = converter.encode('Event', {
+        'at': datetime(2020, 1, 1), 'payload': b'', 'checksum': b'', 'address': {'street': '', 'postcode': None},
+        'extra': {}, 'points': [], 'location': {'lat': 0.0, 'at': None},
+    })
+    assert value['at'] == '2020-01-01T00:00:00'
+    assert value['address'] == {'street': '', 'postcode': None}
+    assert value['extra'] == {}
+
+
+def test_registered_repr(model):
+    register_repr('py.upper', str.upper, str.lower)
+    try:
+        model['Shout'] = parse_typedefs({'Shout': {'type': 'string', 'tags': [{'repr': 'py.upper'}]}})['Shout']
+        converter = Converter(model, KnownDenomination.JsonBase())
+        assert converter.encode('Shout', 'hi') == 'HI'
+        assert converter.decode('Shout', 'HI') == 'hi'
+    finally:
+        del REPRS['py.upper']
+
+
+def test_functions_are_cached(model):
+    converter = Converter(model, KnownDenomination.JsonBase())
+    assert converter.encoder('User') is converter.encoder('User')
+    assert converter.decoder('User') is not converter.encoder('User')
+    assert 'tag' not in converter.source
+
+
+def test_invalid_inline(model):
+    model['Bad'] = parse_typedefs({'Bad': {'type': 'struct', 'fields': {'x': {'type': 'int', 'tags': [{'repr': 'inline'}]}}}})['Bad']
+    converter = Converter(model, KnownDenomination.JsonBase())
+    with pytest.raises(ModelException):
+        converter.encoder('Bad')
+    with pytest.raises(ModelException):
+        converter.encoder('Missing')
@@ -1,5 +1,5 @@
 from ordain.model import *
-from ordain.denominational_view import DenominationalTypedefView
+from ordain.denominational_view import DenominationalTypedefView, ViewCache
 from ordain.denominations import KnownDenomination
 
 def test_get_name_without_tags(basic_model):
@@ -26,4 +26,58 @@ def test_get_impl_inherited(inheritance_model):
     assert view.impl is not None
     assert view.impl.cannon == 'py'
     assert view.impl.name == 'impl'
-    assert view.impl.value == 'dataclass'
\ No newline at end of file
+    assert view.impl.value == 'dataclass'
+
+def test_only_if(basic_model):
+    view = DenominationalTypedefView.from_model('User', basic_model, KnownDenomination.PythonBase())
+    assert view.struct_field_views is not None
+    assert 'password' in view.struct_field_views
+    view = DenominationalTypedefView.from_model('User', basic_model, KnownDenomination.PhpBase())
+    assert view.struct_field_views is not None
+    assert 'password' not in view.struct_field_views
+    assert 'username' in view.struct_field_views
+
+def test_not_if():
+    model = {'Secret': Typedef('Secret', ScalarType.string, TagRepository([Tag(None, 'not-if', 'json')]))}
+    assert DenominationalTypedefView.from_model('Secret', model, KnownDenomination.JsonBase()).is_ignored
+    assert not DenominationalTypedefView.from_model('Secret', model, KnownDenomination.PhpBase()).is_ignored
+
+def test_struct_field_views_are_memoized(basic_model):
+    view = DenominationalTypedefView.from_model('User', basic_model, KnownDenomination.PythonBase())
+    assert view.struct_field_views is view.struct_field_views
+    assert view.struct_field_views['password'].path == 'User.password'
+
+def test_view_cache_identity(inheritance_model):
+    cache = ViewCache(inheritance_model, KnownDenomination.PythonBase())
+    dog = cache.view('Dog')
+    assert cache.view('Dog') is dog
+    assert dog.struct_field_views['breed'] is cache.field_view('Dog', 'breed', inheritance_model['Dog'].struct_fields['breed'])
+
+def test_view_cache_invalidate(inheritance_model):
+    cache = ViewCache(inheritance_model, KnownDenomination.PythonBase())
+    animal = cache.view('Animal')
+    pet = cache.view('Pet')
+    dog = cache.view('Dog')
+    breed = dog.struct_field_views['breed']
+    assert dog.impl is not None
+
+    inheritance_model['Pet'] = Typedef('Pet', StructType({}), TagRepository([Tag('py', 'impl', 'slots')]), parent='Animal')
+    cache.invalidate('Pet')
+    assert cache.view('Animal') is animal
+    assert cache.view('Pet') is not pet
+    assert cache.view('Dog') is not dog
+    assert cache.view('Dog').struct_field_views['breed'] is not breed
+    assert cache.view('Dog').impl == Tag('py', 'impl', 'slots')
+
+    cache.invalidate()
+    assert cache.view('Animal') is not animal
+
+def test_alias_tags_inherited():
+    model = {
+        'Age': Typedef('Age', ScalarType.int, TagRepository([Tag(None, 'check', '< 150'), Tag(None, 'check', '> 14')])),
+        'User': Typedef('User', StructType({
+            'age': Typedef('age', NamedTypeReference('Age'), TagRepository([])),
+        }), TagRepository([])),
+    }
+    view = DenominationalTypedefView.from_model('User', model, KnownDenomination.PythonBase())
+    assert [tag.value for tag in view.struct_field_views['age'].tag_search_all('check')] == ['< 150', '> 14']
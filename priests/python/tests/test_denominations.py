@@ -0,0 +1,42 @@
+import pickle
+from ordain.denominations import Denomination, KnownDenomination, KnownCannon
+
+
+def test_denominations_are_interned():
+    assert KnownDenomination.MySql() is KnownDenomination.MySql()
+    assert Denomination([['mysql'], 'sql']) is KnownDenomination.MySql()
+    assert Denomination(['sql']) is not KnownDenomination.MySql()
+
+
+def test_denominations_are_hashable():
+    cache = {KnownDenomination.PythonBase(): 'python'}
+    assert cache[Denomination([KnownCannon.Python])] == 'python'
+
+
+def test_denominations_are_immutable():
+    denomination = KnownDenomination.Postgres()
+    try:
+        denomination.cannon_hierarchy = ()
+    except AttributeError:
+        pass
+    else:
+        assert False, 'Denomination should be immutable'
+    assert denomination.cannon_hierarchy == (('postgres', 'pg'), ('sql',))
+
+
+def test_recognized_cannons():
+    assert KnownDenomination.Postgres().recognized_cannons == {'postgres', 'pg', 'sql'}
+
+
+def test_rank():
+    denomination = KnownDenomination.Postgres()
+    assert denomination.rank('pg') == 0
+    assert denomination.rank('postgres') == 0
+    assert denomination.rank('sql') == 1
+    assert denomination.rank('mysql') == 2
+    assert denomination.rank(None) == 3
+
+
+def test_unpickle_is_interned():
+    denomination = KnownDenomination.MySql()
+    assert pickle.loads(pickle.dumps(denomination)) is denomination
@@ -0,0 +1,118 @@
+import json
+import pytest
+from ordain.model import *
+from ordain import cache
+from ordain.exceptions import OrdainException, ParseException
+from ordain.imports import discover, load_files
+from ordain.parse_dict import parse_typedefs
+
+COMMON = {
+    'Age': {'type': 'int', 'tags': [{'check': '< 150'}]},
+    'User': {'type': 'struct', 'fields': {'name': {'type': 'string'}}},
+}
+ADMIN = {
+    '$imports': ['common.json'],
+    'Admin': {'type': 'User', 'fields': {'level': {'type': 'int'}}},
+    'Users': {'type': 'list of ?User'},
+}
+AGES = {
+    '$imports': ['../common.json'],
+    'Ages': {'type': 'mapping of string to Age'},
+    'MaybeAge': {'type': '?Age'},
+}
+
+
+def write(path, source):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(source))
+    return path
+
+
+@pytest.fixture
+def project(tmp_path):
+    write(tmp_path / 'common.json', COMMON)
+    write(tmp_path / 'admin.json', ADMIN)
+    write(tmp_path / 'sub' / 'ages.json', AGES)
+    return tmp_path
+
+
+@pytest.fixture
+def counting_loader(monkeypatch):
+    calls = []
+    def loader(source, externals={}):
+        calls.append(json.loads(source))
+        return cache._load_json(source, externals)
+    monkeypatch.setitem(cache.LOADERS, '.json', loader)
+    return calls
+
+
+def test_matches_single_file(project):
+    model = load_files([project / 'admin.json', project / 'sub' / 'ages.json'], use_cache=False, max_workers=1)
+    whole = parse_typedefs({**COMMON, **ADMIN, **AGES})
+    assert model == whole
+    assert list(model) == ['Age', 'User', 'Admin', 'Users', 'Ages', 'MaybeAge']
+
+
+def test_parallel_matches_serial(project):
+    paths = [project / 'admin.json', project / 'sub' / 'ages.json']
+    assert load_files(paths, use_cache=False, max_workers=2) == load_files(paths, use_cache=False, max_workers=1)
+
+
+def test_discover_orders_imports_first(project):
+    files = discover([project / 'sub' / 'ages.json', project / 'admin.json'])
+    assert [file.path.name for file in files.values()] == ['common.json', 'ages.json', 'admin.json']
+    assert [file.layer for file in files.values()] == [0, 1, 1]
+
+
+def test_only_changed_files_are_reparsed(project, counting_loader):
+    paths = [project / 'admin.json', project / 'sub' / 'ages.json']
+    load_files(paths, project / 'cache', max_workers=1)
+    assert len(counting_loader) == 3
+    load_files(paths, project / 'cache', max_workers=1)
+    assert len(counting_loader) == 3
+    write(project / 'admin.json', {**ADMIN, 'Name': {'type': 'string'}})
+    assert 'Name' in load_files(paths, project / 'cache', max_workers=1)
+    assert counting_loader[3:] == [{**ADMIN, 'Name': {'type': 'string'}}]
+
+
+def test_changed_import_reparses_importers(project, counting_loader):
+    paths = [project / 'admin.json', project / 'sub' / 'ages.json']
+    load_files(paths, project / 'cache', max_workers=1)
+    write(project / 'common.json', {**COMMON, 'Age': {'type': 'float'}})
+    model = load_files(paths, project / 'cache', max_workers=1)
+    assert len(counting_loader) == 6
+    assert model['MaybeAge'].type == NullableType(ScalarType.float)
+
+
+def test_duplicate_typedefs(project):
+    write(project / 'other.json', {'$imports': ['common.json'], 'User': {'type': 'string'}, 'Age': {'type': 'int'}})
+    with pytest.raises(ParseException, match="2 errors found"):
+        load_files([project / 'other.json'], use_cache=False, max_workers=1)
+    with pytest.raises(ParseException, match=r"Duplicate typedef Admin: defined in .*admin\.json and .*again\.json"):
+        write(project / 'again.json', {'Admin': {'type': 'int'}})
+        load_files([project / 'admin.json', project / 'again.json'], use_cache=False, max_workers=1)
+
+
+def test_import_cycle(project):
+    write(project / 'a.json', {'$imports': ['b.json']})
+    write(project / 'b.json', {'$imports': ['a.json']})
+    with pytest.raises(ParseException, match=r"Import cycle: .*a\.json -> .*b\.json -> .*a\.json"):
+        load_files([project / 'a.json'], use_cache=False)
+
+
+def test_errors_name_the_file(project):
+    write(project / 'bad.json', {'$imports': ['common.json'], 'Bad': {'type': 'Missing'}})
+    with pytest.raises(ParseException, match=r"bad\.json: Undefined type: Missing"):
+        load_files([project / 'bad.json'], use_cache=False, max_workers=1)
+    write(project / 'bad.json', {'$imports': 'common.json'})
+    with pytest.raises(ParseException, match=r"bad\.json: \$imports must be a list"):
+        load_files([project / 'bad.json'], use_cache=False)
+    write(project / 'bad.json', {'$imports': ['missing.json']})
+    with pytest.raises(OrdainException, match=r"Cannot read .*missing\.json \(imported by .*bad\.json\)"):
+        load_files([project / 'bad.json'], use_cache=False)
+
+
+def test_imports_are_only_visible_to_importers(project):
+    write(project / 'unrelated.json', {'Thing': {'type': 'Age'}})
+    with pytest.raises(ParseException, match="Undefined type: Age"):
+        load_files([project / 'admin.json', project / 'unrelated.json'], use_cache=False, max_workers=1)
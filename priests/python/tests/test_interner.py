@@ -0,0 +1,96 @@
+import pytest
+from ordain.model import *
+from ordain.interner import TypeInterner
+from ordain.parse_dict import parse_typedefs
+
+SOURCE = {
+    'Color': {'type': 'struct', 'fields': {'rgb': {'type': 'array of 3 float'}, 'names': {'type': 'list of string'}}},
+    'A': {'type': 'struct', 'fields': {
+        'tags': {'type': 'list of string'},
+        'scores': {'type': 'mapping of string to ?float'},
+    }},
+    'B': {'type': 'struct', 'fields': {
+        'labels': {'type': 'list of string'},
+        'weights': {'type': 'mapping of string to ?float'},
+        'colors': {'type': 'list of Color'},
+    }},
+}
+
+
+def enum_typedef(name):
+    return Typedef(name, EnumType(ScalarType.string, ['on', 'off']), TagRepository([Tag(None, 'label', 'State')]))
+
+
+def test_equal_subtrees_are_shared():
+    interner = TypeInterner()
+    # Built separately, so nothing is shared to begin with
+    a = interner.intern(StructType({'x': enum_typedef('x'), 'y': Typedef('y', NullableType(CollectionType(enum_typedef('item'))), TagRepository([]))}))
+    b = interner.intern(StructType({'x': enum_typedef('x'), 'y': Typedef('y', NullableType(CollectionType(enum_typedef('item'))), TagRepository([]))}))
+    assert a is b
+    assert interner.intern(enum_typedef('other')).type is a.fields['x'].type
+    assert interner.intern(enum_typedef('other')).tags is a.fields['x'].tags
+
+
+def test_unequal_types_are_not_shared():
+    interner = TypeInterner()
+    assert interner.intern(CollectionType(enum_typedef('x'), 3)) is not interner.intern(CollectionType(enum_typedef('x')))
+    assert interner.intern(EnumType(ScalarType.int, [1])) is not interner.intern(EnumType(ScalarType.int, [True]))
+    assert interner.intern(enum_typedef('x')) is not interner.intern(enum_typedef('y'))
+
+
+def test_intern_model():
+    model = parse_typedefs(SOURCE)
+    interner = TypeInterner()
+    interned = interner.intern_model(model)
+    assert interned == model
+    a, b = interned['A'].struct_fields, interned['B'].struct_fields
+    assert a['tags'].type is b['labels'].type
+    assert a['scores'].type is b['weights'].type
+    assert interner.intern_model(interned)['B'] is interned['B']
+
+
+def test_nested_structs_are_shared():
+    address = {'type': 'struct', 'fields': {'street': {'type': 'string', 'tags': {'label': 'Street'}}}}
+    model = parse_typedefs({'A': {'type': 'struct', 'fields': {'addr': address}}, 'B': {'type': 'struct', 'fields': {'home': address}}})
+    interner = TypeInterner()
+    a, b = model['A'].struct_fields['addr'], model['B'].struct_fields['home']
+    assert interner.intern(a.type) is interner.intern(b.type)
+    assert interner.equal(a.type, b.type)
+    assert interner.structural_hash(a.type) == interner.structural_hash(b.type)
+    assert interner.intern(b).name == 'B.home'
+    other = parse_typedefs({'C': {'type': 'struct', 'fields': {'addr': {'type': 'struct', 'fields': {'street': {'type': 'string'}}}}}})
+    assert not interner.equal(a.type, other['C'].struct_fields['addr'].type)
+
+
+def test_structural_hash_and_equality():
+    interner = TypeInterner()
+    first = NullableType(CollectionType(enum_typedef('x')))
+    second = NullableType(CollectionType(enum_typedef('x')))
+    assert first is not second
+    assert interner.structural_hash(first) == interner.structural_hash(second)
+    assert interner.equal(first, second)
+    assert not interner.equal(first, NullableType(CollectionType(enum_typedef('y'))))
+
+
+def test_unhashable_enum_values():
+    interner = TypeInterner()
+    enum = EnumType(ScalarType.any, [['a'], {'b': [1]}])
+    copy = EnumType(ScalarType.any, [['a'], {'b': [1]}])
+    assert interner.intern(enum) is interner.intern(copy)
+    assert interner.equal(NullableType(enum), NullableType(copy))
+    assert interner.structural_hash(NullableType(enum)) == interner.structural_hash(NullableType(copy))
+    assert not interner.equal(enum, EnumType(ScalarType.any, [('a',), {'b': [1]}]))
+    tagged = Typedef('x', enum, TagRepository([Tag(None, 'example', ['a'])]))
+    assert interner.equal(tagged, Typedef('x', copy, TagRepository([Tag(None, 'example', ['a'])])))
+    with pytest.raises(TypeError):
+        interner.structural_hash(EnumType(ScalarType.any, [{'a'}]))
+    with pytest.raises(TypeError):
+        interner.intern('int')
+
+
+def test_float_zeros_keep_their_sign():
+    interner = TypeInterner()
+    zero = interner.intern(EnumType(ScalarType.float, [0.0]))
+    negative = interner.intern(EnumType(ScalarType.float, [-0.0]))
+    assert zero is not negative
+    assert str(negative.values[0]) == '-0.0'
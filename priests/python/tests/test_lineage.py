@@ -0,0 +1,153 @@
+import pytest
+from ordain.model import *
+from ordain.lineage import Lineage
+from ordain.denominational_view import DenominationalTypedefView, ViewCache
+from ordain.denominations import KnownDenomination
+from ordain.exceptions import ModelException
+
+
+def test_ancestors(inheritance_model):
+    lineage = Lineage(inheritance_model)
+    assert lineage.ancestors('Dog') == ('Pet', 'Animal')
+    assert lineage.ancestors('Pet') == ('Animal',)
+    assert lineage.ancestors('Animal') == ()
+
+
+def test_heritage_order():
+    model = {
+        'Grandparent': Typedef('Grandparent', StructType({}), TagRepository([Tag(None, 'tag', 'grandparent')])),
+        'Parent': Typedef('Parent', StructType({}), TagRepository([Tag(None, 'tag', 'parent')]), parent='Grandparent'),
+        'Child': Typedef('Child', StructType({}), TagRepository([Tag(None, 'tag', 'child')]), parent='Parent'),
+    }
+    lineage = Lineage(model)
+    assert [tag.value for tag in lineage.heritage('Child')] == ['grandparent', 'parent', 'child']
+    assert lineage.heritage('Child').filter('tag').get_top().value == 'child'
+
+
+def count_merges(monkeypatch)->list:
+    merges = []
+    merge = TagRepository.merge
+    def counted(self, *args):
+        merges.append(self)
+        return merge(self, *args)
+    monkeypatch.setattr(TagRepository, 'merge', counted)
+    return merges
+
+
+def test_heritage_is_shared(inheritance_model, monkeypatch):
+    inheritance_model['Cat'] = Typedef('Cat', StructType({}), TagRepository([]), parent='Pet')
+    merges = count_merges(monkeypatch)
+    lineage = Lineage(inheritance_model)
+    pet = lineage.heritage('Pet')
+    assert lineage.heritage('Pet') is pet
+    assert lineage.heritage('Dog').tags[0] is pet.tags[0]
+    assert lineage.heritage('Cat').tags[0] is pet.tags[0]
+    # Animal onto Pet, then Pet onto Dog and onto Cat
+    assert len(merges) == 3
+
+
+def test_views_share_a_cached_lineage(inheritance_model, monkeypatch):
+    inheritance_model['Cat'] = Typedef('Cat', StructType({}), TagRepository([]), parent='Pet')
+    merges = count_merges(monkeypatch)
+    views = ViewCache(inheritance_model, KnownDenomination.PythonBase())
+    for name in ['Dog', 'Cat', 'Dog']:
+        views.view(name).tag_heritage
+    assert len(merges) == 3
+
+
+def test_uncached_views_see_model_changes(inheritance_model):
+    python = KnownDenomination.PythonBase()
+    assert DenominationalTypedefView.from_model('Dog', inheritance_model, python).impl.value == 'dataclass'
+    animal = inheritance_model['Animal']
+    inheritance_model['Animal'] = Typedef('Animal', animal.type, TagRepository([Tag('py', 'impl', 'slots')]))
+    assert DenominationalTypedefView.from_model('Dog', inheritance_model, python).impl.value == 'slots'
+
+
+def test_heritage_of_field():
+    model = {
+        'Age': Typedef('Age', ScalarType.int, TagRepository([Tag(None, 'check', '< 150')])),
+    }
+    field = Typedef('User.age', ScalarType.int, TagRepository([Tag(None, 'check', '> 14')]), parent='Age')
+    assert [tag.value for tag in Lineage(model).heritage_of(field)] == ['< 150', '> 14']
+
+
+def test_cycle():
+    model = {
+        'A': Typedef('A', StructType({}), TagRepository([]), parent='C'),
+        'B': Typedef('B', StructType({}), TagRepository([]), parent='A'),
+        'C': Typedef('C', StructType({}), TagRepository([]), parent='B'),
+        'D': Typedef('D', StructType({}), TagRepository([]), parent='C'),
+    }
+    with pytest.raises(ModelException, match='cycle'):
+        Lineage(model).heritage('D')
+
+
+def test_undefined_parent():
+    model = {
+        'A': Typedef('A', StructType({}), TagRepository([]), parent='Missing'),
+    }
+    with pytest.raises(ModelException, match='Missing'):
+        Lineage(model).ancestors('A')
+
+
+def test_invalidate(inheritance_model):
+    lineage = Lineage(inheritance_model)
+    animal = lineage.heritage('Animal')
+    lineage.heritage('Dog')
+    inheritance_model['Pet'] = Typedef('Pet', StructType({}), TagRepository([Tag('py', 'impl', 'slots')]), parent='Animal')
+    lineage.invalidate('Pet')
+    assert lineage.heritage('Animal') is animal
+    assert lineage.heritage('Dog').filter('impl', ['py']).get_top().value == 'slots'
+
+
+@pytest.fixture
+def alias_model():
+    return {
+        'Age': Typedef('Age', ScalarType.int, TagRepository([
+            Tag(None, 'check', '< 150'),
+            Tag(None, 'check', '> 14'),
+        ])),
+        'AdultAge': Typedef('AdultAge', NamedTypeReference('Age'), TagRepository([
+            Tag(None, 'check', '>= 18'),
+        ])),
+        'User': Typedef('User', StructType({
+            'age': Typedef('age', NamedTypeReference('Age'), TagRepository([])),
+            'voting_age': Typedef('voting_age', NamedTypeReference('AdultAge'), TagRepository([
+                Tag(None, 'label', 'Voting age'),
+            ])),
+        }), TagRepository([])),
+    }
+
+
+def test_alias_heritage(alias_model):
+    lineage = Lineage(alias_model)
+    fields = alias_model['User'].struct_fields
+    assert [tag.value for tag in lineage.heritage_of(fields['age'])] == ['< 150', '> 14']
+    assert [tag.value for tag in lineage.heritage_of(fields['voting_age'])] == ['< 150', '> 14', '>= 18', 'Voting age']
+    assert lineage.ancestors('AdultAge') == ('Age',)
+
+
+def test_alias_heritage_is_shared(alias_model):
+    lineage = Lineage(alias_model)
+    fields = alias_model['User'].struct_fields
+    age = lineage.heritage('Age')
+    assert lineage.heritage_of(fields['age']).tags[0] is age.tags[0]
+    assert lineage.heritage('AdultAge').tags[0] is age.tags[0]
+
+
+def test_resolved_type(alias_model):
+    lineage = Lineage(alias_model)
+    assert lineage.resolved_type('AdultAge') is ScalarType.int
+    assert lineage.resolved_type_of(alias_model['User'].struct_fields['voting_age']) is ScalarType.int
+    assert isinstance(lineage.resolved_type('User'), StructType)
+
+
+def test_alias_cycle():
+    model = {
+        'A': Typedef('A', NamedTypeReference('B'), TagRepository([])),
+        'B': Typedef('B', NamedTypeReference('A'), TagRepository([])),
+    }
+    with pytest.raises(ModelException, match='cycle'):
+        Lineage(model).resolved_type('A')
+    with pytest.raises(ModelException, match='cycle'):
+        Lineage(model).heritage('A')
@@ -0,0 +1,103 @@
+import pytest
+from ordain.model import *
+from ordain.denominational_view import DenominationalTypedefView, ViewCache
+from ordain.denominations import KnownDenomination
+from ordain.exceptions import OrdainException
+from ordain.mapped import MappedModel, MappedTypedef, compile_model, write_compiled
+from ordain.parse_dict import parse_typedefs
+from ordain.resolved import resolve
+
+SOURCE = {
+    'Age': {'type': 'int', 'tags': [{'check': '< 150'}, {'py.check': 2**70}, {'flag': True}, {'ratio': 0.5}]},
+    'Color': {'type': 'struct', 'fields': {'channels': {'type': 'array of 3 float'}}},
+    'User': {
+        'type': 'struct',
+        'docs': 'A user',
+        'tags': [{'sql.name': 'users'}, {'py.impl': 'dataclass'}],
+        'fields': {
+            'name': {'type': 'string', 'tags': [{'label': 'Name'}]},
+            'age': {'type': '?Age'},
+            'friends': {'type': 'list of User'},
+            'scores': {'type': 'mapping of string to ?int'},
+            'colors': {'type': 'list of string'},
+        },
+    },
+    'Admin': {'type': 'User', 'fields': {'level': {'type': 'int'}}},
+    'Nicknames': {'type': 'list of string'},
+}
+
+
+@pytest.fixture
+def model():
+    model = parse_typedefs(SOURCE)
+    model['Status'] = Typedef('Status', EnumType(ScalarType.string, ['on', 'off']), TagRepository([]))
+    model['Flags'] = Typedef('Flags', EnumType(ScalarType.binary, [b'\x00', b'\x01']), TagRepository([]))
+    return model
+
+
+def test_round_trip(model):
+    mapped = MappedModel(compile_model(model))
+    assert len(mapped) == len(model)
+    assert list(mapped) == list(model)
+    for name in model:
+        assert mapped[name] == model[name]
+    assert mapped['User'].struct_fields['friends'].type == CollectionType(Typedef('User', NamedTypeReference('User'), TagRepository([]), parent='User'))
+    assert mapped['Age'].tags[1].value == 2**70
+    assert 'Nope' not in mapped
+    with pytest.raises(KeyError):
+        mapped['Nope']
+
+
+def test_lookups_return_the_same_view(model):
+    mapped = MappedModel(compile_model(model))
+    assert mapped['User'] is mapped['User']
+    assert isinstance(mapped['User'], MappedTypedef)
+    fields = mapped['User'].struct_fields
+    assert fields['friends'] is fields['friends']
+    assert [fields[key] for key in reversed(list(fields))] == list(reversed(list(model['User'].struct_fields.values())))
+    assert 'nope' not in fields
+    with pytest.raises(KeyError):
+        fields['nope']
+
+
+def test_shared_typedefs_are_written_once(model):
+    mapped = MappedModel(compile_model(model))
+    assert mapped['Nicknames'].type.of._offset == mapped['User'].struct_fields['colors'].type.of._offset
+
+
+def test_denominational_views_match(model):
+    mapped = MappedModel(compile_model(model))
+    for denomination in [KnownDenomination.PythonBase(), KnownDenomination.SqlBase()]:
+        cache = ViewCache(mapped, denomination)
+        for name in model:
+            expected = DenominationalTypedefView.from_model(name, model, denomination)
+            view = cache.view(name)
+            assert view.name == expected.name
+            assert view.impl == expected.impl
+            assert list(view.tag_heritage) == list(expected.tag_heritage)
+            assert list(view.struct_field_views or {}) == list(expected.struct_field_views or {})
+        assert resolve(mapped, denomination) == resolve(model, denomination)
+
+
+def test_mapped_file(model, tmp_path):
+    path = tmp_path / 'schema.ordm'
+    write_compiled(model, path)
+    with MappedModel.open(path) as mapped:
+        assert mapped['Admin'].parent == 'User'
+        assert mapped['User'].docs == 'A user'
+        assert mapped['Admin'] == model['Admin']
+
+
+def test_invalid_buffer():
+    with pytest.raises(OrdainException, match='Not a compiled'):
+        MappedModel(b'ORDAINC\0' + bytes(16))
+
+
+def test_float_zeros_keep_their_sign():
+    model = {
+        'A': Typedef('A', ScalarType.float, TagRepository([Tag(None, 'default', 0.0)])),
+        'B': Typedef('B', ScalarType.float, TagRepository([Tag(None, 'default', -0.0)])),
+    }
+    mapped = MappedModel(compile_model(model))
+    assert str(mapped['A'].tags[0].value) == '0.0'
+    assert str(mapped['B'].tags[0].value) == '-0.0'
@@ -1,5 +1,8 @@
+import pytest
 from ordain.model import *
 from ordain.parse_dict import parse_typedefs
+from ordain.lineage import Lineage
+from ordain.exceptions import ParseException
 
 
 def test_simple_alias():
@@ -149,4 +152,201 @@ def test_multi_inheritance():
     assert isinstance(model['Child'].type, StructType)
     assert model['Grandparent'].parent is None
     assert model['Parent'].parent == 'Grandparent'
-    assert model['Child'].parent == 'Parent'
\ No newline at end of file
+    assert model['Child'].parent == 'Parent'
+
+def test_alias_tags_inherited_by_fields():
+    model = parse_typedefs({
+        'Age': {'type': 'int', 'tags': [{'check': '< 150'}, {'check': '> 14'}]},
+        'User': {'type': 'struct', 'fields': {'age': {'type': 'Age', 'tags': ['required']}}},
+    })
+    heritage = Lineage(model).heritage_of(model['User'].struct_fields['age'])
+    assert [tag.name for tag in heritage] == ['check', 'check', 'required']
+
+
+def test_inheritance_out_of_order():
+    model = parse_typedefs({
+        'Child': {'type': 'Parent', 'fields': {'child_field': {'type': 'string'}}},
+        'Parent': {'type': 'Grandparent', 'fields': {'parent_field': {'type': 'string'}}},
+        'Grandparent': {'type': 'struct', 'fields': {'grandparent_field': {'type': 'string'}}},
+    })
+    assert list(model) == ['Child', 'Parent', 'Grandparent']
+    assert isinstance(model['Child'].type, StructType)
+    assert model['Child'].parent == 'Parent'
+
+
+def test_long_inheritance_chain():
+    typedef_dict = {'Type0': {'type': 'int'}}
+    for i in range(1, 5000):
+        typedef_dict[f'Type{i}'] = {'type': f'Type{i-1}'}
+    model = parse_typedefs(dict(reversed(typedef_dict.items())))
+    assert model['Type4999'].type is ScalarType.int
+    assert model['Type4999'].parent == 'Type4998'
+
+
+def test_errors_reported_together():
+    with pytest.raises(ParseException) as e:
+        parse_typedefs({
+            'A': {'type': 'B'},
+            'B': {'type': 'A'},
+            'C': {'type': 'Missing'},
+            'D': {'type': 'struct', 'fields': {'x': {'type': 'AlsoMissing'}, 'y': {'type': 'int'}}},
+            'E': {'type': 'int'},
+        })
+    message = str(e.value)
+    assert 'cycle' in message
+    assert 'Missing' in message
+    assert 'AlsoMissing' in message
+
+
+def test_inline_list():
+    model = parse_typedefs({'Names': {'type': 'list of string'}})
+    assert isinstance(model['Names'].type, CollectionType)
+    assert model['Names'].type.of.type is ScalarType.string
+    assert model['Names'].type.count is None
+
+
+def test_inline_array():
+    model = parse_typedefs({'Point': {'type': 'array of 3 float'}})
+    assert isinstance(model['Point'].type, CollectionType)
+    assert model['Point'].type.of.type is ScalarType.float
+    assert model['Point'].type.count == 3
+
+
+def test_inline_mapping():
+    model = parse_typedefs({
+        'Age': {'type': 'int'},
+        'Ages': {'type': 'mapping of string to list of Age'},
+    })
+    ages = model['Ages'].type
+    assert isinstance(ages, MappingType)
+    assert ages.keys.type is ScalarType.string
+    assert isinstance(ages.value.type, CollectionType)
+    assert ages.value.type.of.type == NamedTypeReference('Age')
+    assert ages.value.type.of.parent == 'Age'
+
+
+def test_inline_nullable():
+    model = parse_typedefs({
+        'Age': {'type': 'int'},
+        'MaybeAge': {'type': '?Age'},
+        'MaybeInt': {'type': '?int'},
+        'MaybeAges': {'type': 'list of ?Age'},
+        'User': {'type': 'struct', 'fields': {'age': {'type': '? Age'}}},
+    })
+    assert model['MaybeAge'].type == NullableType(ScalarType.int)
+    assert model['MaybeAge'].parent == 'Age'
+    assert model['MaybeInt'].type == NullableType(ScalarType.int)
+    assert model['MaybeAges'].type.of.type == NullableType(NamedTypeReference('Age'))
+    assert model['User'].struct_fields['age'].type == NullableType(ScalarType.int)
+    assert model['User'].struct_fields['age'].parent == 'Age'
+
+
+def test_nullable_struct():
+    model = parse_typedefs({
+        'Parent': {'type': 'struct', 'fields': {'parent_field': {'type': 'string'}}},
+        'Child': {'type': '?Parent', 'fields': {'child_field': {'type': 'string'}}},
+        'Grandchild': {'type': 'Child', 'fields': {'grandchild_field': {'type': 'string'}}},
+    })
+    assert isinstance(model['Child'].type, NullableType)
+    assert list(model['Child'].type.of.fields) == ['child_field']
+    assert isinstance(model['Grandchild'].type, NullableType)
+    assert list(model['Grandchild'].type.of.fields) == ['grandchild_field']
+
+
+def test_inline_types_are_shared():
+    model = parse_typedefs({
+        'A': {'type': 'list of string'},
+        'B': {'type': 'struct', 'fields': {
+            'x': {'type': 'list of string'},
+            'y': {'type': 'mapping of string to list of string'},
+        }},
+    })
+    assert model['A'].type is model['B'].struct_fields['x'].type
+    assert model['B'].struct_fields['y'].type.value.type is model['A'].type
+
+
+def test_inline_type_errors():
+    with pytest.raises(ParseException) as e:
+        parse_typedefs({
+            'A': {'type': 'list of Missing'},
+            'B': {'type': 'mapping of Missing to int'},
+            'C': {'type': 'array of string'},
+            'D': {'type': 'list of int int'},
+        })
+    message = str(e.value)
+    assert 'Missing' in message
+    assert 'primitive' in message
+    assert 'length' in message
+    assert 'Unexpected' in message
+
+
+LAZY_SOURCE = {
+    'Age': {'type': 'int', 'tags': [{'check': '< 150'}]},
+    'User': {'type': 'struct', 'docs': 'A user', 'tags': {'sql.name': 'users'}, 'fields': {
+        'name': {'type': 'string', 'tags': ['required']},
+        'age': {'type': 'Age'},
+        'address': {'type': 'struct', 'fields': {
+            'street': {'type': 'string'},
+            'lines': {'type': 'list of string'},
+        }},
+    }},
+    'Admin': {'type': 'User', 'fields': {'level': {'type': 'int'}}},
+}
+
+
+def test_lazy_is_equivalent():
+    eager = parse_typedefs(LAZY_SOURCE)
+    lazy = parse_typedefs(LAZY_SOURCE, lazy=True)
+    assert lazy == eager
+    assert lazy['User'].struct_fields['address'].struct_fields['lines'] == eager['User'].struct_fields['address'].struct_fields['lines']
+
+
+def test_lazy_fields_are_cached():
+    model = parse_typedefs(LAZY_SOURCE, lazy=True)
+    fields = model['User'].struct_fields
+    assert fields['name'] is fields['name']
+    assert list(fields) == ['name', 'age', 'address']
+    assert 'age' in fields
+    assert len(fields) == 3
+
+
+def test_lazy_defers_field_errors():
+    source = {'User': {'type': 'struct', 'fields': {'good': {'type': 'int'}, 'bad': {'type': 'Missing'}}}}
+    model = parse_typedefs(source, lazy=True)
+    assert model['User'].struct_fields['good'].type is ScalarType.int
+    with pytest.raises(ParseException, match='Missing'):
+        model['User'].struct_fields['bad']
+
+
+def test_lazy_strict_validates_everything():
+    source = {'User': {'type': 'struct', 'fields': {
+        'bad': {'type': 'Missing'},
+        'nested': {'type': 'struct', 'fields': {'bad_tags': {'type': 'int', 'tags': [1]}}},
+    }}}
+    with pytest.raises(ParseException) as e:
+        parse_typedefs(source, lazy=True, strict=True)
+    assert 'Missing' in str(e.value)
+    assert 'User.nested.bad_tags' in str(e.value)
+
+
+def test_tags_are_shared():
+    model = parse_typedefs({
+        'A': {'type': 'string', 'tags': [{'sql.type': 'VARCHAR(255)'}, 'required']},
+        'B': {'type': 'struct', 'fields': {
+            'x': {'type': 'string', 'tags': [{'sql.type': 'VARCHAR(255)'}, 'required']},
+            'y': {'type': 'int', 'tags': ['required']},
+        }},
+    })
+    fields = model['B'].struct_fields
+    assert fields['x'].tags is model['A'].tags
+    assert fields['y'].tags[0] is model['A'].tags[1]
+    assert model['B'].tags is TagRepository.interned([])
+
+
+def test_interned_float_tags_keep_their_sign():
+    model = parse_typedefs({
+        'A': {'type': 'float', 'tags': [{'default': 0.0}]},
+        'B': {'type': 'float', 'tags': [{'default': -0.0}]},
+    })
+    assert str(model['A'].tags[0].value) == '0.0'
+    assert str(model['B'].tags[0].value) == '-0.0'
@@ -0,0 +1,56 @@
+from ordain.model import *
+from ordain.denominational_view import DenominationalTypedefView
+from ordain.denominations import KnownDenomination
+from ordain.resolved import resolve
+
+
+def test_resolve_names(basic_model):
+    assert resolve(basic_model, KnownDenomination.PythonBase())['User'].name == 'User'
+    assert resolve(basic_model, KnownDenomination.SqlBase())['User'].name == 'users'
+
+
+def test_resolve_impl(inheritance_model):
+    schema = resolve(inheritance_model, KnownDenomination.PythonBase())
+    for name in ['Animal', 'Pet', 'Dog']:
+        assert schema[name].impl == Tag('py', 'impl', 'dataclass')
+    assert resolve(inheritance_model, KnownDenomination.JsonBase())['Dog'].impl is None
+
+
+def test_resolve_visible_fields(basic_model):
+    python = resolve(basic_model, KnownDenomination.PythonBase())['User']
+    assert python.fields is not None
+    assert list(python.fields) == ['username', 'password', 'created']
+    php = resolve(basic_model, KnownDenomination.PhpBase())['User']
+    assert php.fields is not None
+    assert list(php.fields) == ['username', 'created']
+    assert php.fields['created'].fields is None
+
+
+def test_resolve_stacked_tags():
+    model = {
+        'Age': Typedef('Age', ScalarType.int, TagRepository([
+            Tag(None, 'check', '> 14'),
+            Tag('py', 'check', '< 150'),
+            Tag('php', 'check', '< 140'),
+        ])),
+    }
+    schema = resolve(model, KnownDenomination.PythonBase())
+    assert [tag.value for tag in schema['Age'].tag_all('check')] == ['> 14', '< 150']
+    assert schema['Age'].tag_top('check') == Tag('py', 'check', '< 150')
+    assert schema['Age'].tag_all('label') == ()
+
+
+def test_resolve_matches_views(basic_model, inheritance_model):
+    for model in [basic_model, inheritance_model]:
+        for denomination in [KnownDenomination.PythonBase(), KnownDenomination.PhpBase(), KnownDenomination.Postgres()]:
+            schema = resolve(model, denomination)
+            for name in model:
+                view = DenominationalTypedefView.from_model(name, model, denomination)
+                resolved = schema[name]
+                assert resolved.name == view.name
+                assert resolved.impl == view.impl
+                assert resolved.is_ignored == view.is_ignored
+                views = view.struct_field_views
+                assert (resolved.fields is None) == (views is None)
+                if views is not None:
+                    assert list(resolved.fields) == list(views)
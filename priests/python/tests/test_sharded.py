@@ -0,0 +1,89 @@
+import json
+import pytest
+from ordain.model import *
+from ordain.denominations import Denomination
+from ordain.denominational_view import DenominationalTypedefView
+from ordain.exceptions import OrdainException, ParseException
+from ordain.imports import load_files
+from ordain.sharded import INDEX_FILE, ShardedModel, build_index, write_index
+
+SHARDS = {
+    'animals.json': {
+        'Animal': {'type': 'struct', 'tags': [{'py.impl': 'dataclass'}, {'label': 'Animal'}], 'fields': {'legs': {'type': 'int'}}},
+    },
+    'pets/pet.json': {
+        '$imports': ['../animals.json'],
+        'Pet': {'type': 'Animal', 'tags': [{'label': 'Pet'}], 'fields': {'name': {'type': 'string'}}},
+    },
+    'pets/dog.json': {
+        '$imports': ['pet.json'],
+        'Dog': {'type': 'Pet', 'fields': {'breed': {'type': 'string'}}},
+    },
+    'plants.json': {
+        'Plant': {'type': 'struct', 'fields': {'height': {'type': 'float'}}},
+        'Tree': {'type': 'Plant'},
+    },
+}
+
+
+@pytest.fixture
+def shard_dir(tmp_path):
+    directory = tmp_path / 'schema'
+    for name, source in SHARDS.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(source))
+    return directory
+
+
+def test_build_index(shard_dir):
+    assert build_index(shard_dir, use_cache=False) == {
+        'Animal': 'animals.json',
+        'Dog': 'pets/dog.json',
+        'Pet': 'pets/pet.json',
+        'Plant': 'plants.json',
+        'Tree': 'plants.json',
+    }
+
+
+def test_loads_shards_on_lookup(shard_dir):
+    write_index(shard_dir, use_cache=False)
+    model = ShardedModel.from_directory(shard_dir, use_cache=False)
+    assert len(model) == 5
+    assert 'Tree' in model and 'Oak' not in model
+    assert model.loaded_shards == set()
+    assert model['Tree'].parent == 'Plant'
+    assert model.loaded_shards == {shard_dir / 'plants.json'}
+    with pytest.raises(KeyError):
+        model['Oak']
+
+
+def test_matches_whole_model(shard_dir):
+    model = ShardedModel.from_directory(shard_dir, use_cache=False)
+    assert dict(model) == load_files(shard_dir.rglob('*.json'), use_cache=False)
+
+
+def test_tag_heritage_loads_ancestors(shard_dir):
+    write_index(shard_dir, use_cache=False)
+    model = ShardedModel.from_directory(shard_dir, use_cache=False)
+    view = DenominationalTypedefView.from_model('Dog', model, Denomination(['py']))
+    assert view.tag_search_top('label').value == 'Pet'
+    assert view.impl.value == 'dataclass'
+    assert model.loaded_shards == {shard_dir / 'animals.json', shard_dir / 'pets' / 'pet.json', shard_dir / 'pets' / 'dog.json'}
+    assert shard_dir / 'plants.json' not in model.loaded_shards
+
+
+def test_out_of_date_index(shard_dir):
+    (shard_dir / INDEX_FILE).write_text(json.dumps({'Oak': 'plants.json'}))
+    model = ShardedModel.from_directory(shard_dir, use_cache=False)
+    with pytest.raises(OrdainException, match='out of date'):
+        model['Oak']
+    (shard_dir / INDEX_FILE).write_text('[')
+    with pytest.raises(OrdainException, match='Invalid shard index'):
+        ShardedModel.from_directory(shard_dir)
+
+
+def test_duplicate_typedefs_across_shards(shard_dir):
+    (shard_dir / 'more_plants.json').write_text(json.dumps({'Tree': {'type': 'string'}}))
+    with pytest.raises(ParseException, match='Duplicate typedef Tree'):
+        build_index(shard_dir, use_cache=False)
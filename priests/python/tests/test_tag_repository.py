@@ -1,4 +1,5 @@
 from ordain.model import *
+from ordain.denominations import KnownDenomination
 
 
 def test_sort_tags_last_shall_be_first():
@@ -92,4 +93,122 @@ def test_sort_tags_get_one_with_hierarchy():
     ])
     
     accepted = tags.get_top(['mine', 'yours'], ['ours'])
-    assert tags[6] is accepted, "Last tag from highest rank has the highest priority"
\ No newline at end of file
+    assert tags[6] is accepted, "Last tag from highest rank has the highest priority"
+
+def test_filter_keeps_source_order():
+    tags = TagRepository([
+        Tag(None, 'tag', 'first universal'),
+        Tag('mine', 'tag', 'first mine'),
+        Tag('mine', 'other', 'other mine'),
+        Tag('ours', 'tag', 'first ours'),
+        Tag(None, 'tag', 'second universal'),
+        Tag('theirs', 'tag', 'unknown'),
+        Tag('mine', 'tag', 'second mine'),
+    ])
+
+    filtered = tags.filter('tag', ['mine', 'ours'])
+    assert [tag.value for tag in filtered] == ['first universal', 'first mine', 'first ours', 'second universal', 'second mine']
+    filtered = tags.filter('tag', ['mine'], include_universal=False)
+    assert [tag.value for tag in filtered] == ['first mine', 'second mine']
+    assert len(tags.filter('missing', ['mine'])) == 0
+
+
+def test_filter_top_matches_filter_get_top():
+    tags = TagRepository([
+        Tag(None, 'tag', 'first universal'),
+        Tag('mine', 'tag', 'first mine'),
+        Tag(None, 'tag', 'second universal'),
+        Tag('ours', 'tag', 'first ours'),
+        Tag('mine', 'tag', 'second mine'),
+        Tag('yours', 'tag', 'first yours'),
+        Tag('yours', 'tag', 'second yours'),
+        Tag('ours', 'tag', 'second ours'),
+        Tag('theirs', 'tag', 'unknown'),
+    ])
+    
+    for cannons in [[], ['ours'], ['mine', 'ours'], ['mine', 'yours', 'ours', 'theirs']]:
+        for hierarchy in [(), (['mine', 'yours'], ['ours']), ('ours', 'mine')]:
+            for include_universal in [True, False]:
+                expected = tags.filter('tag', cannons, include_universal).get_top(*hierarchy)
+                assert tags.filter_top('tag', cannons, include_universal, hierarchy) is expected
+
+
+def test_index_does_not_affect_equality():
+    tags = TagRepository([Tag(None, 'tag', 'value')])
+    other = TagRepository([Tag(None, 'tag', 'value')])
+    tags.filter('tag')
+    assert tags == other
+
+
+def test_sort_tags_with_denomination():
+    tags = TagRepository([
+        Tag(None, 'tag', 'universal'),
+        Tag('sql', 'tag', 'sql'),
+        Tag('pg', 'tag', 'pg'),
+        Tag('mysql', 'tag', 'mysql'),
+    ])
+
+    denomination = KnownDenomination.Postgres()
+    assert tags.sort(denomination).tags == tags.sort(*denomination.cannon_hierarchy).tags
+    assert tags.get_top(denomination) is tags[2]
+    assert tags.filter_top('tag', denomination.recognized_cannons, cannon_hierarchy=denomination) is tags[2]
+    assert tags.filter_top('tag', ['sql', 'mysql'], cannon_hierarchy=['mysql', 'sql']) is tags[3]
+
+
+def test_merge_shares_tags():
+    parent = TagRepository([Tag(None, 'tag', 'first'), Tag(None, 'tag', 'second')])
+    child = TagRepository([Tag(None, 'tag', 'third')])
+    merged = parent.merge(child)
+    assert len(merged) == 3
+    assert merged[0] is parent[0]
+    assert merged[-1] is child[0]
+    assert merged[1:] == [parent[1], child[0]]
+    assert merged == TagRepository([*parent, *child])
+    assert merged.filter('tag').get_top() is child[0]
+
+
+def test_interned_tags_are_shared():
+    tag = Tag.interned('sql', 'type', 'VARCHAR(255)')
+    assert Tag.interned('sql', ''.join(['ty', 'pe']), 'VARCHAR(255)') is tag
+    assert Tag.from_key_value('sql.type', 'VARCHAR(255)') is tag
+    assert tag == Tag('sql', 'type', 'VARCHAR(255)')
+    # Equal values of different types are different tags
+    assert Tag.interned(None, 'flag', 1).value is not True
+    assert Tag.interned(None, 'flag', True).value is True
+    # Unhashable values can't be shared, but still work
+    assert Tag.interned(None, 'list', ['a']) == Tag(None, 'list', ['a'])
+
+
+def test_interned_repositories_are_shared():
+    repo = TagRepository.interned([Tag.interned(None, 'required', True)])
+    assert TagRepository.interned([Tag.from_key_value('required', True)]) is repo
+    assert TagRepository.interned([Tag.interned(None, 'required', 1)]) is not repo
+    assert TagRepository.interned([]) is TagRepository.interned(())
+    assert repo == TagRepository([Tag(None, 'required', True)])
+
+
+def test_unpickled_tags_are_interned():
+    import pickle
+    repo = TagRepository.interned([Tag.interned('py', 'impl', 'dataclass')])
+    copy = pickle.loads(pickle.dumps(repo))
+    assert copy is repo
+    assert pickle.loads(pickle.dumps(Tag('py', 'impl', 'dataclass'))) is repo[0]
+
+
+def test_interned_zeros_keep_their_sign():
+    zero, negative = Tag.interned(None, 'default', 0.0), Tag.interned(None, 'default', -0.0)
+    assert zero is not negative
+    assert str(negative.value) == '-0.0'
+    assert str(TagRepository.interned([negative])[0].value) == '-0.0'
+
+
+def test_one_off_hierarchies_are_not_interned():
+    from ordain.denominations import Denomination
+    tags = TagRepository([Tag('a', 'tag', 1), Tag('b', 'tag', 2), Tag(None, 'tag', 3)])
+    before = len(Denomination._interned)
+    for i in range(100):
+        assert tags.get_top([f'x{i}'], 'b', 'a') is tags[1]
+        assert tags.sort([f'y{i}'], 'a')[0] is tags[0]
+    assert len(Denomination._interned) == before
+    # A cannon listed twice takes its first (highest priority) rank
+    assert tags.get_top('b', 'a', 'b') is tags[1]
@@ -0,0 +1,158 @@
+from datetime import date
+from decimal import Decimal
+from ordain.denominations import KnownDenomination
+from ordain.exceptions import ModelException, ValidationException
+from ordain.model import *
+from ordain.parse_dict import parse_typedefs
+from ordain.validation import ValidatorCompiler
+import pickle
+import pytest
+
+
+@pytest.fixture
+def model():
+    model = parse_typedefs({
+        'Age': {'type': 'int', 'tags': [{'check': '> 14'}, {'py.check': '< 150'}]},
+        'User': {
+            'type': 'struct',
+            'fields': {
+                'name': {'type': 'string', 'tags': [{'json.name': 'userName'}]},
+                'age': {'type': '?Age'},
+                'email': {'type': '?string', 'tags': ['required']},
+                'friends': {'type': 'list of User'},
+                'best_friend': {'type': '?User'},
+                'scores': {'type': 'mapping of string to list of float'},
+                'secret': {'type': 'int', 'tags': [{'json.ignore': True}]},
+            },
+        },
+        'Admin': {'type': 'User', 'fields': {'level': {'type': 'int'}}},
+        'Event': {
+            'type': 'struct',
+            'fields': {
+                'on': {'type': 'date'},
+                'amount': {'type': 'decimal'},
+                'payload': {'type': '?binary'},
+                'position': {'type': 'array of 2 float'},
+            },
+        },
+    })
+    model['Color'] = Typedef('Color', EnumType(ScalarType.string, ['red', 'green']), TagRepository([]))
+    return model
+
+
+def user(**fields):
+    return {'userName': 'ann', 'age': 30, 'email': 'ann@example.com', 'friends': [], 'scores': {}, **fields}
+
+
+def error(validator, value)->ValidationException:
+    with pytest.raises(ValidationException) as info:
+        validator(value)
+    return info.value
+
+
+def test_valid(model):
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('User')
+    validator(user())
+    validator(user(age=None, friends=[user(), user(best_friend=user())], scores={'a': [1, 2.5]}))
+
+
+def test_errors_have_paths(model):
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('User')
+    e = error(validator, user(userName=5))
+    assert (e.path, e.message) == (('userName',), 'expected string, got int')
+    e = error(validator, user(friends=[user(), user(scores={'x': [1.0, 'two']})]))
+    assert e.path == ('friends', 1, 'scores', 'x', 1)
+    assert str(e) == "friends[1].scores.x[1]: expected float, got str"
+    assert error(validator, user(best_friend=user(friends=None))).path == ('best_friend', 'friends')
+    assert error(validator, []).message == 'expected object, got list'
+
+
+def test_null_and_required(model):
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('User')
+    assert error(validator, user(userName=None)).message == 'must not be null'
+    missing = user()
+    del missing['userName']
+    assert error(validator, missing).path == ('userName',)
+    # Nullable, but required
+    assert error(validator, user(email=None)).message == 'is required'
+    assert error(validator, user(friends=[None])).path == ('friends', 0)
+
+
+def test_checks_follow_denomination(model):
+    json = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('User')
+    python = ValidatorCompiler(model, KnownDenomination.PythonBase()).validator('User')
+    assert error(json, user(age=14)).message == "fails check '> 14'"
+    json(user(age=200))
+    assert error(python, {**user(age=200), 'name': 'ann', 'secret': 1}).message == "fails check '< 150'"
+
+
+def test_denominational_names_and_ignored_fields(model):
+    python = ValidatorCompiler(model, KnownDenomination.PythonBase()).validator('User')
+    assert error(python, user()).path == ('name',)
+    assert error(python, {**user(), 'name': 'ann'}).path == ('secret',)
+    # Ignored for JSON, and extra keys are allowed
+    ValidatorCompiler(model, KnownDenomination.JsonBase()).validate('User', user(secret='x', other=1))
+
+
+def test_inherited_fields(model):
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('Admin')
+    validator(user(level=3))
+    assert error(validator, user()).path == ('level',)
+    assert error(validator, user(level=3, age=1)).path == ('age',)
+
+
+def test_scalars(model):
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('Event')
+    event = {'on': '2024-02-29', 'amount': '12.50', 'payload': 'aGVsbG8=', 'position': [1, 2.5]}
+    validator(event)
+    validator({**event, 'on': date(2024, 2, 29), 'amount': Decimal('1'), 'payload': b'\0'})
+    assert error(validator, {**event, 'on': '2024-02-30'}).path == ('on',)
+    assert error(validator, {**event, 'amount': 'NaN'}).path == ('amount',)
+    assert error(validator, {**event, 'amount': True}).path == ('amount',)
+    assert error(validator, {**event, 'payload': 'not base64!'}).path == ('payload',)
+    assert error(validator, {**event, 'position': [1]}).message == 'must have 2 items'
+
+
+def test_bool_is_not_int(model):
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('Admin')
+    assert error(validator, user(level=True)).message == 'expected int, got bool'
+
+
+def test_enum(model):
+    validator = ValidatorCompiler(model, KnownDenomination.JsonBase()).validator('Color')
+    validator('red')
+    assert error(validator, 'blue').message == "must be one of 'red', 'green'"
+    assert error(validator, 1).message == 'expected string, got int'
+
+
+def test_anonymous_typedefs(model):
+    compiler = ValidatorCompiler(model, KnownDenomination.JsonBase())
+    age = model['User'].struct_fields['age']
+    compiler.validate(age, None)
+    assert error(compiler.validator(age), 3).message == "fails check '> 14'"
+    assert compiler.validator(age) is compiler.validator(age)
+
+
+def test_validators_are_cached(model):
+    compiler = ValidatorCompiler(model, KnownDenomination.JsonBase())
+    assert compiler.validator('User') is compiler.validator(model['User'])
+    # User is compiled once, and reused for Admin's friends
+    compiler.validator('Admin')
+    assert compiler.source.count('def _validate_') == 2
+
+
+def test_compile_errors(model):
+    compiler = ValidatorCompiler(model, KnownDenomination.JsonBase())
+    with pytest.raises(ModelException):
+        compiler.validator('Nope')
+    model['Bad'] = Typedef('Bad', ScalarType.int, TagRepository([Tag(None, 'check', 'is odd')]))
+    model['UsesBad'] = Typedef('UsesBad', CollectionType(Typedef('Bad', NamedTypeReference('Bad'), TagRepository([]), parent='Bad')), TagRepository([]))
+    for _ in range(2):
+        with pytest.raises(ModelException):
+            compiler.validator('UsesBad')
+    compiler.validate('User', user())
+
+
+def test_exception_pickles():
+    e = pickle.loads(pickle.dumps(ValidationException('expected int, got str', ('a', 0))))
+    assert (e.message, e.path, str(e)) == ('expected int, got str', ('a', 0), 'a[0]: expected int, got str')
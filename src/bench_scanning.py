@@ -0,0 +1,54 @@
+"""
+Benchmarks for pathological tag bodies, comments, and docblocks.
+
+Each case is parsed at doubling sizes; the time per unit of input should stay roughly flat as
+the input grows. Run with `python bench_scanning.py [--oracle]`.
+"""
+import argparse
+import time
+from grammar import DOCUMENT
+from parser import parse_document
+
+CASES = {
+    'deep nesting': lambda n: f"#php.validate({'(' * n}{')' * n})\ntype A: int\n",
+    'long tag body': lambda n: "#php.validate(\n" + "    if ($v == ')') return '(';\n" * n + ")\ntype A: int\n",
+    'unbalanced tags': lambda n: "#php.validate(\n" * n + "type A: int\n",
+    'huge docblock': lambda n: "/**\n" + " * Some (documentation) here\n" * n + " */\ntype A: int\n",
+    'many comments': lambda n: "/* comment */ // comment\n" * n + "type A: int\n",
+    'many typedefs': lambda n: "#check < 150\ntype A: struct { x: list of ?int }\n" * n,
+}
+
+
+def measure(parse, source, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(source)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(name, parse, base_size, steps):
+    print(f"{name}:")
+    for case, generate in CASES.items():
+        timings = []
+        for step in range(steps):
+            size = base_size << step
+            timings.append((size, measure(parse, generate(size))))
+        per_unit = ', '.join(f"{size}: {seconds / size * 1e6:.2f}" for size, seconds in timings)
+        print(f"  {case:<16} us/unit  {per_unit}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--size', type=int, default=1000, help='The smallest input size')
+    arg_parser.add_argument('--steps', type=int, default=5, help='How many times to double the size')
+    arg_parser.add_argument('--oracle', action='store_true', help='Also benchmark the pyparsing grammar')
+    args = arg_parser.parse_args()
+    run('parser', parse_document, args.size, args.steps)
+    if args.oracle:
+        run('grammar', lambda source: DOCUMENT.parse_string(source, parse_all=True), args.size, args.steps)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The lowering tests use the ordain package from the Python priest
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'priests' / 'python'))
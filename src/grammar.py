@@ -1,107 +1,184 @@
 import pyparsing as p
 import parse_nodes as n
 from ast import literal_eval
+from functools import lru_cache
+from lexer import OrdainSyntaxError, ParenMatcher, scan_comment, scan_docblock
 
-COMMENT = p.Suppress((p.Literal('//') - p.rest_of_line) | p.Literal('/*') + p.NotAny('*') - p.SkipTo(p.Literal('*/')) - p.Literal('*/'))
-DOCBLOCK = p.Literal('/**') - p.SkipTo(p.Literal('*/')) - p.Literal('*/')
-@DOCBLOCK.set_parse_action
+
+# Block comments, docblocks, and parenthesized tag arguments are matched with the lexer's
+# single-pass scanners, rather than SkipTo or nested_expr, which rescan the input when the
+# closing delimiter is far away or missing.
+
+class BlockComment(p.Token):
+    def __init__(self):
+        super().__init__()
+        self.errmsg = "Expected a comment"
+
+    def parseImpl(self, instring, loc, do_actions=True):
+        if not instring.startswith('/*', loc) or instring.startswith('/**', loc):
+            raise p.ParseException(instring, loc, self.errmsg, self)
+        try:
+            end = scan_comment(instring, loc)
+        except OrdainSyntaxError as e:
+            raise p.ParseSyntaxException(instring, loc, e.msg, self) from None
+        return end, instring[loc:end]
+
+class DocBlockText(p.Token):
+    def __init__(self):
+        super().__init__()
+        self.errmsg = "Expected a docblock"
+
+    def parseImpl(self, instring, loc, do_actions=True):
+        if not instring.startswith('/**', loc):
+            raise p.ParseException(instring, loc, self.errmsg, self)
+        try:
+            token, end = scan_docblock(instring, loc)
+        except OrdainSyntaxError as e:
+            raise p.ParseSyntaxException(instring, loc, e.msg, self) from None
+        return end, token.value
+
+@lru_cache(maxsize=1)
+def _paren_matcher(instring):
+    return ParenMatcher(instring)
+
+class ParenthesizedText(p.Token):
+    def __init__(self):
+        super().__init__()
+        self.errmsg = "Expected balanced parentheses"
+
+    def parseImpl(self, instring, loc, do_actions=True):
+        if instring.startswith('(', loc):
+            end = _paren_matcher(instring).scan(loc)
+            if end >= 0:
+                return end, instring[loc:end]
+        raise p.ParseException(instring, loc, self.errmsg, self)
+
+
+class Spanned(p.ParseElementEnhance):
+    """
+    Sets the source span of the node built by an expression's parse action, from the start of
+    its first token to the end of its last.
+    """
+    def __init__(self, expr):
+        super().__init__(expr)
+        # Skip whitespace and comments here, so the span starts at the first token
+        self.callPreparse = True
+        self.skipWhitespace = True
+
+    def parseImpl(self, instring, loc, do_actions=True):
+        end, tokens = self.expr._parse(instring, loc, do_actions, callPreParse=False)
+        if do_actions:
+            tokens[0]._parsedata(instring, loc, end)
+        return end, tokens
+
+
+COMMENT = p.Suppress((p.Literal('//') - p.rest_of_line) | BlockComment())
+DOCBLOCK = Spanned(DocBlockText())
+@DOCBLOCK.expr.set_parse_action
 def parse_docblock(s, pos, tokens):
-    return n.DocBlock(''.join(tokens))._parsedata(s, pos)
-IDENTIFIER = p.common.identifier | p.QuotedString('`', esc_char='\\')
-@IDENTIFIER.set_parse_action
+    return n.DocBlock(tokens[0])
+IDENTIFIER = Spanned(p.common.identifier | p.QuotedString('`', esc_char='\\'))
+@IDENTIFIER.expr.set_parse_action
 def parse_identifier(s, pos, tokens):
-    return n.Identifier(tokens[0])._parsedata(s, pos)
-PRIMITIVE_TYPE = p.Keyword('int') | p.Keyword('float') | p.Keyword('byte') | p.Keyword('string') | p.Keyword('binary') | p.Keyword('bool') | p.Keyword('date') | p.Keyword('datetime')
-@PRIMITIVE_TYPE.set_parse_action
+    return n.Identifier(tokens[0])
+PRIMITIVE_TYPE = Spanned(p.Keyword('int') | p.Keyword('float') | p.Keyword('byte') | p.Keyword('string') | p.Keyword('binary') | p.Keyword('bool') | p.Keyword('date') | p.Keyword('datetime'))
+@PRIMITIVE_TYPE.expr.set_parse_action
 def parse_primative_type(s, pos, tokens):
-    return n.PrimativeType(tokens[0])._parsedata(s, pos)
-LITERAL_STRING = p.python_quoted_string
-@LITERAL_STRING.set_parse_action
+    return n.PrimativeType(tokens[0])
+LITERAL_STRING = Spanned(p.python_quoted_string)
+@LITERAL_STRING.expr.set_parse_action
 def parse_literal_string(s, pos, tokens):
     # Hijack python's string parsing
     # Single-quotes are bytes, double-quotes are str
     if tokens[0][0] == "'":
-        return n.LiteralString(literal_eval(f"b{tokens[0]}"))._parsedata(s, pos)
+        return n.LiteralString(literal_eval(f"b{tokens[0]}"))
     else:
-        return n.LiteralString(literal_eval(tokens[0]))._parsedata(s, pos)
-LITERAL_INT = (p.Suppress('0x') + p.common.hex_integer) | (p.Suppress('0b') + p.Word('10').set_parse_action(lambda bits: int(bites, base=2))) | p.common.signed_integer
-@LITERAL_INT.set_parse_action
+        return n.LiteralString(literal_eval(tokens[0]))
+LITERAL_INT = Spanned((p.Suppress('0x') + p.common.hex_integer) | (p.Suppress('0b') + p.Word('10').set_parse_action(lambda bits: int(bits[0], base=2))) | p.common.signed_integer)
+@LITERAL_INT.expr.set_parse_action
 def parse_literal_int(s, pos, tokens):
-    return n.LiteralInt(tokens[0])._parsedata(s, pos)
-LITERAL_FLOAT = p.common.fnumber
-@LITERAL_FLOAT.set_parse_action
+    return n.LiteralInt(tokens[0])
+LITERAL_FLOAT = Spanned(p.common.fnumber)
+@LITERAL_FLOAT.expr.set_parse_action
 def parse_literal_float(s, pos, tokens):
-    return n.LiteralFloat(tokens[0])._parsedata(s, pos)
+    return n.LiteralFloat(tokens[0])
 LITERAL_VALUE = LITERAL_INT | LITERAL_FLOAT | LITERAL_STRING
 
 
-TAG = p.Combine(p.Literal('#') - p.Word(p.identbodychars + '-.')) - (p.original_text_for(p.nested_expr()) | p.rest_of_line)
-@TAG.set_parse_action
+TAG = Spanned(p.Combine(p.Literal('#') - p.Word(p.identbodychars + '-.')) - (ParenthesizedText() | p.rest_of_line))
+@TAG.expr.set_parse_action
 def parse_tag(s, pos, tokens):
-    return n.Tag(*tokens)._parsedata(s, pos)
+    return n.Tag(*tokens)
 
 
-INLINE_TYPE = p.Forward()
-REFERENCE_TYPE = p.Suppress('&') - IDENTIFIER - p.Keyword('from').suppress() - IDENTIFIER
-@REFERENCE_TYPE.set_parse_action
+INLINE_TYPE = Spanned(p.Forward())
+REFERENCE_TYPE = Spanned(p.Suppress('&') - IDENTIFIER - p.Keyword('from').suppress() - IDENTIFIER)
+@REFERENCE_TYPE.expr.set_parse_action
 def parse_reference_type(s, pos, tokens):
-    return n.ReferenceType(*tokens)._parsedata(s, pos)
-BACKREFERENCE_TARGET = IDENTIFIER + p.Opt(p.Keyword('via').suppress() - p.Group(IDENTIFIER - p.ZeroOrMore(p.Suppress('.')-IDENTIFIER)))
-BACKREFERENCE_TYPE = p.Suppress('*') - IDENTIFIER - p.Keyword('from').suppress - BACKREFERENCE_TARGET
-@BACKREFERENCE_TYPE.set_parse_action
+    return n.ReferenceType(*tokens)
+# Optional trailing parts are written as alternatives rather than with Opt, since a failed Opt
+# still skips the whitespace after it, which would end up in the span
+BACKREFERENCE_TARGET = (IDENTIFIER + p.Keyword('via').suppress() - p.Group(IDENTIFIER - p.ZeroOrMore(p.Suppress('.')-IDENTIFIER))) | IDENTIFIER
+BACKREFERENCE_TYPE = Spanned(p.Suppress('*') - IDENTIFIER - p.Keyword('from').suppress() - BACKREFERENCE_TARGET)
+@BACKREFERENCE_TYPE.expr.set_parse_action
 def parse_backreference_type(s, pos, tokens):
-    return n.ReferenceType(*tokens)._parsedata(s, pos)
-LIST_TYPE = p.Suppress(p.Keyword('list') - p.Keyword('of')) - INLINE_TYPE
-@LIST_TYPE.set_parse_action
+    return n.ReferenceType(*tokens)
+LIST_TYPE = Spanned(p.Suppress(p.Keyword('list') - p.Keyword('of')) - INLINE_TYPE)
+@LIST_TYPE.expr.set_parse_action
 def parse_list_type(s, pos, tokens):
-    return n.ListType(tokens[0])._parsedata(s, pos)
-ARRAY_TYPE = p.Suppress(p.Keyword('array') - p.Keyword('of')) - p.common.integer - INLINE_TYPE
-@ARRAY_TYPE.set_parse_action
+    return n.ListType(tokens[0])
+ARRAY_TYPE = Spanned(p.Suppress(p.Keyword('array') - p.Keyword('of')) - p.common.integer - INLINE_TYPE)
+@ARRAY_TYPE.expr.set_parse_action
 def parse_array_type(s, pos, tokens):
-    return n.ListType(*tokens)._parsedata(s, pos)
-MAPPING_TYPE = p.Suppress(p.Keyword('mapping') - p.Keyword('of')) - PRIMITIVE_TYPE - p.Keyword('to').suppress() - INLINE_TYPE
-@MAPPING_TYPE.set_parse_action
+    return n.ArrayType(*tokens)
+MAPPING_TYPE = Spanned(p.Suppress(p.Keyword('mapping') - p.Keyword('of')) - PRIMITIVE_TYPE - p.Keyword('to').suppress() - INLINE_TYPE)
+@MAPPING_TYPE.expr.set_parse_action
 def parse_mapping_type(s, pos, tokens):
-    return n.MappingType(*tokens)._parsedata(s, pos)
-STRUCT_FIELD_DEF = p.Opt(DOCBLOCK) + p.Group(p.ZeroOrMore(TAG)) + IDENTIFIER - p.Suppress(p.Literal(':')) - INLINE_TYPE
-@STRUCT_FIELD_DEF.set_parse_action
+    return n.MappingType(*tokens)
+STRUCT_FIELD_DEF = Spanned(p.Opt(DOCBLOCK) + p.Group(p.ZeroOrMore(TAG)) + IDENTIFIER - p.Suppress(p.Literal(':')) - INLINE_TYPE)
+@STRUCT_FIELD_DEF.expr.set_parse_action
 def parse_struct_field_def(s, pos, tokens):
     if isinstance(tokens[0], n.DocBlock):
         docblock, tags, name, type = tokens
     else:
         docblock = None
         tags, name, type = tokens
-    return n.StructFieldDef(name, type, tags, docblock)._parsedata(s, pos)
-STRUCT_DEF = p.Keyword('struct') - p.Suppress('{') - p.Group(p.ZeroOrMore(STRUCT_FIELD_DEF)) - p.Suppress('}')
-@STRUCT_DEF.set_parse_action
+    return n.StructFieldDef(name, type, tags, docblock)
+STRUCT_DEF = Spanned(p.Keyword('struct') - p.Suppress('{') - p.Group(p.ZeroOrMore(STRUCT_FIELD_DEF)) - p.Suppress('}'))
+@STRUCT_DEF.expr.set_parse_action
 def parse_struct_def(s, pos, tokens):
-    return n.StructDef(tokens[1])._parsedata(s, pos)
-ENUM_FIELD_DEF = IDENTIFIER + p.Opt(p.Suppress('=') + LITERAL_VALUE)
-@ENUM_FIELD_DEF.set_parse_action
+    return n.StructDef(tokens[1])
+ENUM_FIELD_DEF = Spanned((IDENTIFIER + p.Suppress('=') + LITERAL_VALUE) | IDENTIFIER)
+@ENUM_FIELD_DEF.expr.set_parse_action
 def parse_enum_field_def(s, pos, tokens):
-    return n.EnumFieldDef(*tokens)._parsedata(s, pos)
-ENUM_DEF = p.Keyword('enum') - p.Opt(p.Suppress(p.Keyword('of')) - PRIMITIVE_TYPE, n.PrimativeType('int')) - p.Suppress('{') - p.Group(p.ZeroOrMore(ENUM_FIELD_DEF)) - p.Suppress('}')
-@ENUM_DEF.set_parse_action
+    return n.EnumFieldDef(*tokens)
+ENUM_DEF = Spanned(p.Keyword('enum') - p.Opt(p.Suppress(p.Keyword('of')) - PRIMITIVE_TYPE, n.PrimativeType('int')) - p.Suppress('{') - p.Group(p.ZeroOrMore(ENUM_FIELD_DEF)) - p.Suppress('}'))
+@ENUM_DEF.expr.set_parse_action
 def parse_enum_def(s, pos, tokens):
-    return n.EnumDef(tokens[1], tokens[2])._parsedata(s, pos)
+    return n.EnumDef(tokens[1], tokens[2])
 
-INLINE_TYPE <<= p.Opt('?') + (PRIMITIVE_TYPE | STRUCT_DEF | ENUM_DEF | LIST_TYPE | ARRAY_TYPE | MAPPING_TYPE | IDENTIFIER)
-@INLINE_TYPE.set_parse_action
+INLINE_TYPE.expr <<= p.Opt('?') + (PRIMITIVE_TYPE | STRUCT_DEF | ENUM_DEF | LIST_TYPE | ARRAY_TYPE | MAPPING_TYPE | IDENTIFIER)
+@INLINE_TYPE.expr.set_parse_action
 def parse_inline_type(s, pos, tokens):
-    return n.InlineType(tokens[-1], tokens[0]=='?')._parsedata(s, pos)
+    return n.InlineType(tokens[-1], tokens[0]=='?')
 
-TYPE_DEF = p.Opt(DOCBLOCK) + p.Group(p.ZeroOrMore(TAG)) + p.Keyword('type').suppress() - IDENTIFIER - p.Suppress(':') - (PRIMITIVE_TYPE | STRUCT_DEF | ENUM_DEF | LIST_TYPE | ARRAY_TYPE | MAPPING_TYPE | IDENTIFIER)
-@TYPE_DEF.set_parse_action
+TYPE_DEF = Spanned(p.Opt(DOCBLOCK) + p.Group(p.ZeroOrMore(TAG)) + p.Keyword('type').suppress() - IDENTIFIER - p.Suppress(':') - (PRIMITIVE_TYPE | STRUCT_DEF | ENUM_DEF | LIST_TYPE | ARRAY_TYPE | MAPPING_TYPE | IDENTIFIER))
+@TYPE_DEF.expr.set_parse_action
 def parse_type_def(s, pos, tokens):
     if isinstance(tokens[0], n.DocBlock):
         docblock, tags, name, type = tokens
     else:
         docblock = None
         tags, name, type = tokens
-    return n.TypeDef(name, type, tags, docblock)._parsedata(s, pos)
+    return n.TypeDef(name, type, tags, docblock)
+
+IMPORT = Spanned(p.Keyword('import').suppress() - LITERAL_STRING)
+@IMPORT.expr.set_parse_action
+def parse_import(s, pos, tokens):
+    return n.Import(tokens[0])
 
 
-DOCUMENT = p.ZeroOrMore(TYPE_DEF).ignore(COMMENT)
+DOCUMENT = (p.ZeroOrMore(IMPORT) + p.ZeroOrMore(TYPE_DEF)).ignore(COMMENT)
 
 if __name__ == '__main__':
     from pprint import pprint
@@ -0,0 +1,163 @@
+"""
+Incremental re-parsing of edited ordinations.
+
+Each top-level typedef (or import) is parsed independently of the ones around it, so after an
+edit only the typedefs overlapping the edited text need to be parsed again. Parsing resumes at the end
+of the last typedef before the edit, and stops as soon as it reaches the start of an old
+typedef past the edit, since everything from there on is unchanged.
+"""
+from bisect import bisect_left
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import List
+import parse_nodes as n
+from source import Source
+from lexer import EOF, scan_parenthesized, skip_ignorable
+from parser import Parser
+
+
+@dataclass(frozen=True, slots=True)
+class TextEdit:
+    """
+    Replaces the text between `start` and `end` (offsets into the old text) with `text`
+    """
+    start: int
+    end: int
+    text: str
+
+    @property
+    def delta(self)->int:
+        """
+        How much later the text after the edit starts in the new text
+        """
+        return len(self.text) - (self.end - self.start)
+
+    def apply(self, s: str)->str:
+        return s[:self.start] + self.text + s[self.end:]
+
+
+@dataclass(slots=True)
+class ParsedDocument:
+    """
+    A parsed ordination, which can be updated with `reparse`
+    """
+    frame: n.Frame
+    """
+    The frame holding the source, shared by the anchors of all the typedefs
+    """
+    typedefs: List[n.Import|n.TypeDef]
+    """
+    The top-level nodes: any imports, followed by the typedefs
+    """
+    open_ended: List[n.TypeDef]
+    """
+    The typedefs which have a tag with unbalanced parentheses, in order. Such a tag's arguments
+    depend on whether the parentheses are closed anywhere in the rest of the source, so the
+    typedef is affected by edits anywhere after it.
+    """
+    gap: int
+    """
+    The index of the first typedef anchored from the end of the source rather than the start.
+    Edits before an anchor measured from the end don't move it, so an edit only needs to move
+    the anchors between it and the previous edit, instead of every anchor after it.
+    """
+
+    @property
+    def source(self)->Source:
+        return self.frame.source
+
+    @property
+    def text(self)->str:
+        return self.frame.source.text
+
+
+_start = attrgetter('_start')
+_end = attrgetter('_end')
+
+
+def _is_open_ended(typedef: n.TypeDef, s: str)->bool:
+    for node in n.walk(typedef):
+        # When the parentheses are unbalanced, the lexer falls back to the rest of the line
+        if isinstance(node, n.Tag) and s.startswith('(', skip_ignorable(s, node._start + len(node.name))):
+            if scan_parenthesized(node.args, 0) != len(node.args):
+                return True
+    return False
+
+
+def _move_gap(typedefs: List[n.Import|n.TypeDef], gap: int, first: int, resume: int, size: int):
+    """
+    Anchor the typedefs before `first` from the start of the source, and those from `resume` on
+    from its end, given the size of the source. Only the anchors between the old gap and the
+    edit are changed.
+    """
+    for index in range(gap, first):
+        typedefs[index]._anchor.offset += size
+    for index in range(resume, gap):
+        typedefs[index]._anchor.offset -= size
+
+
+def parse(s: str)->ParsedDocument:
+    """
+    Parse an ordination, keeping what is needed to re-parse it incrementally
+    """
+    parser = Parser(s)
+    typedefs: List[n.Import|n.TypeDef] = parser.parse_imports()
+    while parser.token.kind != EOF:
+        typedefs.append(parser.parse_type_def())
+    open_ended = [typedef for typedef in typedefs if _is_open_ended(typedef, s)]
+    return ParsedDocument(parser.frame, typedefs, open_ended, len(typedefs))
+
+
+def reparse(document: ParsedDocument, edit: TextEdit)->ParsedDocument:
+    """
+    Apply an edit to a parsed ordination, re-parsing only the typedefs it affects.
+
+    Typedefs outside the edited region are reused by identity, so callers can skip any work for
+    typedefs which are the same objects as before. Their spans are relative to anchors, so
+    moving them takes no more than moving the anchors between this edit and the last one. The
+    document is updated in place, and returned.
+
+    :raises OrdainSyntaxError: If the edited text is not well-formed. The document is left
+        unchanged.
+    """
+    old_s = document.text
+    typedefs = document.typedefs
+    open_ended = document.open_ended
+    s = edit.apply(old_s)
+    delta = edit.delta
+    # The first affected typedef is the first which reaches the start of the edit. Typedefs
+    # which only touch the edit are included, since e.g. a name at the end may be extended.
+    first = bisect_left(typedefs, edit.start, key=_end)
+    if open_ended:
+        first = min(first, bisect_left(typedefs, open_ended[0]._start, key=_start))
+    pos = typedefs[first - 1]._end if first else 0
+    parser = Parser(s, pos)
+    # Imports are only allowed before the first typedef
+    imports_allowed = first == 0 or isinstance(typedefs[first - 1], n.Import)
+    parsed = []
+    resume = len(typedefs)
+    resume_pos = len(old_s) + 1
+    while parser.token.kind != EOF:
+        old_pos = parser.token.start - delta
+        if old_pos >= edit.end:
+            index = bisect_left(typedefs, old_pos, first, key=_start)
+            if index < len(typedefs) and typedefs[index]._start == old_pos and (imports_allowed or isinstance(typedefs[index], n.TypeDef)):
+                resume = index
+                resume_pos = old_pos
+                break
+        if imports_allowed and parser.is_keyword('import'):
+            parsed.append(parser.parse_import())
+        else:
+            imports_allowed = False
+            parsed.append(parser.parse_type_def())
+    # Only update the document once the edited text has parsed successfully
+    open_from = bisect_left(open_ended, pos, key=_start)
+    open_to = bisect_left(open_ended, resume_pos, open_from, key=_start)
+    open_ended[open_from:open_to] = [typedef for typedef in parsed if _is_open_ended(typedef, s)]
+    _move_gap(typedefs, document.gap, first, resume, len(old_s))
+    for typedef in parsed:
+        typedef._anchor.frame = document.frame
+    document.frame.source = parser.source
+    typedefs[first:resume] = parsed
+    document.gap = first + len(parsed)
+    return document
@@ -0,0 +1,282 @@
+import math
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple, Union
+from source import Source, source_for
+
+class OrdainSyntaxError(Exception):
+    """
+    Raised when an ordination cannot be tokenized or parsed
+    """
+    def __init__(self, message: str, s: str|Source, pos: int):
+        self.msg = message
+        self.pos = pos
+        self.lineno, self.col = (s if isinstance(s, Source) else source_for(s)).location(pos)
+        super().__init__(f"{message} (at line {self.lineno}, col {self.col})")
+
+
+# Token kinds
+NAME = 'name'
+QUOTED_NAME = 'quoted name'
+NUMBER = 'number'
+STRING = 'string'
+DOCBLOCK = 'docblock'
+TAG = 'tag'
+PUNCT = 'punctuation'
+EOF = 'end of file'
+
+@dataclass(slots=True)
+class Token:
+    kind: str
+    value: Union[str,Tuple[str,str]]
+    start: int
+    end: int
+
+
+_WHITESPACE = re.compile(r'\s*')
+_LINE_COMMENT = re.compile(r'//[^\n]*')
+_TOKEN = re.compile(r'''
+    (?P<name>[^\W\d]\w*)
+    |(?P<quoted_name>`(?:[^`\\\n]|\\.)*`)
+    |(?P<number>[+-]?(?:0x[0-9a-fA-F]+|0b[01]+|\d+(?:\.\d*)?(?:[eE][+-]?\d+)?))
+    |(?P<string>"""(?:[^\\]|\\.)*?"""|\'\'\'(?:[^\\]|\\.)*?\'\'\'|"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    |(?P<punctuation>[:{}=?])
+''', re.VERBOSE | re.DOTALL)
+_TAG_NAME = re.compile(r'[\w.-]+')
+_REST_OF_LINE = re.compile(r'[^\n]*')
+# The events a parenthesis scan cares about. Strings can only start a new word (so apostrophes
+# inside words are just text), and can't span lines.
+_PAREN_EVENT = re.compile(r'''
+    (?<=[() \t\r\n\f\v])(?:"(?:[^"\n\r\\]|\\.)*"|'(?:[^'\n\r\\]|\\.)*')
+    |[()\n]
+''', re.VERBOSE)
+
+
+def skip_comments(s: str, pos: int)->int:
+    """
+    Skip any comments (but not docblocks) at `pos`, along with the whitespace before them. 
+    Whitespace after the last comment is not skipped.
+    """
+    while True:
+        start = _WHITESPACE.match(s, pos).end()
+        if s.startswith('//', start):
+            pos = _LINE_COMMENT.match(s, start).end()
+        elif s.startswith('/*', start) and not s.startswith('/**', start):
+            pos = scan_comment(s, start)
+        else:
+            return pos
+
+
+def skip_ignorable(s: str, pos: int)->int:
+    """
+    Skip whitespace and comments (but not docblocks), returning the position of the next token
+    """
+    return _WHITESPACE.match(s, skip_comments(s, pos)).end()
+
+
+def scan_comment(s: str, pos: int)->int:
+    """
+    Find the end of the block comment (or docblock) starting at `pos`.
+    """
+    end = s.find('*/', pos + 2)
+    if end < 0:
+        raise OrdainSyntaxError("Unterminated comment", s, pos)
+    return end + 2
+
+
+def scan_parenthesized(s: str, pos: int)->int:
+    """
+    Find the end of a balanced parenthesized expression starting at `pos`, skipping over quoted
+    strings. Returns -1 if the parentheses are not balanced.
+
+    This takes time proportional to the length of the expression, or the rest of the source if
+    it is not balanced; use a `ParenMatcher` when scanning many expressions in the same source.
+    """
+    depth = 0
+    for event in _PAREN_EVENT.finditer(s, pos):
+        char = event.group()
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return event.end()
+    return -1
+
+
+class ParenMatcher:
+    """
+    Finds the ends of balanced parenthesized expressions in a source, like `scan_parenthesized`.
+
+    Scanning every unbalanced expression to the end of the source would take quadratic time
+    when there are many of them, so lines are summarized instead. Strings can't span lines,
+    so a scan treats each line the same way no matter where it started. Each line's net
+    change in depth and the lowest depth reached within it are kept in a min segment tree, so
+    a scan that leaves its first line can jump straight to the line where it closes, or find
+    that it never does, in O(log n). The summary is only built once a scan fails, since
+    balanced expressions are cheaper to scan directly.
+    """
+    __slots__ = ('s', '_line_starts', '_line_depths', '_size', '_lows')
+
+    def __init__(self, s: str):
+        self.s = s
+        self._line_starts: Optional[List[int]] = None
+
+    def _summarize(self):
+        s = self.s
+        line_starts = [0]
+        # The depth at the start of each line, relative to the start of the source
+        line_depths = [0]
+        lows = []
+        depth = 0
+        low = math.inf
+        for event in _PAREN_EVENT.finditer(s):
+            char = event.group()
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth < low:
+                    low = depth
+            elif char == '\n':
+                line_starts.append(event.end())
+                line_depths.append(depth)
+                lows.append(low)
+                low = math.inf
+        lows.append(low)
+        size = 1 << (len(lows) - 1).bit_length()
+        tree = [math.inf] * (2 * size)
+        tree[size:size + len(lows)] = lows
+        for node in range(size - 1, 0, -1):
+            tree[node] = min(tree[2 * node], tree[2 * node + 1])
+        self._line_starts = line_starts
+        self._line_depths = line_depths
+        self._size = size
+        self._lows = tree
+
+    def _first_line_reaching(self, line: int, depth: float)->int:
+        """
+        Find the first line at or after `line` which reaches the given depth, or -1.
+        """
+        size = self._size
+        tree = self._lows
+        # The nodes covering [line, end), left to right, are the left-boundary nodes
+        node = line + size
+        end = 2 * size
+        while node < end:
+            if node & 1:
+                if tree[node] <= depth:
+                    while node < size:
+                        node = 2 * node if tree[2 * node] <= depth else 2 * node + 1
+                    return node - size
+                node += 1
+            node >>= 1
+            end >>= 1
+        return -1
+
+    def scan(self, pos: int)->int:
+        """
+        Find the end of a balanced parenthesized expression starting at `pos`. Returns -1 if the
+        parentheses are not balanced.
+        """
+        s = self.s
+        if self._line_starts is None:
+            # Until a scan fails, scanning directly is cheaper than summarizing the source
+            end = scan_parenthesized(s, pos)
+            if end < 0:
+                self._summarize()
+            return end
+        line_end = s.find('\n', pos)
+        if line_end < 0:
+            return scan_parenthesized(s, pos)
+        depth = 0
+        for event in _PAREN_EVENT.finditer(s, pos, line_end):
+            char = event.group()
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    return event.end()
+        line = bisect_right(self._line_starts, line_end)
+        # The scan closes once the depth falls back to where it was before the opening paren
+        target = self._line_depths[line] - depth
+        line = self._first_line_reaching(line, target)
+        if line < 0:
+            return -1
+        depth = self._line_depths[line] - target
+        for event in _PAREN_EVENT.finditer(s, self._line_starts[line]):
+            char = event.group()
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    return event.end()
+        raise AssertionError("Line summary does not match the source")
+
+
+def scan_tag(s: str, pos: int, parens: Optional[ParenMatcher] = None)->Tuple[Token,int]:
+    """
+    Scan a tag starting at the `#` at `pos`. Returns the token and the position after it.
+
+    The tag's arguments are either a balanced parenthesized expression (which may span lines),
+    or the rest of the line.
+    """
+    name = _TAG_NAME.match(s, pos + 1)
+    if name is None:
+        raise OrdainSyntaxError("Expected a tag name", s, pos + 1)
+    args_start = name.end()
+    paren = skip_ignorable(s, args_start)
+    if s.startswith('(', paren):
+        end = scan_parenthesized(s, paren) if parens is None else parens.scan(paren)
+        if end >= 0:
+            return Token(TAG, (s[pos:args_start], s[paren:end]), pos, end), end
+    # Otherwise, the rest of the line (after any comments) is the arguments
+    args_start = skip_comments(s, args_start)
+    end = _REST_OF_LINE.match(s, args_start).end()
+    return Token(TAG, (s[pos:name.end()], s[args_start:end]), pos, end), end
+
+
+def scan_docblock(s: str, pos: int)->Tuple[Token,int]:
+    """
+    Scan a docblock starting at the `/**` at `pos`. Returns the token and the position after it.
+    """
+    body = _WHITESPACE.match(s, pos + 3).end()
+    end = s.find('*/', body)
+    if end < 0:
+        raise OrdainSyntaxError("Unterminated docblock", s, pos)
+    return Token(DOCBLOCK, f"/**{s[body:end]}*/", pos, end + 2), end + 2
+
+
+def iter_tokens(s: str, pos: int = 0)->Iterator[Token]:
+    """
+    Lazily split an ordination into tokens, starting at `pos`. Whitespace and comments are
+    dropped. The last token is always EOF.
+    """
+    parens = ParenMatcher(s)
+    while True:
+        pos = skip_ignorable(s, pos)
+        if pos >= len(s):
+            yield Token(EOF, '', pos, pos)
+            return
+        char = s[pos]
+        if char == '#':
+            token, pos = scan_tag(s, pos, parens)
+        elif s.startswith('/**', pos):
+            token, pos = scan_docblock(s, pos)
+        else:
+            match = _TOKEN.match(s, pos)
+            if match is None:
+                raise OrdainSyntaxError(f"Unexpected character {char!r}", s, pos)
+            token = Token(match.lastgroup.replace('_', ' '), match.group(), pos, match.end()) # type: ignore
+            pos = match.end()
+        yield token
+
+
+def tokenize(s: str)->List[Token]:
+    """
+    Split an ordination into tokens. Whitespace and comments are dropped.
+    """
+    return list(iter_tokens(s))
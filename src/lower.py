@@ -0,0 +1,358 @@
+"""
+Lowering of parsed ordinations (`parse_nodes`) into the `ordain.model` used by the priests.
+
+The model is built directly from the syntax tree in a single pass, with the same meaning as
+the dict front end (`ordain.parse_dict`): a reference to a named type takes that type's base
+type and records it as the parent, and named types inside inline types (e.g. `list of User`)
+become `NamedTypeReference`s.
+
+Typedefs from imported files are passed in as `externals`, and are referred to just like the
+file's own typedefs. Imports themselves are followed by `ordain.imports`.
+
+Importing this module registers a loader for `.ordain` files with `ordain.cache`.
+"""
+import re
+from textwrap import dedent
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+import parse_nodes as n
+from parser import Parser, parse_document
+from lexer import OrdainSyntaxError, scan_parenthesized
+from ordain.cache import register_loader
+from ordain.exceptions import ParseException
+from ordain.model import *
+
+_NO_TAGS = TagRepository.interned([])
+_TRAILING_COMMENT = re.compile(r'\s+//.*$')
+_DOCBLOCK_LINE_PREFIX = re.compile(r'^\s*\* ?', re.MULTILINE)
+
+
+def lower_document(nodes: List[n.Import|n.TypeDef], externals: Mapping[str,Typedef] = {})->Dict[str,Typedef]:
+    """
+    Build a model from a parsed ordination.
+
+    :param externals: Already-lowered typedefs (e.g. from imported files) which the ordination may
+        refer to. These are not included in the result.
+    :raises ParseException: If the ordination is not valid. All problems found are reported at once.
+    """
+    typedefs = [node for node in nodes if isinstance(node, n.TypeDef)]
+    lowering = Lowering(typedefs, externals)
+    model = {}
+    for node in typedefs:
+        try:
+            model[node.name.name] = lowering.typedef(node)
+        except ParseException as e:
+            lowering.error(str(e), node)
+    lowering.raise_errors()
+    return model
+
+
+def load(source: bytes, externals: Mapping[str,Typedef] = {})->Dict[str,Typedef]:
+    """
+    Build a model from the text of an ordination
+
+    :raises ParseException: If the ordination is not well-formed
+    """
+    try:
+        nodes = parse_document(source.decode())
+    except OrdainSyntaxError as e:
+        raise ParseException(str(e)) from None
+    return lower_document(nodes, externals)
+
+
+def scan_imports(source: bytes)->List[str]:
+    """
+    Get the paths imported by the text of an ordination, without parsing past the imports
+
+    :raises ParseException: If the imports are not well-formed
+    """
+    try:
+        imports = Parser(source.decode()).parse_imports()
+    except OrdainSyntaxError as e:
+        raise ParseException(str(e)) from None
+    for node in imports:
+        if node.path.is_binary:
+            line, col = node.location
+            raise ParseException(f"Import paths must be strings, not binary (at line {line}, col {col})")
+    return [node.path.value for node in imports]
+
+
+def tag_value(args: str)->Union[str,bool]:
+    """
+    Get the value of a tag from the text of its arguments.
+
+    Parenthesized arguments have the parentheses removed and are dedented; otherwise the value
+    is the rest of the line, without any trailing comment. A tag with no arguments is a flag.
+    """
+    if args.startswith('(') and scan_parenthesized(args, 0) == len(args):
+        value = dedent(args[1:-1]).strip()
+    else:
+        value = _TRAILING_COMMENT.sub('', args).strip()
+    return value if value else True
+
+
+def lower_tags(tags: List[n.Tag])->TagRepository:
+    if not tags:
+        return _NO_TAGS
+    return TagRepository.interned(Tag.from_key_value(tag.name[1:], tag_value(tag.args)) for tag in tags)
+
+
+def lower_docblock(docblock: Optional[n.DocBlock])->Optional[str]:
+    """
+    Get the documentation text from a docblock, without the comment markers or leading `*`s
+    """
+    if docblock is None:
+        return None
+    return _DOCBLOCK_LINE_PREFIX.sub('', docblock.contents[3:-2]).strip()
+
+
+class Lowering:
+    """
+    Resolves the names in a parsed ordination while lowering it, memoizing the base type of each
+    named type so that every alias chain is only walked once.
+
+    Problems which don't prevent lowering from continuing are collected in `errors`, so they can
+    all be reported together.
+    """
+    def __init__(self, typedefs: List[n.TypeDef], externals: Mapping[str,Typedef] = {}):
+        self.errors: List[str] = []
+        self.externals = externals
+        self.defs: Dict[str,n.TypeDef] = {}
+        self._base_types: Dict[str,Type] = {}
+        self._inline_types: Dict[str,Typedef] = {}
+        for node in typedefs:
+            name = node.name.name
+            if name in self.defs:
+                self.error(f"Duplicate typedef: {name}", node.name)
+            else:
+                self.defs[name] = node
+
+    def error(self, message: str, node: n.Node):
+        if hasattr(node, '_start'):
+            line, col = node.location
+            message = f"{message} (at line {line}, col {col})"
+        self.errors.append(message)
+
+    def raise_errors(self):
+        """
+        :raises ParseException: If any errors have been collected
+        """
+        errors = list(dict.fromkeys(self.errors))
+        if len(errors) == 1:
+            raise ParseException(errors[0])
+        elif errors:
+            raise ParseException(f"{len(errors)} errors found:\n" + '\n'.join(f"  {error}" for error in errors))
+
+    def named(self, node: n.Node)->Optional[str]:
+        """
+        Get the name of the typedef a type refers to, if it refers to one
+        """
+        if isinstance(node, n.Identifier) and node.name not in ScalarType and (node.name in self.defs or node.name in self.externals):
+            return node.name
+        return None
+
+    def typedef(self, node: n.TypeDef)->Typedef:
+        name = node.name.name
+        type, parent = self.type(node.type, name)
+        return Typedef(name, type, lower_tags(node.tags), lower_docblock(node.docblock), parent)
+
+    def field(self, node: n.StructFieldDef, path: str)->Typedef:
+        # Like the dict front end, fields are named by their path, e.g. `User.name`
+        path = f"{path}.{node.name.name}"
+        type, parent = self.inline_type(node.type, path)
+        return Typedef(path, type, lower_tags(node.tags), lower_docblock(node.docblock), parent)
+
+    def inline_type(self, node: n.InlineType, path: str)->Tuple[Type,Optional[str]]:
+        type, parent = self.type(node.type, path)
+        if node.nullalbe and not isinstance(type, NullableType):
+            type = NullableType(type)
+        return type, parent
+
+    def type(self, node: n.Node, path: str)->Tuple[Type,Optional[str]]:
+        """
+        Lower the type of a typedef or struct field, along with the name of its parent
+        """
+        name = self.named(node)
+        if name is not None:
+            return self.base_type(name), name
+        elif isinstance(node, n.StructDef):
+            fields = {}
+            for field in node.fields:
+                # Keep going after a bad field, so all the problems can be reported at once
+                try:
+                    fields[field.name.name] = self.field(field, path)
+                except ParseException as e:
+                    self.error(str(e), field)
+            return StructType(fields), None
+        elif isinstance(node, (n.ListType, n.ArrayType, n.MappingType)):
+            typedef = self.inline_typedef(node, path)
+            return typedef.type, typedef.parent
+        return self.simple_type(node), None
+
+    def simple_type(self, node: n.Node)->Type:
+        """
+        Lower a type which doesn't depend on any other typedefs
+        """
+        if isinstance(node, (n.PrimativeType, n.Identifier)):
+            if node.name in ScalarType:
+                return ScalarType(node.name)
+            elif isinstance(node, n.PrimativeType):
+                raise ParseException(f"Unsupported type: {node.name}")
+            raise ParseException(f"Undefined type: {node.name}")
+        elif isinstance(node, n.EnumDef):
+            return self.enum_type(node)
+        raise ParseException(f"Unsupported type: {node}")
+
+    def base_type(self, name: str)->Type:
+        """
+        Get the type a named typedef ultimately resolves to, following aliases.
+
+        Named structs resolve to an empty struct; their fields are found through the parent.
+        External typedefs have already been resolved, so their types are used as they are.
+
+        :raises ParseException: If the alias chain is cyclic
+        """
+        try:
+            return self._base_types[name]
+        except KeyError:
+            pass
+        chain = []
+        current = name
+        while current not in self._base_types:
+            if current in chain:
+                raise ParseException(f"Inheritance cycle: {' -> '.join(chain[chain.index(current):] + [current])}")
+            chain.append(current)
+            if current not in self.defs:
+                self._base_types[current] = _external_base_type(self.externals[current].type)
+                break
+            node = self.defs[current].type
+            parent = self.named(node)
+            if parent is None:
+                if isinstance(node, n.StructDef):
+                    type = StructType({})
+                else:
+                    type, _ = self.type(node, current)
+                self._base_types[current] = type
+                break
+            current = parent
+        type = self._base_types[current]
+        for key in chain:
+            self._base_types[key] = type
+        return type
+
+    def inline_typedef(self, node: n.Node, path: str)->Typedef:
+        """
+        Lower the type of an element of a list, array, or mapping to an anonymous typedef.
+
+        Results are memoized by the type string, so every typedef using the same type (e.g.
+        `list of string`) shares one instance, unless it contains a struct or enum.
+        """
+        type_str = _type_str(node)
+        typedef = self._inline_types.get(type_str)
+        if typedef is not None:
+            return typedef
+        parent = None
+        if isinstance(node, n.InlineType):
+            of = self.inline_typedef(node.type, path)
+            type = NullableType(of.type) if node.nullalbe else of.type
+            parent = of.parent
+        elif isinstance(node, n.ListType):
+            type = CollectionType(self.inline_typedef(node.type, path))
+        elif isinstance(node, n.ArrayType):
+            type = CollectionType(self.inline_typedef(node.type, path), node.count)
+        elif isinstance(node, n.MappingType):
+            type = MappingType(self.inline_typedef(node.key_type, path), self.inline_typedef(node.value_type, path))
+        elif self.named(node) is not None:
+            type = NamedTypeReference(node.name)
+            parent = node.name
+        elif isinstance(node, n.StructDef):
+            type, _ = self.type(node, path)
+        else:
+            type = self.simple_type(node)
+        typedef = Typedef(type_str, type, _NO_TAGS, None, parent)
+        if not _has_definition(node):
+            self._inline_types[type_str] = typedef
+        return typedef
+
+    def enum_type(self, node: n.EnumDef)->EnumType:
+        """
+        Lower an enum. String values default to the name, and int values count up from the
+        previous value (or 0). Other types need every value to be given.
+        """
+        of = self.simple_type(node.type)
+        values = []
+        next_int = 0
+        for field in node.fields:
+            name = field.name.name
+            if field.value is not None:
+                value = field.value.value
+            elif of is ScalarType.string:
+                value = name
+            elif of is ScalarType.int:
+                value = next_int
+            else:
+                raise ParseException(f"Enum value {name} of type {of} has no value")
+            if not _is_valid_enum_value(of, value):
+                raise ParseException(f"Enum value {name} is not a valid {of}: {value!r}")
+            if of is ScalarType.int:
+                next_int = value + 1
+            values.append(value)
+        return EnumType(of, values)
+
+
+def _external_base_type(type: Type)->Type:
+    """
+    The base type of a reference to an external typedef, with any struct's fields left out
+    """
+    if isinstance(type, StructType):
+        return StructType({})
+    elif isinstance(type, NullableType) and isinstance(type.of, StructType):
+        return NullableType(StructType({}))
+    return type
+
+
+def _type_str(node: n.Node)->str:
+    """
+    The type string the dict front end would use for an inline type
+    """
+    if isinstance(node, n.InlineType):
+        return f"?{_type_str(node.type)}" if node.nullalbe else _type_str(node.type)
+    elif isinstance(node, n.ListType):
+        return f"list of {_type_str(node.type)}"
+    elif isinstance(node, n.ArrayType):
+        return f"array of {node.count} {_type_str(node.type)}"
+    elif isinstance(node, n.MappingType):
+        return f"mapping of {_type_str(node.key_type)} to {_type_str(node.value_type)}"
+    elif isinstance(node, (n.PrimativeType, n.Identifier)):
+        return node.name
+    elif isinstance(node, n.StructDef):
+        return 'struct'
+    elif isinstance(node, n.EnumDef):
+        return 'enum'
+    raise ParseException(f"Unsupported type: {node}")
+
+
+def _has_definition(node: n.Node)->bool:
+    """
+    Check if an inline type contains a struct or enum definition, so can't be shared by name
+    """
+    while isinstance(node, (n.InlineType, n.ListType, n.ArrayType, n.MappingType)):
+        if isinstance(node, n.MappingType):
+            node = node.value_type
+        else:
+            node = node.type
+    return isinstance(node, (n.StructDef, n.EnumDef))
+
+
+def _is_valid_enum_value(of: ScalarType, value)->bool:
+    if of is ScalarType.int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    elif of is ScalarType.string:
+        return isinstance(value, str)
+    elif of is ScalarType.binary:
+        return isinstance(value, bytes)
+    elif of is ScalarType.float:
+        return isinstance(value, (int, float))
+    return True
+
+
+register_loader('.ordain', load, scan_imports)
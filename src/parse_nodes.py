@@ -1,18 +1,98 @@
-from dataclasses import dataclass, field
-from typing import List, Any
+from __future__ import annotations
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from typing import List, Any, Optional, Tuple, Iterator, Dict
+from source import Source, source_for
 
-@dataclass
+class Frame:
+    """
+    Holds the source for all the anchors of a document, so it can be replaced for every node at
+    once when the document is edited
+    """
+    __slots__ = ('source',)
+
+    def __init__(self, source: Source):
+        self.source = source
+
+
+class Anchor:
+    """
+    Where a top-level node, and everything beneath it, is in its source. Nodes store their spans
+    relative to their anchor, so moving the anchor moves them all.
+
+    Like an index, a negative offset counts back from the end of the source, so an anchor measured
+    from the end doesn't move when text before it is edited.
+    """
+    __slots__ = ('frame', 'offset')
+
+    def __init__(self, frame: Frame, offset: int):
+        self.frame = frame
+        self.offset = offset
+
+    @property
+    def position(self)->int:
+        """
+        The offset of the anchor from the start of the source
+        """
+        offset = self.offset
+        return offset if offset >= 0 else len(self.frame.source.text) + offset
+
+
+@lru_cache(maxsize=16)
+def root_anchor(source: Source)->Anchor:
+    """
+    Get the shared anchor at the start of a source, for nodes built without one (e.g. by pyparsing
+    parse actions)
+    """
+    return Anchor(Frame(source), 0)
+
+
+@dataclass(slots=True)
 class Node:
-    _str: str = field(init=False, repr=False)
-    _pos: int = field(init=False, repr=False)
-    def _parsedata(self, s, pos):
-        self._str = s
-        self._pos = pos
+    _anchor: Anchor = field(init=False, repr=False, compare=False)
+    _rel_start: int = field(init=False, repr=False, compare=False)
+    _rel_end: int = field(init=False, repr=False, compare=False)
+    def _parsedata(self, s: str|Source|Anchor, start: int, end: Optional[int] = None):
+        """
+        Set the node's span, given as offsets into the source, relative to an anchor if one is given
+        """
+        anchor = s if isinstance(s, Anchor) else root_anchor(s if isinstance(s, Source) else source_for(s))
+        self._anchor = anchor
+        self._rel_start = start - anchor.offset
+        self._rel_end = self._rel_start if end is None else end - anchor.offset
         return self
+    @property
+    def _source(self)->Source:
+        return self._anchor.frame.source
+    @property
+    def _start(self)->int:
+        return self._anchor.position + self._rel_start
+    @property
+    def _end(self)->int:
+        return self._anchor.position + self._rel_end
+    @property
+    def _str(self)->str:
+        return self._source.text
+    @property
+    def _pos(self)->int:
+        return self._start
+    @property
+    def span(self)->Tuple[int,int]:
+        """
+        The (start, end) offsets of the node in its source
+        """
+        position = self._anchor.position
+        return position + self._rel_start, position + self._rel_end
+    @property
+    def location(self)->Tuple[int,int]:
+        """
+        The line and column number where the node starts
+        """
+        return self._source.location(self._start)
     def __str__(self):
         return self.dump()
 
-@dataclass
+@dataclass(slots=True)
 class DocBlock(Node):
     """
     Documentation block, used to describe a struct or field
@@ -21,73 +101,73 @@ class DocBlock(Node):
     def dump(self, indent_level=0):
         return self.contents
 
-@dataclass
+@dataclass(slots=True)
 class Tag(Node):
     name: str
     args: str
     def dump(self, indent_level=0):
         return f"{self.name} {self.args.strip()}"
 
-@dataclass
+@dataclass(slots=True)
 class PrimativeType(Node):
     name: str
     def dump(self, indent_level=0):
         return self.name
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(Node):
     name: str
     def dump(self, indent_level=0):
         name=self.name.replace('`', '\\`')
         return f"`{name}`"
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Node):
     value: Any
     def dump(self, indent_level=0):
         return repr(self.value) # TODO make better
 
-@dataclass
+@dataclass(slots=True)
 class LiteralString(Literal):
     value: str|bytes
     @property
     def is_binary(self):
         return not isinstance(self.value, str)
 
-@dataclass
+@dataclass(slots=True)
 class LiteralInt(Literal):
     value: int
 
-@dataclass
+@dataclass(slots=True)
 class LiteralFloat(Literal):
     value: float
 
-@dataclass
+@dataclass(slots=True)
 class ListType(Node):
     type: InlineType
 
-@dataclass
+@dataclass(slots=True)
 class ArrayType(Node):
     count: int
     type: InlineType
 
-@dataclass
+@dataclass(slots=True)
 class MappingType(Node):
     key_type: PrimativeType
     value_type: InlineType
 
-@dataclass
+@dataclass(slots=True)
 class ReferenceType(Node):
     type: Identifier
     store: Identifier
 
-@dataclass
+@dataclass(slots=True)
 class BackreferenceType(Node):
     type: Identifier
     store: Identifier
     via: List[Identifier] = None
 
-@dataclass
+@dataclass(slots=True)
 class StructFieldDef(Node):
     name: Identifier
     type: Node
@@ -98,28 +178,59 @@ class StructFieldDef(Node):
         return indents + f'\n{indents}'.join(filter(None, [self.docblock, *self.tags, f"{self.name}: {self.type}"]))
 
 #TODO finish dump funcs
-@dataclass
+@dataclass(slots=True)
 class StructDef(Node):
     fields: List[StructFieldDef]
 
-@dataclass
+@dataclass(slots=True)
 class EnumFieldDef(Node):
     name: Identifier
     value: Literal = None
 
-@dataclass
+@dataclass(slots=True)
 class EnumDef(Node):
     type: PrimativeType
     fields: List[StructFieldDef]
 
-@dataclass
+@dataclass(slots=True)
 class InlineType(Node):
     type: PrimativeType|StructDef|EnumDef|Identifier
     nullalbe: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class TypeDef(Node):
     name: Identifier
     type: PrimativeType|StructDef|EnumDef|Identifier
     tags: List[Tag] = None
-    docblock: DocBlock = None
\ No newline at end of file
+    docblock: DocBlock = None
+
+@dataclass(slots=True)
+class Import(Node):
+    """
+    Makes the typedefs of another ordination file available, by its path relative to this one
+    """
+    path: LiteralString
+    def dump(self, indent_level=0):
+        return f"import {self.path.dump()}"
+
+
+_CHILD_FIELDS: Dict[type,Tuple[str,...]] = {}
+
+def walk(node: Node)->Iterator[Node]:
+    """
+    Iterate over a node and all the nodes beneath it, depth-first
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        try:
+            names = _CHILD_FIELDS[type(node)]
+        except KeyError:
+            names = _CHILD_FIELDS[type(node)] = tuple(f.name for f in fields(node) if not f.name.startswith('_'))
+        for name in reversed(names):
+            value = getattr(node, name)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(reversed(value))
@@ -0,0 +1,255 @@
+import parse_nodes as n
+from source import source_for
+from lexer import OrdainSyntaxError, Token, iter_tokens, NAME, QUOTED_NAME, NUMBER, STRING, DOCBLOCK, TAG, PUNCT, EOF
+from ast import literal_eval
+from typing import List, Optional
+import re
+
+PRIMITIVE_TYPES = frozenset(['int', 'float', 'byte', 'string', 'binary', 'bool', 'date', 'datetime'])
+_QUOTED_NAME_ESCAPE = re.compile(r'\\(.)')
+_WHITESPACE_ESCAPES = {'t': '\t', 'n': '\n', 'f': '\f', 'r': '\r'}
+
+
+class Parser:
+    """
+    A recursive-descent parser for ordinations, producing the same nodes as `grammar.DOCUMENT`.
+    """
+    def __init__(self, s: str, pos: int = 0):
+        self.s = s
+        self.source = source_for(s)
+        self.frame = n.Frame(self.source)
+        # Each top-level node gets its own anchor, which the nodes beneath it are relative to
+        self.anchor = n.Anchor(self.frame, pos)
+        self._tokens = iter_tokens(s, pos)
+        self.token: Token = next(self._tokens)
+        self.previous: Optional[Token] = None
+
+    # Token helpers
+
+    def advance(self)->Token:
+        token = self.token
+        self.previous = token
+        if token.kind != EOF:
+            self.token = next(self._tokens)
+        return token
+
+    def is_keyword(self, keyword: str)->bool:
+        return self.token.kind == NAME and self.token.value == keyword
+
+    def is_punct(self, punct: str)->bool:
+        return self.token.kind == PUNCT and self.token.value == punct
+
+    def error(self, expected: str)->OrdainSyntaxError:
+        token = self.token
+        found = token.kind if token.kind == EOF else repr(token.value)
+        return OrdainSyntaxError(f"Expected {expected}, found {found}", self.source, token.start)
+
+    def spanned(self, node: n.Node, start: int)->n.Node:
+        """
+        Set a node's span, from `start` to the end of the last token consumed
+        """
+        return node._parsedata(self.anchor, start, self.previous.end) # type: ignore
+
+    def expect_keyword(self, keyword: str)->Token:
+        if not self.is_keyword(keyword):
+            raise self.error(repr(keyword))
+        return self.advance()
+
+    def expect_punct(self, punct: str)->Token:
+        if not self.is_punct(punct):
+            raise self.error(repr(punct))
+        return self.advance()
+
+    # Grammar rules
+
+    def parse_document(self)->List[n.Import|n.TypeDef]:
+        """
+        Parse the whole input as a list of imports, followed by typedefs
+        """
+        nodes: List[n.Import|n.TypeDef] = self.parse_imports()
+        while self.token.kind != EOF:
+            nodes.append(self.parse_type_def())
+        return nodes
+
+    def parse_imports(self)->List[n.Import]:
+        """
+        Parse the imports at the start of the input. Since tokens are read lazily, this doesn't
+        look any further into the input than the first token after them.
+        """
+        imports = []
+        while self.is_keyword('import'):
+            imports.append(self.parse_import())
+        return imports
+
+    def parse_import(self)->n.Import:
+        self.anchor = n.Anchor(self.frame, self.token.start)
+        start = self.expect_keyword('import').start
+        if self.token.kind != STRING:
+            raise self.error('a file name')
+        return self.spanned(n.Import(self.parse_literal()), start)
+
+    def parse_type_def(self)->n.TypeDef:
+        start = self.token.start
+        self.anchor = n.Anchor(self.frame, start)
+        docblock = self.parse_docblock()
+        tags = self.parse_tags()
+        self.expect_keyword('type')
+        name = self.parse_identifier()
+        self.expect_punct(':')
+        type = self.parse_type()
+        return self.spanned(n.TypeDef(name, type, tags, docblock), start)
+
+    def parse_docblock(self)->Optional[n.DocBlock]:
+        if self.token.kind != DOCBLOCK:
+            return None
+        token = self.advance()
+        return self.spanned(n.DocBlock(token.value), token.start)
+
+    def parse_tags(self)->List[n.Tag]:
+        tags = []
+        while self.token.kind == TAG:
+            token = self.advance()
+            tags.append(self.spanned(n.Tag(*token.value), token.start))
+        return tags
+
+    def parse_identifier(self)->n.Identifier:
+        token = self.token
+        if token.kind == NAME:
+            name = token.value
+        elif token.kind == QUOTED_NAME:
+            name = _QUOTED_NAME_ESCAPE.sub(lambda match: _WHITESPACE_ESCAPES.get(match[1], match[1]), token.value[1:-1])
+        else:
+            raise self.error('an identifier')
+        self.advance()
+        return self.spanned(n.Identifier(name), token.start)
+
+    def parse_primitive_type(self)->n.PrimativeType:
+        token = self.token
+        if token.kind != NAME or token.value not in PRIMITIVE_TYPES:
+            raise self.error('a primitive type')
+        self.advance()
+        return self.spanned(n.PrimativeType(token.value), token.start)
+
+    def parse_type(self)->n.Node:
+        """
+        Parse any type that may appear on the right hand side of a typedef
+        """
+        token = self.token
+        if token.kind == NAME:
+            if token.value in PRIMITIVE_TYPES:
+                return self.parse_primitive_type()
+            elif token.value == 'struct':
+                return self.parse_struct_def()
+            elif token.value == 'enum':
+                return self.parse_enum_def()
+            elif token.value == 'list':
+                return self.parse_list_type()
+            elif token.value == 'array':
+                return self.parse_array_type()
+            elif token.value == 'mapping':
+                return self.parse_mapping_type()
+        return self.parse_identifier()
+
+    def parse_inline_type(self)->n.InlineType:
+        start = self.token.start
+        nullable = self.is_punct('?')
+        if nullable:
+            self.advance()
+        type = self.parse_type()
+        return self.spanned(n.InlineType(type, nullable), start)
+
+    def parse_struct_def(self)->n.StructDef:
+        start = self.expect_keyword('struct').start
+        self.expect_punct('{')
+        fields = []
+        while not self.is_punct('}'):
+            fields.append(self.parse_struct_field_def())
+        self.advance()
+        return self.spanned(n.StructDef(fields), start)
+
+    def parse_struct_field_def(self)->n.StructFieldDef:
+        start = self.token.start
+        docblock = self.parse_docblock()
+        tags = self.parse_tags()
+        if self.token.kind not in (NAME, QUOTED_NAME):
+            raise self.error("'}'" if docblock is None and not tags else 'an identifier')
+        name = self.parse_identifier()
+        self.expect_punct(':')
+        type = self.parse_inline_type()
+        return self.spanned(n.StructFieldDef(name, type, tags, docblock), start)
+
+    def parse_enum_def(self)->n.EnumDef:
+        start = self.expect_keyword('enum').start
+        if self.is_keyword('of'):
+            self.advance()
+            type = self.parse_primitive_type()
+        else:
+            type = n.PrimativeType('int')
+        self.expect_punct('{')
+        fields = []
+        while not self.is_punct('}'):
+            fields.append(self.parse_enum_field_def())
+        self.advance()
+        return self.spanned(n.EnumDef(type, fields), start)
+
+    def parse_enum_field_def(self)->n.EnumFieldDef:
+        if self.token.kind not in (NAME, QUOTED_NAME):
+            raise self.error("'}'")
+        name = self.parse_identifier()
+        if not self.is_punct('='):
+            return self.spanned(n.EnumFieldDef(name), name._start)
+        self.advance()
+        return self.spanned(n.EnumFieldDef(name, self.parse_literal()), name._start)
+
+    def parse_literal(self)->n.Literal:
+        token = self.token
+        if token.kind == STRING:
+            # Hijack python's string parsing
+            # Single-quotes are bytes, double-quotes are str
+            if token.value[0] == "'":
+                node = n.LiteralString(literal_eval(f"b{token.value}"))
+            else:
+                node = n.LiteralString(literal_eval(token.value))
+        elif token.kind == NUMBER:
+            text = token.value
+            if text.startswith('0x'):
+                node = n.LiteralInt(int(text[2:], 16))
+            elif text.startswith('0b'):
+                node = n.LiteralInt(int(text[2:], 2))
+            elif text.lstrip('+-').isdigit():
+                node = n.LiteralInt(int(text))
+            else:
+                node = n.LiteralFloat(float(text))
+        else:
+            raise self.error('a literal value')
+        self.advance()
+        return self.spanned(node, token.start)
+
+    def parse_list_type(self)->n.ListType:
+        start = self.expect_keyword('list').start
+        self.expect_keyword('of')
+        return self.spanned(n.ListType(self.parse_inline_type()), start)
+
+    def parse_array_type(self)->n.ArrayType:
+        start = self.expect_keyword('array').start
+        self.expect_keyword('of')
+        if self.token.kind != NUMBER or not self.token.value.isdigit():
+            raise self.error('an array length')
+        count = int(self.advance().value)
+        return self.spanned(n.ArrayType(count, self.parse_inline_type()), start)
+
+    def parse_mapping_type(self)->n.MappingType:
+        start = self.expect_keyword('mapping').start
+        self.expect_keyword('of')
+        key_type = self.parse_primitive_type()
+        self.expect_keyword('to')
+        return self.spanned(n.MappingType(key_type, self.parse_inline_type()), start)
+
+
+def parse_document(s: str)->List[n.Import|n.TypeDef]:
+    """
+    Parse an ordination into a list of imports, followed by typedefs
+
+    :raises OrdainSyntaxError: If the input is not well-formed
+    """
+    return Parser(s).parse_document()
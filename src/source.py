@@ -0,0 +1,48 @@
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+_NEWLINE = re.compile(r'\n')
+
+
+class Source:
+    """
+    The text of a parsed document, shared by every node parsed from it.
+
+    Nodes only store their (start, end) offsets (relative to an anchor), and look up line and
+    column numbers through the source's line index, which is built the first time it is needed.
+    """
+    __slots__ = ('text', '_line_starts')
+
+    def __init__(self, text: str):
+        self.text = text
+        self._line_starts: Optional[List[int]] = None
+
+    def __repr__(self):
+        return f"Source({len(self.text)} characters)"
+
+    @property
+    def line_starts(self)->List[int]:
+        """
+        The offset of the start of each line
+        """
+        if self._line_starts is None:
+            self._line_starts = [0, *(match.end() for match in _NEWLINE.finditer(self.text))]
+        return self._line_starts
+
+    def location(self, pos: int)->Tuple[int,int]:
+        """
+        Get the (1-based) line and column number of an offset
+        """
+        line = bisect_right(self.line_starts, pos)
+        return line, pos - self._line_starts[line - 1] + 1 # type: ignore
+
+
+@lru_cache(maxsize=16)
+def source_for(text: str)->Source:
+    """
+    Get the shared `Source` for a string, so nodes built separately (e.g. by pyparsing parse
+    actions) share one line index.
+    """
+    return Source(text)
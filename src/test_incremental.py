@@ -0,0 +1,98 @@
+import random
+import pytest
+from incremental import TextEdit, parse, reparse
+from lexer import OrdainSyntaxError
+from parser import parse_document
+from test_parser import DocumentGenerator, normalize
+
+
+def test_reuses_unaffected_typedefs():
+    document = parse('type A: int\n\n#tag\ntype B: string\n\n/** docs */\ntype C: struct { x: ?int }\n')
+    a, b, c = document.typedefs
+    start = document.text.index('string')
+    edited = reparse(document, TextEdit(start, start + len('string'), 'list of float'))
+    assert edited.text == 'type A: int\n\n#tag\ntype B: list of float\n\n/** docs */\ntype C: struct { x: ?int }\n'
+    new_a, new_b, new_c = edited.typedefs
+    assert new_a is a
+    assert new_b is not b
+    assert new_c is c
+    assert c.span == (edited.text.index('/**'), len(edited.text) - 1)
+    assert c.type.fields[0].location == (7, 18)
+    assert normalize(edited.typedefs) == normalize(parse_document(edited.text))
+
+
+def test_edit_touching_typedef():
+    document = parse('type A: Foo\ntype B: int')
+    a, b = document.typedefs
+    edited = reparse(document, TextEdit(11, 11, 'bar'))
+    assert edited.typedefs[0].type.name == 'Foobar'
+    assert edited.typedefs[1] is b
+
+
+def test_unbalanced_tag_depends_on_later_text():
+    document = parse('#tag(\ntype A: int\ntype B: int\n')
+    assert document.typedefs[0].tags[0].args == '('
+    end = len(document.text)
+    edited = reparse(document, TextEdit(end, end, '#other)\ntype C: int\n'))
+    assert normalize(edited.typedefs) == normalize(parse_document(edited.text))
+    assert len(edited.typedefs) == 1
+
+
+def test_error_leaves_document_unchanged():
+    document = parse('type A: int\ntype B: int\ntype C: int')
+    spans = [typedef.span for typedef in document.typedefs]
+    with pytest.raises(OrdainSyntaxError):
+        reparse(document, TextEdit(12, 12, 'type X: \n'))
+    assert [typedef.span for typedef in document.typedefs] == spans
+
+
+def test_imports_only_before_typedefs():
+    document = parse('import "a.ordain"\ntype A: int\n')
+    edited = reparse(document, TextEdit(0, 0, 'import "z.ordain"\n'))
+    assert [type(node).__name__ for node in edited.typedefs] == ['Import', 'Import', 'TypeDef']
+    with pytest.raises(OrdainSyntaxError):
+        reparse(edited, TextEdit(len(edited.text), len(edited.text), '\nimport "b.ordain"'))
+    # Removing the typedef between two imports makes the document valid again
+    document = parse('import "a.ordain"\ntype A: int\n')
+    edited = reparse(document, TextEdit(18, 30, 'import "b.ordain"\n'))
+    assert normalize(edited.typedefs) == normalize(parse_document(edited.text))
+
+
+def test_edits_only_move_anchors_since_the_last_edit():
+    document = parse(''.join(f'type T{i}: int\n' for i in range(100)))
+    typedefs = list(document.typedefs)
+    pos = document.text.index('T50:') + 3
+    offsets = [typedef._anchor.offset for typedef in typedefs]
+    reparse(document, TextEdit(pos, pos, 'x'))
+    assert [typedef._anchor.offset for typedef in typedefs[:50]] == offsets[:50]
+    offsets = [typedef._anchor.offset for typedef in document.typedefs]
+    reparse(document, TextEdit(pos + 1, pos + 1, 'y'))
+    assert all(new is old for new, old in zip(document.typedefs, typedefs) if old.name.name != 'T50')
+    assert [typedef._anchor.offset for typedef in document.typedefs] == offsets
+    assert document.typedefs[50].name.name == 'T50xy'
+    assert normalize(document.typedefs) == normalize(parse_document(document.text))
+
+
+SNIPPETS = ['', 'x', ' ', '\n', '(', ')', '#tag(', '/*', '*/', '//', 'type X: int\n', '\ntype Y: list of ?Z\n', '}', ' struct { a: int }', 'import "x.ordain"\n']
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_random_edits(seed):
+    rng = random.Random(seed)
+    s = DocumentGenerator(seed).document()
+    document = parse(s)
+    for _ in range(5):
+        start = rng.randint(0, len(s))
+        end = min(len(s), start + rng.choice([0, 0, 1, 5, 20]))
+        edit = TextEdit(start, end, rng.choice(SNIPPETS))
+        new_s = edit.apply(s)
+        try:
+            expected = normalize(parse_document(new_s))
+        except OrdainSyntaxError:
+            with pytest.raises(OrdainSyntaxError):
+                reparse(document, edit)
+            continue
+        document = reparse(document, edit)
+        s = new_s
+        assert document.text == s
+        assert normalize(document.typedefs) == expected
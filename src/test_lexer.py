@@ -0,0 +1,57 @@
+import random
+import pytest
+from lexer import OrdainSyntaxError, ParenMatcher, scan_parenthesized, tokenize, TAG, DOCBLOCK
+
+
+def random_source(seed, length=400):
+    rng = random.Random(seed)
+    pieces = ['(', ')', '(', ')', '"', "'", ' ', '\n', 'x', "it's", '\\', '" )"', "'('"]
+    return ''.join(rng.choice(pieces) for _ in range(length))
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_paren_matcher_matches_direct_scan(seed):
+    s = random_source(seed)
+    matcher = ParenMatcher(s)
+    for pos, char in enumerate(s):
+        if char == '(':
+            assert matcher.scan(pos) == scan_parenthesized(s, pos)
+
+
+@pytest.mark.parametrize('s, expected', [
+    ('(a)', 3),
+    ('(a (b) c) d', 9),
+    ('(a ")" b)', 9),
+    ("(it's)", 6),
+    ("(it's ')')", 10),
+    ('(a\n(b\n)\nc)', 10),
+    ('(a ")\n")', 5),
+    ('(a', -1),
+    ('(a\n\n(b)', -1),
+])
+def test_scan_parenthesized(s, expected):
+    assert scan_parenthesized(s, 0) == expected
+    assert ParenMatcher(s).scan(0) == expected
+
+
+def test_unbalanced_tags():
+    tokens = tokenize('#a(\n#b(\n#c(x\n)\n#d (y)')
+    assert [token.value for token in tokens if token.kind == TAG] == [
+        ('#a', '('), ('#b', '('), ('#c', '(x\n)'), ('#d', '(y)'),
+    ]
+    tokens = tokenize('#a(\n#b(\n)\n)\n#c(')
+    assert [token.value for token in tokens if token.kind == TAG] == [('#a', '(\n#b(\n)\n)'), ('#c', '(')]
+    tokens = tokenize('#a(\n#b(\n')
+    assert [token.value for token in tokens if token.kind == TAG] == [('#a', '('), ('#b', '(')]
+
+
+def test_docblock():
+    tokens = tokenize('/**\n   docs */')
+    assert tokens[0].kind == DOCBLOCK
+    assert tokens[0].value == '/**docs */'
+
+
+@pytest.mark.parametrize('s', ['/* comment', '/** docs', 'type A: int /* comment'])
+def test_unterminated(s):
+    with pytest.raises(OrdainSyntaxError):
+        tokenize(s)
@@ -0,0 +1,165 @@
+import re
+import pytest
+from ordain.cache import loads
+from ordain.imports import load_files
+from ordain.exceptions import ParseException
+from ordain.model import *
+from ordain.parse_dict import parse_typedefs
+from lower import lower_document, load, scan_imports, tag_value
+from parser import parse_document
+
+
+def lower(s):
+    return lower_document(parse_document(s))
+
+
+def test_matches_dict_front_end():
+    model = lower('''
+        #check < 150
+        type Age: int
+        type Years: Age
+        /**
+         * A user of the system
+         */
+        #sql.name users
+        type User: struct {
+            #sql.type VARCHAR(255)
+            #required
+            name: string
+            age: Age
+            maybe_age: ?Age
+            friends: list of User
+            best_friends: array of 3 ?User
+            scores: mapping of string to ?int
+            nested: list of list of Age
+        }
+        type Users: list of User
+        type Admin: User
+    ''')
+    assert model == parse_typedefs({
+        'Age': {'type': 'int', 'tags': [{'check': '< 150'}]},
+        'Years': {'type': 'Age'},
+        'User': {
+            'type': 'struct',
+            'docs': 'A user of the system',
+            'tags': [{'sql.name': 'users'}],
+            'fields': {
+                'name': {'type': 'string', 'tags': [{'sql.type': 'VARCHAR(255)'}, 'required']},
+                'age': {'type': 'Age'},
+                'maybe_age': {'type': '?Age'},
+                'friends': {'type': 'list of User'},
+                'best_friends': {'type': 'array of 3 ?User'},
+                'scores': {'type': 'mapping of string to ?int'},
+                'nested': {'type': 'list of list of Age'},
+            },
+        },
+        'Users': {'type': 'list of User'},
+        'Admin': {'type': 'User'},
+    })
+    assert model['User'].struct_fields['friends'].type.of is model['Users'].type.of
+
+
+@pytest.mark.parametrize('args, expected', [
+    ('', True),
+    (' ', True),
+    (' VARCHAR(255)', 'VARCHAR(255)'),
+    (' < 150 // comment', '< 150'),
+    (' regex /[A-Za-z]+/', 'regex /[A-Za-z]+/'),
+    (' http://example.com', 'http://example.com'),
+    ('(\n    return password_hash($value);\n)', 'return password_hash($value);'),
+    ('(\n    if ($x) {\n        return;\n    }\n)', 'if ($x) {\n    return;\n}'),
+    ('(a) b', '(a) b'),
+])
+def test_tag_value(args, expected):
+    assert tag_value(args) == expected
+
+
+def test_tags():
+    model = lower('#php.set(\n    return 1;\n)\n#only-if php sql\n#ignore\ntype A: int')
+    assert model['A'].tags == TagRepository([
+        Tag('php', 'set', 'return 1;'),
+        Tag(None, 'only-if', 'php sql'),
+        Tag(None, 'ignore', True),
+    ])
+
+
+def test_enums():
+    model = lower('''
+        type A: enum {a b=5 c}
+        type B: enum of string {stuff things="other"}
+        type C: enum of binary {x='\\x00' y='\\x01'}
+        type D: struct { e: ?enum of string {x y} }
+    ''')
+    assert model['A'].type == EnumType(ScalarType.int, [0, 5, 6])
+    assert model['B'].type == EnumType(ScalarType.string, ['stuff', 'other'])
+    assert model['C'].type == EnumType(ScalarType.binary, [b'\x00', b'\x01'])
+    assert model['D'].struct_fields['e'].type == NullableType(EnumType(ScalarType.string, ['x', 'y']))
+
+
+def test_inline_struct():
+    model = lower('type A: list of struct { x: int }')
+    assert model['A'].type == CollectionType(Typedef('struct', StructType({'x': Typedef('A.x', ScalarType.int, TagRepository([]))}), TagRepository([])))
+
+
+@pytest.mark.parametrize('s, message', [
+    ('type A: B', 'Undefined type: B'),
+    ('type A: byte', 'Unsupported type: byte'),
+    ('type A: B\ntype B: A', 'Inheritance cycle'),
+    ('type A: int\ntype A: string', 'Duplicate typedef: A (at line 2, col 6)'),
+    ('type A: enum of float {a}', 'has no value'),
+    ('type A: enum of int {a="x"}', 'not a valid int'),
+    ('type A: struct {\n x: B\n}', 'Undefined type: B (at line 2, col 2)'),
+])
+def test_errors(s, message):
+    with pytest.raises(ParseException, match=re.escape(message)):
+        lower(s)
+
+
+def test_reports_all_errors():
+    with pytest.raises(ParseException, match='2 errors found'):
+        lower('type A: struct { x: B y: C }')
+
+
+def test_loader():
+    assert loads(b'type A: int', '.ordain', use_cache=False) == {'A': Typedef('A', ScalarType.int, TagRepository([]))}
+    with pytest.raises(ParseException):
+        load(b'type A')
+
+
+def test_externals_match_dict_front_end():
+    common = {
+        'Id': {'type': 'int'},
+        'User': {'type': 'struct', 'fields': {'name': {'type': 'string'}}},
+        'MaybeUser': {'type': '?User'},
+    }
+    model = lower_document(parse_document('''
+        import "common.json"
+        type Admin: User
+        type Key: Id
+        type Users: list of ?User
+        type Group: struct { owner: MaybeUser ids: mapping of string to Id }
+    '''), parse_typedefs(common))
+    expected = parse_typedefs({
+        **common,
+        'Admin': {'type': 'User'},
+        'Key': {'type': 'Id'},
+        'Users': {'type': 'list of ?User'},
+        'Group': {'type': 'struct', 'fields': {'owner': {'type': 'MaybeUser'}, 'ids': {'type': 'mapping of string to Id'}}},
+    })
+    assert list(model) == ['Admin', 'Key', 'Users', 'Group']
+    assert all(model[name] == expected[name] for name in model)
+
+
+def test_scan_imports():
+    assert scan_imports(b'import "a.ordain" import "../b.json"\ntype A: int\nimport "c.ordain"') == ['a.ordain', '../b.json']
+    with pytest.raises(ParseException, match='binary'):
+        scan_imports(b"import 'a.ordain'")
+
+
+def test_load_files(tmp_path):
+    (tmp_path / 'common.ordain').write_text('type Id: int')
+    (tmp_path / 'users.json').write_text('{"$imports": ["common.ordain"], "User": {"type": "struct", "fields": {"id": {"type": "Id"}}}}')
+    (tmp_path / 'admin.ordain').write_text('import "users.json"\ntype Admins: list of User')
+    model = load_files([tmp_path / 'admin.ordain'], use_cache=False)
+    assert list(model) == ['Id', 'User', 'Admins']
+    assert model['Admins'].type.of.type == NamedTypeReference('User')
@@ -0,0 +1,196 @@
+"""
+Differential tests, checking the recursive-descent parser against the pyparsing grammar.
+"""
+import dataclasses
+import random
+import re
+from pathlib import Path
+import pytest
+import pyparsing
+import parse_nodes as n
+from grammar import DOCUMENT
+from parser import parse_document
+from lexer import OrdainSyntaxError
+
+
+def normalize(node):
+    """
+    Turn a parse tree into plain data, so trees from both parsers can be compared
+    """
+    if isinstance(node, (list, pyparsing.ParseResults)):
+        return [normalize(item) for item in node]
+    if isinstance(node, n.Node):
+        fields = {field.name: normalize(getattr(node, field.name)) for field in dataclasses.fields(node) if not field.name.startswith('_')}
+        span = node.span if hasattr(node, '_start') else None
+        return (type(node).__name__, span, fields)
+    return node
+
+
+def assert_same_parse(source):
+    expected = normalize(DOCUMENT.parse_string(source, parse_all=True))
+    actual = normalize(parse_document(source))
+    assert actual == expected
+
+
+def readme_examples():
+    readme = (Path(__file__).parent.parent / 'README.md').read_text()
+    return re.findall(r'```ordain\n(.*?)```', readme, re.DOTALL)
+
+
+EXAMPLES = [
+    'type A: int',
+    'type A: list of ?int',
+    'type A: array of 5 string',
+    'type A: mapping of string to list of datetime',
+    'type A: SomeOtherType',
+    'type `weird name`: `other \\` name`',
+    'type int: string',
+    'type A: struct{}',
+    'type A: struct{ type: int list: string `struct`: bool }',
+    'type A: enum {a b c}',
+    'type A: enum of string {a="x" b=\'y\' c="""z"""}',
+    'type A: enum of int {a=0x1F b=0b101 c=-3 d=+4}',
+    '/** docs */ type A: int',
+    '/**\n * Multi-line\n * docs\n */\ntype A: int',
+    '#tag\ntype A: int',
+    '#tag value with spaces \ntype A: int',
+    '#sql.type VARCHAR(255)\ntype A: string',
+    '#php.set(\n    return password_hash($value)\n)\ntype A: string',
+    '#tag (a "(" b)\ntype A: int',
+    "#tag (')' (nested) \")\")\ntype A: int",
+    "#tag (it's (nested) ')')\ntype A: int",
+    '#a(\n#b(\n#c(x\n)\ntype A: int',
+    '#tag(unbalanced\ntype A: int',
+    '#tag // comment\ntype A: int',
+    '#tag /* comment */ value\ntype A: int',
+    '#tag value // comment\ntype A: int',
+    '#tag\n\n(on the next line)\ntype A: int',
+    '// comment\ntype A: /* comment */ int // comment',
+    '/* comment */ /** docs */ #a #b 1\n type A: struct {\n /** field docs */\n #c\n x: ?B // comment\n}',
+    'type A: struct { x: struct { y: struct { z: enum of bool {t=1 f=0} } } }',
+    'type A:int type B:string',
+    'import "other.ordain"',
+    'import "a.ordain" import \'b.ordain\'\n// comment\nimport "sub/c.ordain" type A: B',
+    '',
+]
+
+
+@pytest.mark.parametrize('source', EXAMPLES)
+def test_examples(source):
+    assert_same_parse(source)
+
+
+@pytest.mark.parametrize('source', readme_examples())
+def test_readme_examples(source):
+    try:
+        DOCUMENT.parse_string(source, parse_all=True)
+    except pyparsing.ParseBaseException:
+        with pytest.raises(OrdainSyntaxError):
+            parse_document(source)
+    else:
+        assert_same_parse(source)
+
+
+@pytest.mark.parametrize('source', [
+    'type',
+    'type A',
+    'type A:',
+    'type A: list',
+    'type A: list int',
+    # Only inline types can be nullable
+    'type A: ?int',
+    'type A: array of string',
+    'type A: mapping of A to int',
+    'type A: struct{',
+    'type A: struct{ x int }',
+    'type A: struct{ #tag }',
+    'type A: enum {a=}',
+    '#tag',
+    '/** docs',
+    '/* comment',
+    'type A: int garbage',
+    'type A: int }',
+    'import',
+    'import other.ordain',
+    'type A: int import "other.ordain"',
+])
+def test_errors(source):
+    with pytest.raises(pyparsing.ParseBaseException):
+        DOCUMENT.parse_string(source, parse_all=True)
+    with pytest.raises(OrdainSyntaxError):
+        parse_document(source)
+
+
+class DocumentGenerator:
+    """
+    Generates random (valid) ordinations
+    """
+    names = ['a', 'B', 'some_name', 'type', 'list', 'of', 'int', '`quoted name`', 'x1', '_private']
+    enum_values = ['', '=1', ' = -2', '=0x1f', '="text"', "='bytes'"]
+    primitives = ['int', 'float', 'byte', 'string', 'binary', 'bool', 'date', 'datetime']
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def choice(self, options):
+        return self.random.choice(options)
+
+    def gap(self):
+        return self.choice([' ', '  ', '\n', '\n    ', ' /* comment */ ', ' // comment\n'])
+
+    def docblock(self):
+        return self.choice(['', '', '/** docs */\n', '/**\n * Line one\n * Line two\n */\n'])
+
+    def tags(self):
+        tags = ''
+        for _ in range(self.random.randint(0, 3)):
+            name = self.choice(['#label', '#check', '#sql.type', '#only-if', '#php.set', '#required'])
+            args = self.choice(['', ' simple value', ' < 150', '(\n  return "(" . $x;\n)', ' (wrapped)', ' value // comment'])
+            tags += f"{name}{args}\n"
+        return tags
+
+    def inline_type(self, depth):
+        nullable = self.choice(['', '', '?', '? '])
+        return nullable + self.type(depth)
+
+    def type(self, depth):
+        options = ['primitive', 'name']
+        if depth < 3:
+            options += ['struct', 'enum', 'list', 'array', 'mapping']
+        kind = self.choice(options)
+        gap = self.gap
+        if kind == 'primitive':
+            return self.choice(self.primitives)
+        elif kind == 'name':
+            return self.choice(['SomeType', 'Other', '`Quoted`'])
+        elif kind == 'struct':
+            fields = ''.join(
+                f"{gap()}{self.docblock()}{self.tags()}{self.choice(self.names)}{gap()}:{gap()}{self.inline_type(depth + 1)}"
+                for _ in range(self.random.randint(0, 4))
+            )
+            return f"struct{gap()}{{{fields}{gap()}}}"
+        elif kind == 'enum':
+            of = self.choice(['', f"of {self.choice(self.primitives)}{gap()}"])
+            values = ''.join(
+                f"{gap()}{self.choice(self.names)}{self.choice(self.enum_values)}"
+                for _ in range(self.random.randint(0, 4))
+            )
+            return f"enum {of}{{{values}{gap()}}}"
+        elif kind == 'list':
+            return f"list{gap()}of{gap()}{self.inline_type(depth + 1)}"
+        elif kind == 'array':
+            return f"array{gap()}of{gap()}{self.random.randint(0, 99)}{gap()}{self.inline_type(depth + 1)}"
+        else:
+            return f"mapping{gap()}of{gap()}{self.choice(self.primitives)}{gap()}to{gap()}{self.inline_type(depth + 1)}"
+
+    def document(self):
+        imports = ''.join(f'{self.gap()}import{self.gap()}"{self.choice(self.names)}.ordain"' for _ in range(self.random.randint(0, 2)))
+        return imports + ''.join(
+            f"{self.gap()}{self.docblock()}{self.tags()}type {self.choice(self.names)}{self.gap()}:{self.gap()}{self.type(0)}\n"
+            for _ in range(self.random.randint(0, 5))
+        )
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_random_documents(seed):
+    assert_same_parse(DocumentGenerator(seed).document())
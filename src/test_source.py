@@ -0,0 +1,46 @@
+import pytest
+import parse_nodes as n
+from source import Source, source_for
+from parser import parse_document
+from lexer import OrdainSyntaxError
+
+
+@pytest.mark.parametrize('pos, expected', [
+    (0, (1, 1)),
+    (3, (1, 4)),
+    (4, (2, 1)),
+    (5, (3, 1)),
+    (9, (3, 5)),
+])
+def test_location(pos, expected):
+    assert Source('abc\n\nline').location(pos) == expected
+
+
+def test_nodes_share_source():
+    s = '/** docs */\n#tag value\ntype A: struct {\n    x: list of int\n}'
+    typedef, = parse_document(s)
+    field = typedef.type.fields[0]
+    assert typedef._source is field._source is source_for(s)
+    assert typedef.span == (0, len(s))
+    assert field.span == (44, 58)
+    assert field.location == (4, 5)
+    assert s[slice(*field.type.span)] == 'list of int'
+    assert typedef.tags[0]._str is s
+    assert typedef.tags[0]._pos == 12
+
+
+def test_nodes_are_slotted():
+    node = n.Identifier('A')
+    assert not hasattr(node, '__dict__')
+    with pytest.raises(AttributeError):
+        node.other = 1
+
+
+def test_spans_ignored_for_equality():
+    assert parse_document('type A: int') == parse_document('\n\ntype   A:  int')
+
+
+def test_error_location():
+    with pytest.raises(OrdainSyntaxError) as info:
+        parse_document('type A: int\ntype B:\n')
+    assert (info.value.lineno, info.value.col) == (3, 1)